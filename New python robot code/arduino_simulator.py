@@ -0,0 +1,629 @@
+"""
+Эмулятор прошивки Arduino (скетч sketch_feb25a) для работы без железа.
+
+Эмулятор открывает псевдотерминал (pty) и ведет себя как последовательный
+порт Arduino: путь из ArduinoSimulator.port можно передать в serial.Serial
+или в ArduinoStepSender. Работает только на POSIX-системах.
+"""
+import argparse
+import math
+import os
+import pty
+import select
+import threading
+import time
+import tty
+from collections import deque, namedtuple
+
+import motion_profile
+import protocol
+
+# Направление движения к концевику для каждой оси (плечо, рука, лифт, кисть)
+HOME_DIRECTIONS = tuple(protocol.HOME_DIRECTIONS[axis] for axis in protocol.AXES)
+# Положение срабатывания концевиков (шаги от положения при включении)
+DEFAULT_LIMIT_POSITIONS = (-2000, -2000, 4000, -400)
+
+# Сегмент очереди: номер, абсолютные цели, маска заданных осей,
+# состояние пневматики (None - не менять), подача магазина, обнуление
+Segment = namedtuple('Segment', 'seq targets mask vacuum doza magazin zero')
+
+
+class SimStepper:
+    """
+    Модель шагового двигателя AccelStepper.
+
+    Поддерживает два режима, как в скетче:
+    - run_speed(): движение с постоянной скоростью без разгона (runSpeed);
+    - run(): движение к цели с трапециевидным профилем (maxSpeed/acceleration).
+    """
+
+    def __init__(self, max_speed=protocol.MAX_SPEED, acceleration=protocol.ACCELERATION):
+        self.max_speed = max_speed  # Максимальная скорость (шаг/с)
+        self.acceleration = acceleration  # Ускорение (шаг/с^2)
+        self.position = 0.0  # Текущая позиция (шаги)
+        self.target = 0.0  # Цель для run()
+        self.speed = 0.0  # Текущая скорость (шаг/с)
+
+    def move(self, relative):
+        """Сдвигает цель на указанное число шагов (AccelStepper::move)."""
+        self.target += relative
+
+    def move_to(self, absolute):
+        """Устанавливает абсолютную цель (AccelStepper::moveTo)."""
+        self.target = float(absolute)
+
+    def distance_to_go(self):
+        """Возвращает оставшееся до цели расстояние в шагах."""
+        return self.target - self.position
+
+    def is_running(self):
+        """Возвращает True, пока двигатель не остановился в цели."""
+        return self.speed != 0.0 or abs(self.distance_to_go()) >= 0.5
+
+    def stop(self):
+        """Плавная остановка с заданным ускорением (AccelStepper::stop)."""
+        if self.speed:
+            stopping = self.speed ** 2 / (2 * self.acceleration)
+            self.target = self.position + math.copysign(stopping, self.speed)
+
+    def halt(self):
+        """Мгновенная остановка на месте: цель - текущая позиция (setCurrentPosition)."""
+        self.target = self.position
+        self.speed = 0.0
+
+    def run_speed(self, speed, dt):
+        """
+        Движение с постоянной скоростью за время dt (setSpeed + runSpeed).
+
+        Как в AccelStepper, цель run() не меняется, а скорость остается
+        заданной: если потом вызывать run(), ось поедет к старой цели.
+        """
+        self.speed = max(-self.max_speed, min(self.max_speed, speed))
+        self.position += self.speed * dt
+
+    def run(self, dt):
+        """Продвигает двигатель к цели на время dt с трапециевидным профилем."""
+        distance = self.distance_to_go()
+        if abs(distance) < 0.5 and abs(self.speed) <= self.acceleration * dt:
+            self.position = self.target
+            self.speed = 0.0
+            return
+
+        # Скорость, с которой еще можно затормозить до цели
+        desired = math.copysign(min(self.max_speed, math.sqrt(2 * self.acceleration * abs(distance))),
+                                distance)
+        dv = self.acceleration * dt
+        self.speed = max(self.speed - dv, min(self.speed + dv, desired))
+        self.position += self.speed * dt
+
+        # Проскочили цель - фиксируем позицию
+        if (self.target - self.position) * distance < 0:
+            self.position = self.target
+            self.speed = 0.0
+
+
+class FirmwareModel:
+    """
+    Модель логики скетча: глобальные флаги, цепочка if/else в loop(),
+    концевики и очередь сегментов. Не зависит от транспорта, поэтому
+    используется и без pty.
+    """
+
+    # Флаги скетча (в стиле Python)
+    FLAGS = (
+        'move_forward', 'move_reverse', 'move_to_home', 'stop_motor',
+        'move_arm_reverse', 'move_arm_forward', 'move_to_home_arm',
+        'elevator_up', 'elevator_down', 'move_to_home_elevator',
+        'move_wrist_forward', 'move_wrist_reverse', 'move_to_home_wrist',
+    )
+
+    # Флаги, которые однобайтовая команда устанавливает в true. Остальные
+    # флаги команда сбрасывает, кроме move_to_home_arm: в скетче его
+    # сбрасывает только концевик руки.
+    CHAR_FLAGS = {
+        'F': ('move_forward',),
+        'R': ('move_reverse',),
+        'H': ('move_to_home', 'move_to_home_arm', 'move_to_home_elevator', 'move_to_home_wrist'),
+        'S': ('stop_motor',),
+        'Z': ('move_arm_reverse',),
+        'X': ('move_arm_forward',),
+        'C': ('move_arm_forward',),
+        'U': ('elevator_up',),
+        'D': ('elevator_down',),
+        'V': ('move_wrist_forward',),
+        'B': ('move_wrist_reverse',),
+    }
+
+    # Пневматика: команда -> (выход, состояние)
+    VALVE_CHARS = {
+        'N': ('vacuum', False),
+        'M': ('vacuum', True),
+        'K': ('doza', True),
+        'L': ('doza', False),
+    }
+
+    # Флаги, которые сбрасывает концевик каждой оси
+    LIMIT_FLAGS = (
+        ('move_forward', 'move_to_home'),
+        ('move_arm_forward', 'move_to_home_arm'),
+        ('elevator_up', 'move_to_home_elevator'),
+        ('move_to_home_wrist', 'move_wrist_forward'),
+    )
+
+    TICK = 0.001  # Шаг моделирования (с)
+
+    def __init__(self, limit_positions=DEFAULT_LIMIT_POSITIONS, start_positions=None,
+                 status_period=protocol.STATUS_PERIOD_MS / 1000, backlash=None):
+        """
+        Args:
+            limit_positions (tuple): Позиции срабатывания концевиков (шаги)
+            start_positions (tuple, optional): Позиции осей при включении
+            status_period (float): Период кадров состояния (с), 0 - только по запросу
+            backlash (tuple, optional): Люфт передачи каждой оси (шаги двигателя)
+        """
+        self.steppers = [SimStepper() for _ in protocol.AXES]
+        for stepper, position in zip(self.steppers, start_positions or ()):
+            stepper.position = stepper.target = float(position)
+        # Выходное звено отстает от двигателя на половину люфта в сторону, обратную движению
+        self.backlash = tuple(backlash or (0,) * len(self.steppers))
+        self.joints = [stepper.position for stepper in self.steppers]
+
+        # Концевики неподвижны: при обнулении позиций их координаты сдвигаются
+        self.limit_positions = list(limit_positions)
+        self.flags = dict.fromkeys(self.FLAGS, False)
+        self.latched = [False] * len(self.steppers)  # Переменные a, b, c, d скетча
+        self.outputs = {'vacuum': False, 'doza': False}
+        self.magazine = 0  # Счетчик подач магазина
+        self.clock = 0.0  # Модельное время (с)
+
+        self.queue = deque()  # Очередь сегментов
+        self.current = None  # Выполняемый сегмент
+        self.done_seq = 0  # Номер последнего выполненного сегмента
+        self.expect_seq = None  # Номер следующего принимаемого сегмента, None - любой
+        self.status_period = status_period
+        self._next_status = status_period
+        self._profiles_scaled = False  # Скорости осей согласованы под сегмент
+        self._last_targets = [stepper.target for stepper in self.steppers]
+        self.jog_speeds = [0.0] * len(self.steppers)  # Скорости ручного перемещения (шаг/с)
+        self._jog_deadline = 0.0  # Модельное время остановки без нового кадра JOG
+
+        self._frame = None  # Буфер принимаемого кадра
+        self._output = []  # Строки для отправки хосту
+
+    # --- Прием данных ---
+
+    def feed(self, data):
+        """
+        Обрабатывает байты, полученные от хоста.
+
+        Args:
+            data (bytes): Принятые данные
+        """
+        for ch in data.decode('ascii', errors='replace'):
+            if self._frame is not None:
+                if ch == '\n':
+                    self._handle_frame(self._frame)
+                    self._frame = None
+                elif ch != '\r':
+                    self._frame += ch
+            elif ch == protocol.FRAME_START:
+                self._frame = ''
+            elif ch == protocol.QUERY:
+                self._reply(self.status_line())
+            elif ch in self.CHAR_FLAGS:
+                self._handle_char(ch)
+            elif ch in self.VALVE_CHARS:
+                output, state = self.VALVE_CHARS[ch]
+                self.outputs[output] = state
+
+    def _handle_char(self, ch):
+        """Обработка однобайтовой команды (switch в loop() скетча)."""
+        active = self.CHAR_FLAGS[ch]
+        for flag in self.FLAGS:
+            if flag == 'move_to_home_arm' and flag not in active:
+                continue
+            self.flags[flag] = flag in active
+
+        # Остановка сбрасывает очередь сегментов
+        if ch == 'S':
+            self.queue.clear()
+            self.expect_seq = None
+            self.current = None
+            for stepper in self.steppers:
+                stepper.stop()
+            self._last_targets = [stepper.target for stepper in self.steppers]
+            for index in range(len(self.steppers)):
+                self._end_jog(index)
+
+    def _handle_frame(self, line):
+        """Разбор кадра сегмента и постановка его в очередь."""
+        try:
+            fields = protocol.parse_frame(line)
+            if protocol.JOG in fields:
+                self._handle_jog(fields)
+                return
+            seq = int(fields.pop(protocol.SEGMENT))
+            zero = fields.pop(protocol.ZERO, None) is not None
+            # Оси, не заданные в кадре, остаются на цели предыдущего сегмента
+            targets = [0.0] * len(self.steppers) if zero else list(self._last_targets)
+            mask, valves, magazin = 0, {}, 0
+            for key, value in fields.items():
+                if key in protocol.AXES:
+                    index = protocol.AXES.index(key)
+                    targets[index] = float(int(value))
+                    mask |= 1 << index
+                elif key in ('VACUUM', 'DOZA'):
+                    valves[key] = value.upper() == 'HIGH'
+                elif key == 'MAGAZIN':
+                    magazin = int(float(value))
+        except (KeyError, ValueError) as e:
+            self._reply(f"{protocol.REPLY_ERROR}:{e}")
+            return
+
+        # Сегменты принимаются по порядку: повтор принятого только подтверждается,
+        # следующие за отброшенным отклоняются до его повтора
+        if self.expect_seq is not None and seq < self.expect_seq:
+            self._reply(f"{protocol.REPLY_ACK}:{seq}|{protocol.FREE}:{self.free_slots()}")
+            return
+        if len(self.queue) >= protocol.QUEUE_SIZE or self.expect_seq not in (None, seq):
+            self._reply(f"{protocol.REPLY_FULL}:{seq}|{protocol.FREE}:{self.free_slots()}")
+            return
+
+        self.queue.append(Segment(seq, targets, mask, valves.get('VACUUM'), valves.get('DOZA'),
+                                  magazin, zero))
+        self._last_targets = targets
+        self.expect_seq = seq + 1
+        self.flags['stop_motor'] = False
+        self._reply(f"{protocol.REPLY_ACK}:{seq}|{protocol.FREE}:{self.free_slots()}")
+
+    def _handle_jog(self, fields):
+        """Кадр ручного перемещения: новые скорости осей и продление таймаута."""
+        if self.current is not None or self.queue:
+            self._reply(f"{protocol.REPLY_ERROR}:{protocol.ERROR_BUSY}")
+            return
+        for index, axis in enumerate(protocol.AXES):
+            if axis in fields:
+                speed = max(-protocol.MAX_SPEED, min(protocol.MAX_SPEED, float(int(fields[axis]))))
+                if speed:
+                    self.jog_speeds[index] = speed
+                else:
+                    self._end_jog(index)
+        self._jog_deadline = self.clock + protocol.JOG_TIMEOUT_MS / 1000
+
+    def _end_jog(self, index):
+        """Останавливает ручное перемещение оси: цель - текущая позиция."""
+        if self.jog_speeds[index]:
+            self.jog_speeds[index] = 0.0
+            self.steppers[index].halt()
+            self._last_targets[index] = self.steppers[index].position
+
+    def free_slots(self):
+        """Возвращает количество свободных мест в очереди сегментов."""
+        return protocol.QUEUE_SIZE - len(self.queue)
+
+    # --- Моделирование loop() ---
+
+    def advance(self, dt):
+        """
+        Продвигает модельное время на dt секунд.
+
+        Args:
+            dt (float): Интервал моделирования (с)
+        """
+        while dt > 0:
+            tick = min(self.TICK, dt)
+            self._loop(tick)
+            self.clock += tick
+            dt -= tick
+            if self.status_period and self.clock >= self._next_status:
+                self._reply(self.status_line())
+                self._next_status += self.status_period
+
+    def _select_jog(self):
+        """
+        Цепочка if/else из loop(): в каждый момент runSpeed() крутит
+        только один двигатель.
+
+        Returns:
+            tuple: (индекс оси, скорость) или None
+        """
+        f, a = self.flags, self.latched
+        speed = protocol.JOG_SPEED
+        if f['move_forward'] and not a[0]:
+            return 0, -speed
+        if f['move_reverse']:
+            a[0] = False
+            return 0, speed
+        if f['move_to_home'] and not a[0]:
+            return 0, -speed
+        if f['move_to_home_arm'] and not a[1]:
+            return 1, -speed
+        if f['move_arm_forward'] and not a[1]:
+            return 1, -speed
+        if f['move_arm_reverse']:
+            a[1] = False
+            return 1, speed
+        if f['elevator_up'] and not a[2]:
+            return 2, speed
+        if f['elevator_down']:
+            a[2] = False
+            return 2, -speed
+        if f['move_to_home_elevator'] and not a[2]:
+            return 2, speed
+        if f['move_to_home_wrist'] and not a[3]:
+            return 3, -speed
+        if f['move_wrist_reverse']:
+            a[3] = False
+            return 3, speed
+        if f['move_wrist_forward'] and not a[3]:
+            return 3, -speed
+        return None
+
+    def limit_switch(self, index):
+        """Возвращает True, если концевик оси нажат."""
+        offset = self.steppers[index].position - self.limit_positions[index]
+        return offset * HOME_DIRECTIONS[index] >= 0
+
+    def _loop(self, dt):
+        """Одна итерация loop() скетча длительностью dt."""
+        jog = self._select_jog()
+        if jog is not None:
+            index, speed = jog
+            self.steppers[index].run_speed(speed, dt)
+
+        # Ручное перемещение кадрами JOG: остановка по таймауту и на концевике
+        for index, speed in enumerate(self.jog_speeds):
+            if not speed:
+                continue
+            if self.clock > self._jog_deadline or (
+                    self.limit_switch(index) and speed * HOME_DIRECTIONS[index] > 0):
+                self._end_jog(index)
+            else:
+                self.steppers[index].run_speed(speed, dt)
+
+        # Концевики останавливают ось и сбрасывают ее флаги (stopAtSwitch скетча):
+        # цель движения runSpeed() фиксируется на концевике, сегмент
+        # останавливается, только если едет на концевик
+        for index, stepper in enumerate(self.steppers):
+            pressed = self.limit_switch(index)
+            if pressed:
+                speed_move = any(self.flags[flag] for flag in self.LIMIT_FLAGS[index])
+                if speed_move or stepper.distance_to_go() * HOME_DIRECTIONS[index] > 0:
+                    stepper.halt()
+                for flag in self.LIMIT_FLAGS[index]:
+                    self.flags[flag] = False
+                self.latched[index] = True
+
+        # В скетче остановка привязана к else ветке концевика кисти
+        if self.flags['stop_motor'] and not self.limit_switch(3):
+            for stepper in self.steppers:
+                stepper.stop()
+
+        # Ось, которую на этом проходе крутил runSpeed(), run() не двигает:
+        # в AccelStepper у них общий таймер шага, и шаг уже сделан
+        for index, stepper in enumerate(self.steppers):
+            if (jog is None or jog[0] != index) and not self.jog_speeds[index]:
+                stepper.run(dt)
+
+        self._update_joints()
+        self._update_segments()
+
+    def _update_joints(self):
+        """Выходные звенья двигаются, только когда двигатель выбрал зазор передачи."""
+        for index, stepper in enumerate(self.steppers):
+            gap = self.backlash[index] / 2
+            joint = self.joints[index]
+            if stepper.position - joint > gap:
+                self.joints[index] = stepper.position - gap
+            elif joint - stepper.position > gap:
+                self.joints[index] = stepper.position + gap
+
+    # --- Очередь сегментов ---
+
+    def _update_segments(self):
+        """Завершает текущий сегмент и запускает следующий из очереди."""
+        if self.current is not None:
+            if any(stepper.distance_to_go() for stepper in self.steppers):
+                if not (self.queue and self._can_blend(self.queue[0])):
+                    return
+            self._reply(f"{protocol.REPLY_DONE}:{self.current.seq}")
+            self.done_seq = self.current.seq
+            self.current = None
+
+        if self.queue:
+            self._start_segment(self.queue.popleft())
+        elif self._profiles_scaled and not self.is_moving():
+            # Очередь пуста - возвращаем полные скорости для ручного режима
+            for stepper in self.steppers:
+                stepper.max_speed = protocol.MAX_SPEED
+                stepper.acceleration = protocol.ACCELERATION
+            self._profiles_scaled = False
+
+    def _can_blend(self, following):
+        """
+        Проверяет, можно ли перейти к следующему сегменту без остановки:
+        у него нет пневматики и обнуления, движутся те же оси, что и сейчас,
+        каждая продолжает движение в ту же сторону и уже тормозит, а доли
+        скорости осей (BLEND_SHARE_TOLERANCE) не меняются. Масштабирование
+        в _start_segment() рассчитано на старт с места, поэтому при других
+        долях оси, уже имеющие скорость, пришли бы в цель не одновременно.
+        """
+        if following.vacuum is not None or following.doza is not None or following.zero:
+            return False
+        distances = [abs(following.targets[i] - stepper.position) if following.mask & (1 << i) else 0
+                     for i, stepper in enumerate(self.steppers)]
+        longest = max(distances)
+        if not longest:
+            return False
+        for index, stepper in enumerate(self.steppers):
+            remaining = stepper.distance_to_go()
+            step = following.targets[index] - self.current.targets[index]
+            if not remaining and not step:
+                continue
+            if step * remaining <= 0:
+                return False
+            # Как в прошивке, путь торможения считается по полному ускорению
+            if abs(remaining) > stepper.speed ** 2 / (2 * protocol.ACCELERATION) + 1:
+                return False
+            share = stepper.max_speed / protocol.MAX_SPEED
+            if abs(distances[index] / longest - share) > protocol.BLEND_SHARE_TOLERANCE:
+                return False
+        return True
+
+    def _start_segment(self, segment):
+        """Начало выполнения сегмента: пневматика, обнуление и новые цели."""
+        if segment.zero:
+            for index, stepper in enumerate(self.steppers):
+                self.joints[index] -= stepper.position  # Зазор передачи сохраняется
+                self.limit_positions[index] -= stepper.position
+                stepper.position = stepper.target = 0.0
+                stepper.speed = 0.0
+        if segment.vacuum is not None:
+            self.outputs['vacuum'] = segment.vacuum
+        if segment.doza is not None:
+            self.outputs['doza'] = segment.doza
+        self.magazine += segment.magazin
+
+        # Согласованное движение: скорости и ускорения осей пропорциональны
+        # их перемещениям, поэтому все оси приходят в цель одновременно
+        deltas = [segment.targets[i] - stepper.position if segment.mask & (1 << i) else 0
+                  for i, stepper in enumerate(self.steppers)]
+        for stepper, delta, profile in zip(self.steppers, deltas, motion_profile.scaled_profiles(deltas)):
+            if profile is not None:
+                stepper.max_speed, stepper.acceleration = profile
+                stepper.move_to(stepper.position + delta)
+                self._profiles_scaled = True
+
+        self.current = segment
+        self._reply(f"{protocol.REPLY_RUN}:{segment.seq}|{protocol.FREE}:{self.free_slots()}")
+
+    # --- Состояние ---
+
+    def is_moving(self):
+        """Возвращает True, если хотя бы одна ось в движении."""
+        return any(stepper.is_running() for stepper in self.steppers)
+
+    def positions(self):
+        """Возвращает текущие позиции осей в шагах."""
+        return [int(round(stepper.position)) for stepper in self.steppers]
+
+    def joint_positions(self):
+        """Возвращает положения выходных звеньев (шаги двигателя, с учетом люфта)."""
+        return list(self.joints)
+
+    def status(self):
+        """Возвращает состояние прошивки для кадра состояния."""
+        moving = sum(1 << i for i, s in enumerate(self.steppers) if s.is_running() or self.jog_speeds[i])
+        limits = sum(1 << i for i in range(len(self.steppers)) if self.limit_switch(i))
+        return protocol.StatusFrame(tuple(self.positions()), moving, limits, self.free_slots(), self.done_seq)
+
+    def status_line(self):
+        """Формирует кадр состояния: позиции, маски движения и концевиков, очередь."""
+        return protocol.encode_status(self.status())
+
+    def _reply(self, line):
+        """Ставит строку в очередь на отправку (как Serial.println)."""
+        self._output.append(line + "\r\n")
+
+    def read_output(self):
+        """
+        Забирает накопленные для хоста данные.
+
+        Returns:
+            bytes: Данные для отправки (может быть пусто)
+        """
+        data = "".join(self._output).encode('ascii')
+        self._output.clear()
+        return data
+
+
+class ArduinoSimulator:
+    """
+    Виртуальная Arduino на псевдотерминале.
+    Модель прошивки работает в фоновом потоке в реальном (или ускоренном) времени.
+    """
+
+    def __init__(self, time_scale=1.0, poll_interval=0.001, **model_kwargs):
+        """
+        Args:
+            time_scale (float): Ускорение модельного времени (1.0 - реальное время)
+            poll_interval (float): Период опроса порта (с)
+            **model_kwargs: Параметры FirmwareModel
+        """
+        self.model = FirmwareModel(**model_kwargs)
+        self.time_scale = time_scale
+        self.poll_interval = poll_interval
+        self.port = None  # Путь к подчиненной стороне pty
+        self._master = None
+        self._slave = None
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """
+        Открывает pty и запускает поток эмуляции.
+
+        Returns:
+            str: Путь к порту для подключения
+        """
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        """Останавливает эмуляцию и закрывает pty."""
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        """Основной цикл: прием байтов, моделирование, отправка ответов."""
+        last = time.monotonic()
+        while self._running:
+            ready, _, _ = select.select([self._master], [], [], self.poll_interval)
+            if ready:
+                try:
+                    self.model.feed(os.read(self._master, 1024))
+                except OSError:
+                    pass
+
+            now = time.monotonic()
+            self.model.advance((now - last) * self.time_scale)
+            last = now
+
+            output = self.model.read_output()
+            if output:
+                os.write(self._master, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Виртуальная Arduino на псевдотерминале")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="ускорение модельного времени")
+    parser.add_argument("--backlash", default="0,0,0,0",
+                        help="люфт передач в шагах по осям " + ",".join(protocol.AXES))
+    args = parser.parse_args()
+
+    backlash = tuple(int(value) for value in args.backlash.split(","))
+    with ArduinoSimulator(time_scale=args.time_scale, backlash=backlash) as simulator:
+        print(f"Эмулятор Arduino запущен на {simulator.port}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("Эмулятор остановлен")
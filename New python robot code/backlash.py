@@ -0,0 +1,218 @@
+"""
+Компенсация люфта осей при смене направления движения.
+
+Притирка и обход сетки змейкой постоянно меняют направление руки, и при
+каждом развороте часть перемещения двигателя уходит на выбор зазора в
+передаче. Компенсатор запоминает последнее направление каждой оси и при
+развороте добавляет к цели двигателя величину люфта (в шагах). Сумма
+добавленных шагов (offset) - разница между целью двигателя в кадрах
+сегментов и логической целью оси: ее учитывают ArduinoStepSender и
+пересчет фактических позиций из кадров состояния.
+
+Величины люфта хранятся в файле backlash.json и оцениваются повторными
+подходами: ось сдвигается вперед и назад на одно и то же расстояние,
+положение выходного звена измеряется после каждого сдвига, недоход
+после разворота и есть люфт.
+
+    python backlash.py --emulator --emulator-backlash 0,40,0,0   # проверка на эмуляторе
+    python backlash.py --port /dev/ttyUSB0 --axes RUKA --save    # измерение индикатором
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+from collections import namedtuple
+
+import protocol
+
+# Файл с величинами люфта (шаги двигателя по осям)
+BACKLASH_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backlash.json")
+
+# Результат оценки люфта оси: оценка (шаги) и измерения по циклам
+BacklashEstimate = namedtuple('BacklashEstimate', 'axis steps samples')
+
+
+def load_backlash(path=BACKLASH_FILE):
+    """
+    Читает величины люфта из файла.
+
+    Args:
+        path (str): Путь к файлу JSON
+
+    Returns:
+        dict: {ОСЬ: шаги}; пустой словарь, если файла нет или он поврежден
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return {axis: int(data[axis]) for axis in protocol.AXES if axis in data}
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Ошибка чтения люфта {path}: {e}")
+        return {}
+
+
+def save_backlash(values, path=BACKLASH_FILE):
+    """
+    Записывает величины люфта (атомарно: через временный файл).
+
+    Args:
+        values (dict): {ОСЬ: шаги}
+        path (str): Путь к файлу
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({axis: int(values[axis]) for axis in protocol.AXES if axis in values}, f, indent=2)
+    os.replace(temp_path, path)
+
+
+class BacklashCompensator:
+    """
+    Учет направления движения и выбора люфта по осям.
+
+    Первое движение оси после создания компенсатора люфт не выбирает:
+    направление, в котором передача прижата, до него неизвестно.
+    """
+
+    def __init__(self, backlash=None):
+        """
+        Args:
+            backlash (dict, optional): {ОСЬ: шаги}; None - без компенсации
+        """
+        self.backlash = {axis: int((backlash or {}).get(axis, 0)) for axis in protocol.AXES}
+        self.direction = dict.fromkeys(protocol.AXES, 0)  # Последнее направление (-1, 0, 1)
+        self.offset = dict.fromkeys(protocol.AXES, 0)  # Добавленные шаги (цель двигателя - логическая цель)
+
+    def take_up(self, axis, delta):
+        """
+        Учитывает перемещение двигателя оси и возвращает шаги выбора люфта.
+
+        Args:
+            axis (str): Ось
+            delta (int): Перемещение двигателя без компенсации (шаги)
+
+        Returns:
+            int: Шаги, которые нужно добавить к перемещению (0, если направление не изменилось)
+        """
+        if not delta:
+            return 0
+        direction = 1 if delta > 0 else -1
+        previous, self.direction[axis] = self.direction[axis], direction
+        if not previous or previous == direction or not self.backlash[axis]:
+            return 0
+        extra = direction * self.backlash[axis]
+        self.offset[axis] += extra
+        return extra
+
+    def reset(self):
+        """Обнуляет добавленные шаги (новое начало координат); направления сохраняются."""
+        self.offset = dict.fromkeys(protocol.AXES, 0)
+
+
+def estimate_axis(axis, move, measure, distance, repeats=5):
+    """
+    Оценивает люфт оси повторными подходами.
+
+    Каждый цикл: сдвиг вперед на distance, измерение, сдвиг назад,
+    измерение. Недоход выходного звена после разворота - люфт. Первый
+    цикл не учитывается: начальное положение передачи в зазоре неизвестно.
+
+    Args:
+        axis (str): Ось (protocol.AXES)
+        move (callable): move(axis, delta) - сдвиг оси на delta (единицы оси), ждет окончания
+        measure (callable): measure(axis) - положение выходного звена (единицы оси)
+        distance (float): Длина подхода (единицы оси), больше ожидаемого люфта
+        repeats (int): Количество учитываемых циклов
+
+    Returns:
+        BacklashEstimate: Медиана недохода в шагах и недоходы по циклам
+
+    Raises:
+        ValueError: Если выходное звено не сдвинулось: длина подхода не больше люфта
+    """
+    scale = abs(protocol.STEPS_PER_UNIT[axis])
+    samples = []
+    for cycle in range(repeats + 1):
+        move(axis, distance)
+        forward = measure(axis)
+        move(axis, -distance)
+        backward = measure(axis)
+        if cycle:
+            samples.append((distance - abs(forward - backward)) * scale)
+    if max(samples) >= abs(distance) * scale - 0.5:
+        raise ValueError(f"{axis}: длина подхода {distance:g} не больше люфта, увеличьте --distance")
+    return BacklashEstimate(axis, max(0, round(statistics.median(samples))), samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Оценка люфта осей повторными подходами")
+    parser.add_argument("--port", help="порт Arduino (положение вводится с клавиатуры)")
+    parser.add_argument("--emulator", action="store_true", help="измерить на эмуляторе прошивки")
+    parser.add_argument("--emulator-backlash", default="0,0,0,0",
+                        help="люфт эмулятора в шагах по осям " + ",".join(protocol.AXES))
+    parser.add_argument("--time-scale", type=float, default=20.0, help="ускорение эмулятора")
+    parser.add_argument("--axes", default="PLECHO,RUKA", help="оси через запятую")
+    parser.add_argument("--distance", type=float, default=5.0, help="длина подхода (единицы оси)")
+    parser.add_argument("--repeats", type=int, default=5, help="количество циклов")
+    parser.add_argument("--save", action="store_true", help="записать результат в " + BACKLASH_FILE)
+    args = parser.parse_args()
+
+    if not args.port and not args.emulator:
+        parser.error("нужен --port или --emulator")
+    axes = [axis.strip().upper() for axis in args.axes.split(",")]
+    unknown = [axis for axis in axes if axis not in protocol.AXES]
+    if unknown:
+        parser.error(f"неизвестные оси: {', '.join(unknown)}")
+
+    from steps_for_arduino import ArduinoStepSender
+
+    simulator = None
+    port = args.port
+    if args.emulator:
+        from arduino_simulator import ArduinoSimulator
+        simulated = tuple(int(value) for value in args.emulator_backlash.split(","))
+        simulator = ArduinoSimulator(time_scale=args.time_scale, backlash=simulated)
+        port = simulator.start()
+
+        def measure(axis):
+            index = protocol.AXES.index(axis)
+            return simulator.model.joint_positions()[index] / protocol.STEPS_PER_UNIT[axis]
+    else:
+        def measure(axis):
+            while True:
+                try:
+                    return float(input(f"Положение {axis} по индикатору (единицы оси): ").replace(",", "."))
+                except ValueError:
+                    print("Введите число")
+
+    # Оценка ведется без компенсации: нужен люфт самой передачи
+    sender = ArduinoStepSender(port=port, debug_mode=False, backlash={})
+    if not sender.connection:
+        print(f"Не удалось подключиться к {port}")
+        sys.exit(1)
+
+    def move(axis, delta):
+        sender.send_step(**{axis.lower(): delta})
+        sender.wait_idle(timeout=60)
+
+    try:
+        values = load_backlash()
+        for axis in axes:
+            try:
+                estimate = estimate_axis(axis, move, measure, args.distance, args.repeats)
+            except ValueError as e:
+                print(e)
+                continue
+            values[axis] = estimate.steps
+            spread = max(estimate.samples) - min(estimate.samples)
+            print(f"{axis}: люфт {estimate.steps} шагов (разброс {spread:.1f} шагов по {len(estimate.samples)} циклам)")
+    finally:
+        sender.close()
+        if simulator:
+            simulator.stop()
+
+    if args.save:
+        save_backlash(values)
+        print(f"Люфт сохранен в {BACKLASH_FILE}")
@@ -0,0 +1,88 @@
+"""
+Сравнение времени запуска графического интерфейса и headless.py.
+
+Каждый вариант запускается в отдельном процессе интерпретатора (без
+кэша импортов текущего процесса), измеряется время импорта модулей
+точки входа. Для интерфейса дополнительно измеряется создание окна
+со всеми панелями - только если доступен дисплей.
+
+    python benchmarks/startup_time.py --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Каталог с модулями программы
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Код, выполняемый в дочернем процессе: печатает время и загруженные тяжелые модули
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in ('tkinter', 'serial', 'arduino_simulator') if name in sys.modules]
+print(elapsed, ','.join(heavy))
+"""
+
+WINDOW_PROBE = """
+import sys, time
+start = time.perf_counter()
+import tkinter as tk
+import main
+root = tk.Tk()
+app = main.SerialApp(root)
+root.update()
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(name for name in ('tkinter', 'serial') if name in sys.modules))
+"""
+
+SCENARIOS = {
+    "headless (импорт)": IMPORT_PROBE.format(module="headless"),
+    "интерфейс (импорт)": IMPORT_PROBE.format(module="main"),
+}
+
+
+def measure(code, runs):
+    """
+    Запускает код в отдельных процессах.
+
+    Args:
+        code (str): Код дочернего процесса
+        runs (int): Количество запусков
+
+    Returns:
+        tuple: (времена в секундах, загруженные тяжелые модули) или None при ошибке
+    """
+    times = []
+    modules = ""
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], cwd=CODE_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "Ошибка запуска")
+            return None
+        line = result.stdout.strip().splitlines()[-1]
+        elapsed, _, modules = line.partition(" ")
+        times.append(float(elapsed))
+    return times, modules
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Время запуска интерфейса и headless.py")
+    parser.add_argument("--runs", type=int, default=10, help="количество запусков каждого варианта")
+    args = parser.parse_args()
+
+    scenarios = dict(SCENARIOS)
+    if os.environ.get("DISPLAY") or sys.platform == "win32":
+        scenarios["интерфейс (окно)"] = WINDOW_PROBE
+
+    for name, code in scenarios.items():
+        measured = measure(code, args.runs)
+        if measured is None:
+            print(f"{name}: не удалось измерить")
+            continue
+        times, modules = measured
+        print(f"{name}: медиана {statistics.median(times) * 1e3:.1f} мс, "
+              f"минимум {min(times) * 1e3:.1f} мс, загружены: {modules or '-'}")
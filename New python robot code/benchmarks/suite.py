@@ -0,0 +1,302 @@
+"""
+Набор тестов производительности без подключения к оборудованию.
+
+Измеряются кинематика (по точке и пакетом), построение сетки печки,
+формирование кадров сегментов, загрузка программ большого размера и
+расчет программы контроллером с отправителем без подключения
+(RecordingStepSender). Список шагов интерфейса измеряется, только если
+доступен дисплей.
+
+Для каждого теста берется лучшее время из нескольких повторов (меньше
+всего зависит от фоновой нагрузки). Результаты сохраняются в JSON и
+сравниваются с сохраненной базой: тест, замедлившийся больше порога,
+отмечается как регрессия, код возврата - 1.
+
+    python benchmarks/suite.py --save benchmarks/baseline.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json --threshold 0.2
+    python benchmarks/suite.py --filter grid
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Модули программы лежат в родительском каталоге
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODE_DIR)
+
+import matrics  # noqa: E402
+import program_blocks  # noqa: E402
+import program_format  # noqa: E402
+import program_io  # noqa: E402
+import protocol  # noqa: E402
+from kinematics import Kinematics  # noqa: E402
+from manipulator import ManipulatorController  # noqa: E402
+from steps_for_arduino import RecordingStepSender  # noqa: E402
+
+# Размеры сетки (строк, столбцов) для 10, 1 000 и 100 000 точек
+GRID_SIZES = {10: (2, 5), 1000: (25, 40), 100_000: (250, 400)}
+
+# Длина программы для тестов загрузки
+PROGRAM_STEPS = 50_000
+
+# Точки для тестов кинематики (фиксированное зерно - одинаковые данные при каждом запуске)
+IK_POINTS = 10_000
+
+# Порог регрессии по умолчанию (доля замедления)
+DEFAULT_THRESHOLD = 0.2
+
+# Зарегистрированные тесты: имя -> функция подготовки, возвращающая измеряемую функцию
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Регистрирует функцию подготовки теста."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@contextlib.contextmanager
+def grid(rows, cols):
+    """Временно задает размер сетки печки (без сохранения в файл позиций)."""
+    saved = dict(matrics.glue_point)
+    matrics.glue_point.update({'X': '150', 'Y': '100', 'Z': '100', 'rows': str(rows), 'cols': str(cols)})
+    try:
+        yield
+    finally:
+        matrics.glue_point.clear()
+        matrics.glue_point.update(saved)
+
+
+def _ik_points():
+    rng = random.Random(42)
+    return [(rng.uniform(-350, 350), rng.uniform(-350, 350)) for _ in range(IK_POINTS)]
+
+
+@benchmark(f"ik/scalar {IK_POINTS}")
+def _ik_scalar(stack):
+    model, points = Kinematics(), _ik_points()
+    return lambda: [model._calc_angles(x, y) for x, y in points]
+
+
+@benchmark(f"ik/batch {IK_POINTS}")
+def _ik_batch(stack):
+    model, points = Kinematics(), _ik_points()
+    return lambda: model.calc_angles_batch(points)
+
+
+def _grid_benchmark(points):
+    def setup(stack):
+        stack.enter_context(grid(*GRID_SIZES[points]))
+        return matrics.get_grid_coordinates
+    return setup
+
+
+for _points in GRID_SIZES:
+    benchmark(f"grid/coordinates {_points}")(_grid_benchmark(_points))
+
+
+@benchmark("frame/encode_segment 1000")
+def _encode_segment(stack):
+    fields = [{'PLECHO': i, 'RUKA': -i, 'LIFT': 2 * i, 'VACUUM': 'HIGH'} for i in range(1000)]
+    encode = protocol.encode_segment
+    return lambda: [encode(seq, f) for seq, f in enumerate(fields)]
+
+
+@benchmark("frame/send_step 1000")
+def _send_step(stack):
+    def run():
+        sender = RecordingStepSender()
+        for i in range(1000):
+            sender.send_step(plecho=1.5, ruka=-0.5, lift=i % 7)
+    return run
+
+
+def _program_file(stack, extension):
+    """Создает временный файл программы из PROGRAM_STEPS шагов."""
+    directory = stack.enter_context(tempfile.TemporaryDirectory())
+    path = os.path.join(directory, "program" + extension)
+    commands = ["Движение к печке", "Опуститься до печки", "Включить дозатор",
+                "Выключить дозатор", "Подняться"] * (PROGRAM_STEPS // 5)
+    glue = {'X': '150', 'Y': '100', 'Z': '100', 'rows': '1', 'cols': '1'}
+    magazine = {'X': '200', 'Y': '-50', 'Z': '100'}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        program_io.save_program(path, commands, glue, magazine)
+    return path
+
+
+@benchmark(f"program/load json {PROGRAM_STEPS}")
+def _load_json(stack):
+    path = _program_file(stack, ".json")
+    return lambda: program_io.load_program(path)
+
+
+@benchmark(f"program/load binary {PROGRAM_STEPS}")
+def _load_binary(stack):
+    path = _program_file(stack, program_format.EXTENSION)
+    return lambda: program_io.load_program(path)
+
+
+@benchmark("run/grid program 1000 points")
+def _run_program(stack):
+    stack.enter_context(grid(*GRID_SIZES[1000]))
+    steps = ["В исходное положение", "Для каждой точки сетки", "Движение к магазину",
+             "Опуститься до магазина", "Включить вакуум", "Подняться", "Движение к печке",
+             "Опуститься до печки", "Притирка", "Выключить вакуум", "Подняться", "Конец блока"]
+    devnull = stack.enter_context(open(os.devnull, 'w'))
+
+    def run():
+        controller = ManipulatorController(sender=RecordingStepSender())
+        with contextlib.redirect_stdout(devnull):
+            for command in program_blocks.expand(steps):
+                controller.execute_command(command)
+    return run
+
+
+def _steps_list_benchmark():
+    """Загрузка и очистка списка шагов интерфейса (нужен дисплей)."""
+    import tkinter as tk
+    from commands_step import StepsCommandsFrame
+
+    def setup(stack):
+        root = tk.Tk()
+        stack.callback(root.destroy)
+        frame = StepsCommandsFrame(root, None)
+        commands = ["Движение к печке"] * PROGRAM_STEPS
+
+        def run():
+            frame.set_steps(commands)
+            root.update()
+            frame.clear()
+            root.update()
+        return run
+    return setup
+
+
+def measure(func, repeat, min_time=0.2):
+    """
+    Измеряет время вызова функции.
+
+    Число вызовов в одном повторе подбирается так, чтобы повтор длился
+    не меньше min_time.
+
+    Args:
+        func (callable): Измеряемая функция
+        repeat (int): Количество повторов
+        min_time (float): Минимальная длительность повтора (с)
+
+    Returns:
+        dict: {'best': с, 'median': с, 'number': вызовов в повторе}
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return {'best': min(times), 'median': statistics.median(times), 'number': number}
+
+
+def run_benchmarks(benchmarks, repeat):
+    """
+    Выполняет тесты.
+
+    Returns:
+        dict: Результаты {имя: результат measure()}
+    """
+    results = {}
+    for name, setup in benchmarks.items():
+        with contextlib.ExitStack() as stack:
+            func = setup(stack)
+            results[name] = measure(func, repeat)
+        print(f"{name:36s} {_format_time(results[name]['best'])}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Сравнивает результаты с базой.
+
+    Args:
+        results (dict): Текущие результаты
+        baseline (dict): Результаты из файла базы
+        threshold (float): Допустимое замедление (0.2 - на 20%)
+
+    Returns:
+        list: Регрессии (имя, время в базе, текущее время)
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = result['best'] / base['best']
+        mark = "РЕГРЕССИЯ" if ratio > 1 + threshold else ("быстрее" if ratio < 1 - threshold else "")
+        print(f"{name:36s} {_format_time(base['best'])} -> {_format_time(result['best'])} ({ratio:.2f}x) {mark}")
+        if ratio > 1 + threshold:
+            regressions.append((name, base['best'], result['best']))
+    return regressions
+
+
+def _format_time(seconds):
+    for unit, scale in (("с", 1), ("мс", 1e-3), ("мкс", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.0f} нс"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Тесты производительности без оборудования")
+    parser.add_argument("--repeat", type=int, default=5, help="количество повторов каждого теста")
+    parser.add_argument("--filter", help="выполнить только тесты, имя которых содержит строку")
+    parser.add_argument("--save", help="сохранить результаты в файл JSON (новая база)")
+    parser.add_argument("--baseline", help="сравнить с базой из файла JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое замедление относительно базы (0.2 - на 20%%)")
+    args = parser.parse_args(argv)
+
+    benchmarks = dict(BENCHMARKS)
+    if os.environ.get("DISPLAY") or sys.platform == "win32":
+        benchmarks[f"steps/set and clear {PROGRAM_STEPS}"] = _steps_list_benchmark()
+    if args.filter:
+        benchmarks = {name: setup for name, setup in benchmarks.items() if args.filter in name}
+
+    results = run_benchmarks(benchmarks, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.platform(),
+                       'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nСравнение с {args.baseline} (Python {baseline.get('python')}, {baseline.get('machine')}):")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"Регрессий: {len(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Калибровка кинематики по измеренным точкам.
+
+Длины рычагов, нулевые положения осей и положение основания
+подбираются методом наименьших квадратов (Левенберг - Марквардт) по
+парам "заданные углы - измеренное положение инструмента". Результат
+записывается в файл калибровки, который Kinematics читает при создании.
+
+Модель - двухзвенная цепь, эквивалентная Kinematics._calc_angles():
+    первый рычаг:  t1 = плечо - SHOULDER_OFFSET
+    второй рычаг:  t2 = t1 + рука + ARM_OFFSET - 180
+    инструмент:    (BASE_X, BASE_Y) + L1 * (cos t1, sin t1) + L2 * (cos t2, sin t2)
+
+Файл точек - CSV с заголовком arm,shoulder,x,y: углы руки и плеча
+(градусы, как в Kinematics) и измеренные координаты инструмента (мм).
+
+    python calibration.py points.csv
+    python calibration.py points.csv --base           # подбирать и положение основания
+    python calibration.py points.csv --dry-run        # только отчет, без записи файла
+"""
+import argparse
+import csv
+import datetime
+import json
+import math
+import os
+from collections import namedtuple
+
+import kinematics
+
+# Подбираемые параметры (имена как в kinematics.DEFAULT_PARAMETERS)
+LINK_PARAMETERS = ('L1', 'L2', 'ARM_OFFSET', 'SHOULDER_OFFSET')
+BASE_PARAMETERS = ('BASE_X', 'BASE_Y')
+
+# Измерение: заданные углы (градусы) и измеренное положение (мм)
+Sample = namedtuple('Sample', 'arm shoulder x y')
+
+# Результат подбора: параметры, невязки (dx, dy) по точкам, СКО и максимум (мм), число итераций
+CalibrationResult = namedtuple('CalibrationResult', 'parameters residuals rms max_error iterations')
+
+_RAD = math.pi / 180
+
+
+def tool_position(parameters, arm, shoulder):
+    """
+    Положение инструмента для углов осей.
+
+    Args:
+        parameters (dict): Параметры механики (как kinematics.DEFAULT_PARAMETERS)
+        arm (float): Угол руки (градусы)
+        shoulder (float): Угол плеча (градусы)
+
+    Returns:
+        tuple: (x, y) в мм
+    """
+    t1 = (shoulder - parameters['SHOULDER_OFFSET']) * _RAD
+    t2 = t1 + (arm + parameters['ARM_OFFSET'] - 180) * _RAD
+    return (parameters['BASE_X'] + parameters['L1'] * math.cos(t1) + parameters['L2'] * math.cos(t2),
+            parameters['BASE_Y'] + parameters['L1'] * math.sin(t1) + parameters['L2'] * math.sin(t2))
+
+
+def residuals(samples, parameters):
+    """
+    Невязки модели по точкам.
+
+    Returns:
+        list: (dx, dy) - расчетное положение минус измеренное, мм
+    """
+    result = []
+    for sample in samples:
+        x, y = tool_position(parameters, sample.arm, sample.shoulder)
+        result.append((x - sample.x, y - sample.y))
+    return result
+
+
+def _statistics(errors):
+    """СКО и максимум расстояний по невязкам."""
+    distances = [math.hypot(dx, dy) for dx, dy in errors]
+    return math.sqrt(sum(d * d for d in distances) / len(distances)), max(distances)
+
+
+def _normal_equations(samples, parameters, names):
+    """
+    Строит нормальные уравнения J^T J и J^T r без хранения всей матрицы Якоби.
+
+    Returns:
+        tuple: (J^T J, J^T r, сумма квадратов невязок)
+    """
+    size = len(names)
+    jtj = [[0.0] * size for _ in range(size)]
+    jtr = [0.0] * size
+    cost = 0.0
+    l1, l2 = parameters['L1'], parameters['L2']
+    for sample in samples:
+        t1 = (sample.shoulder - parameters['SHOULDER_OFFSET']) * _RAD
+        t2 = t1 + (sample.arm + parameters['ARM_OFFSET'] - 180) * _RAD
+        c1, s1, c2, s2 = math.cos(t1), math.sin(t1), math.cos(t2), math.sin(t2)
+        rx = parameters['BASE_X'] + l1 * c1 + l2 * c2 - sample.x
+        ry = parameters['BASE_Y'] + l1 * s1 + l2 * s2 - sample.y
+        cost += rx * rx + ry * ry
+
+        # Производные (dx, dy) по каждому параметру; углы - в градусах
+        derivatives = {
+            'L1': (c1, s1),
+            'L2': (c2, s2),
+            'ARM_OFFSET': (-l2 * s2 * _RAD, l2 * c2 * _RAD),
+            'SHOULDER_OFFSET': ((l1 * s1 + l2 * s2) * _RAD, -(l1 * c1 + l2 * c2) * _RAD),
+            'BASE_X': (1.0, 0.0),
+            'BASE_Y': (0.0, 1.0),
+        }
+        rows = [derivatives[name] for name in names]
+        for i, (xi, yi) in enumerate(rows):
+            jtr[i] += xi * rx + yi * ry
+            row = jtj[i]
+            for j in range(i, size):
+                row[j] += xi * rows[j][0] + yi * rows[j][1]
+    for i in range(size):
+        for j in range(i):
+            jtj[i][j] = jtj[j][i]
+    return jtj, jtr, cost
+
+
+def _solve(matrix, vector):
+    """
+    Решает систему линейных уравнений методом Гаусса с выбором главного элемента.
+
+    Returns:
+        list: Решение или None, если матрица вырождена
+    """
+    size = len(vector)
+    rows = [row[:] + [value] for row, value in zip(matrix, vector)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) < 1e-300:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(col + 1, size):
+            factor = rows[r][col] / rows[col][col]
+            if factor:
+                for c in range(col, size + 1):
+                    rows[r][c] -= factor * rows[col][c]
+    solution = [0.0] * size
+    for r in range(size - 1, -1, -1):
+        solution[r] = (rows[r][size] - sum(rows[r][c] * solution[c] for c in range(r + 1, size))) / rows[r][r]
+    return solution
+
+
+def fit(samples, initial=None, fit_base=False, max_iterations=200, tolerance=1e-12):
+    """
+    Подбирает параметры механики по измеренным точкам.
+
+    Args:
+        samples (list): Измерения (Sample)
+        initial (dict, optional): Начальные параметры. Defaults to kinematics.DEFAULT_PARAMETERS.
+        fit_base (bool): Подбирать положение основания (иначе оно берется из initial)
+        max_iterations (int): Максимальное количество итераций
+        tolerance (float): Относительное изменение суммы квадратов для остановки
+
+    Returns:
+        CalibrationResult: Подобранные параметры и невязки
+
+    Raises:
+        ValueError: Если точек меньше, чем подбираемых параметров
+    """
+    names = LINK_PARAMETERS + (BASE_PARAMETERS if fit_base else ())
+    if len(samples) < len(names):
+        raise ValueError(f"Недостаточно точек: {len(samples)}, нужно не меньше {len(names)}")
+
+    parameters = {key: float(value) for key, value in {**kinematics.DEFAULT_PARAMETERS, **(initial or {})}.items()}
+    damping = 1e-3
+    jtj, jtr, cost = _normal_equations(samples, parameters, names)
+    iterations = 0
+    while iterations < max_iterations:
+        iterations += 1
+        # Демпфирование по диагонали (Марквардт): шаг не зависит от масштаба параметров
+        damped = [[value * (1 + damping) if i == j else value for j, value in enumerate(row)]
+                  for i, row in enumerate(jtj)]
+        step = _solve(damped, [-value for value in jtr])
+        if step is None:
+            damping *= 10
+            continue
+
+        candidate = dict(parameters)
+        for name, delta in zip(names, step):
+            candidate[name] += delta
+        candidate_jtj, candidate_jtr, candidate_cost = _normal_equations(samples, candidate, names)
+        if candidate_cost < cost:
+            converged = cost - candidate_cost <= tolerance * max(cost, 1e-30)
+            parameters, jtj, jtr, cost = candidate, candidate_jtj, candidate_jtr, candidate_cost
+            damping = max(damping / 10, 1e-12)
+            if converged:
+                break
+        else:
+            damping *= 10
+            if damping > 1e12:
+                break
+
+    errors = residuals(samples, parameters)
+    rms, max_error = _statistics(errors)
+    return CalibrationResult(parameters, errors, rms, max_error, iterations)
+
+
+def read_samples(path):
+    """
+    Читает измерения из CSV (заголовок arm,shoulder,x,y).
+
+    Returns:
+        list: Измерения (Sample)
+
+    Raises:
+        ValueError: Если в файле нет нужных столбцов или значения не числа
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        missing = set(Sample._fields) - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"В файле нет столбцов: {', '.join(sorted(missing))}")
+        try:
+            return [Sample(*(float(row[field]) for field in Sample._fields)) for row in reader]
+        except ValueError as e:
+            raise ValueError(f"Строка {reader.line_num}: {e}") from None
+
+
+def save_calibration(result, path=kinematics.CALIBRATION_FILE):
+    """
+    Записывает файл калибровки (атомарно: через временный файл).
+
+    Args:
+        result (CalibrationResult): Результат fit()
+        path (str): Путь к файлу
+    """
+    data = {
+        'parameters': result.parameters,
+        'rms': result.rms,
+        'max_error': result.max_error,
+        'points': len(result.residuals),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Калибровка кинематики по измеренным точкам")
+    parser.add_argument("points", help="CSV с измерениями: arm,shoulder,x,y")
+    parser.add_argument("--base", action="store_true", help="подбирать положение основания")
+    parser.add_argument("--output", default=kinematics.CALIBRATION_FILE, help="файл калибровки")
+    parser.add_argument("--dry-run", action="store_true", help="не записывать файл калибровки")
+    args = parser.parse_args()
+
+    try:
+        samples = read_samples(args.points)
+        current = {**kinematics.DEFAULT_PARAMETERS, **kinematics.load_calibration(args.output)}
+        result = fit(samples, current, fit_base=args.base)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка калибровки: {e}")
+        raise SystemExit(2)
+
+    before_rms, before_max = _statistics(residuals(samples, current))
+    print(f"Точек: {len(samples)}, итераций: {result.iterations}")
+    for name in LINK_PARAMETERS + BASE_PARAMETERS:
+        print(f"  {name:16s} {current[name]:10.4f} -> {result.parameters[name]:10.4f}")
+    print(f"СКО: {before_rms:.3f} -> {result.rms:.3f} мм, максимум: {before_max:.3f} -> {result.max_error:.3f} мм")
+    worst = sorted(range(len(samples)), key=lambda i: -math.hypot(*result.residuals[i]))[:5]
+    for index in worst:
+        dx, dy = result.residuals[index]
+        print(f"  точка {index + 1}: dx={dx:+.3f} dy={dy:+.3f} мм")
+
+    if not args.dry_run:
+        save_calibration(result, args.output)
+        print(f"Калибровка сохранена в {args.output}")
@@ -0,0 +1,180 @@
+"""
+Запись обмена с Arduino в бинарный файл с метками времени.
+
+Формат файла (только дозапись):
+- заголовок: MAGIC (4 байта) + версия (uint16) + резерв (uint16);
+- записи: время time.monotonic_ns() (uint64), направление (uint8),
+  длина (uint16) и сами байты кадра.
+Чтение выполняется через mmap, поэтому поиск по времени не требует
+загрузки всего файла.
+"""
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+MAGIC = b'SCAP'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sHH')
+RECORD_HEADER = struct.Struct('<QBH')
+
+# Направления кадров
+OUTBOUND = 0  # Хост -> Arduino
+INBOUND = 1  # Arduino -> хост
+
+CaptureRecord = namedtuple('CaptureRecord', 'timestamp direction payload')
+
+
+class CaptureWriter:
+    """Потокобезопасная запись кадров в конец файла захвата."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Путь к файлу захвата (создается при отсутствии)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab', buffering=0)
+        if self._file.tell() == 0:
+            self._file.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+
+    def record(self, direction, payload):
+        """
+        Записывает кадр с текущей монотонной меткой времени.
+
+        Args:
+            direction (int): OUTBOUND или INBOUND
+            payload (bytes): Байты кадра
+        """
+        payload = bytes(payload[:0xFFFF])
+        data = RECORD_HEADER.pack(time.monotonic_ns(), direction, len(payload)) + payload
+        with self._lock:
+            if self._file:
+                self._file.write(data)
+
+    def close(self):
+        """Закрывает файл захвата."""
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+class CaptureReader:
+    """
+    Чтение файла захвата через mmap.
+    Индекс смещений строится одним проходом по заголовкам записей.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Путь к файлу захвата
+
+        Raises:
+            ValueError: Если файл не является файлом захвата
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < FILE_HEADER.size:
+            self._file.close()
+            raise ValueError(f"Файл '{path}' не является файлом захвата")
+
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = FILE_HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Файл '{path}' не является файлом захвата версии {VERSION}")
+
+        self._offsets = array('Q')
+        self._timestamps = array('Q')
+        self._build_index()
+
+    def _build_index(self):
+        """Строит индекс смещений и меток времени. Оборванная запись в конце пропускается."""
+        offset, size = FILE_HEADER.size, len(self._map)
+        while offset + RECORD_HEADER.size <= size:
+            timestamp, _, length = RECORD_HEADER.unpack_from(self._map, offset)
+            if offset + RECORD_HEADER.size + length > size:
+                break
+            self._offsets.append(offset)
+            self._timestamps.append(timestamp)
+            offset += RECORD_HEADER.size + length
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        """
+        Возвращает запись по номеру.
+
+        Returns:
+            CaptureRecord: Метка времени (с), направление и байты кадра
+        """
+        offset = self._offsets[index]
+        timestamp, direction, length = RECORD_HEADER.unpack_from(self._map, offset)
+        start = offset + RECORD_HEADER.size
+        return CaptureRecord(timestamp / 1e9, direction, self._map[start:start + length])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def index_at(self, timestamp):
+        """
+        Находит первую запись не раньше указанного времени.
+
+        Args:
+            timestamp (float): Монотонное время (с)
+
+        Returns:
+            int: Номер записи (len(self), если таких нет)
+        """
+        return bisect.bisect_left(self._timestamps, int(timestamp * 1e9))
+
+    def close(self):
+        """Освобождает mmap и файл."""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CapturingSerial:
+    """
+    Обертка над serial.Serial, записывающая все отправленные
+    и принятые кадры. Остальные атрибуты передаются соединению.
+    """
+
+    def __init__(self, connection, writer):
+        """
+        Args:
+            connection: Открытое соединение serial.Serial
+            writer (CaptureWriter): Файл захвата
+        """
+        self.connection = connection
+        self.writer = writer
+
+    def write(self, data):
+        result = self.connection.write(data)
+        self.writer.record(OUTBOUND, data)
+        return result
+
+    def readline(self, *args, **kwargs):
+        line = self.connection.readline(*args, **kwargs)
+        if line:
+            self.writer.record(INBOUND, line)
+        return line
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
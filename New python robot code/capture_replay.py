@@ -0,0 +1,186 @@
+"""
+Анализ и воспроизведение файлов захвата обмена с Arduino.
+
+Примеры:
+    python capture_replay.py analyse run.scap
+    python capture_replay.py replay run.scap --emulator --out replay.scap
+"""
+import argparse
+import threading
+import time
+
+import protocol
+from capture import CaptureReader, CaptureWriter, CapturingSerial, INBOUND, OUTBOUND
+
+
+def _percentile(sorted_values, fraction):
+    """Возвращает перцентиль уже отсортированного списка."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def _summary(values):
+    """Сводка по списку интервалов (с)."""
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'min': values[0] if values else 0.0,
+        'mean': sum(values) / len(values) if values else 0.0,
+        'p50': _percentile(values, 0.5),
+        'p95': _percentile(values, 0.95),
+        'max': values[-1] if values else 0.0,
+    }
+
+
+def analyse(reader, stall_threshold=0.5):
+    """
+    Анализирует временные характеристики захвата.
+
+    Args:
+        reader (CaptureReader): Открытый файл захвата
+        stall_threshold (float): Пауза в обмене, считающаяся зависанием (с)
+
+    Returns:
+        dict: Количество кадров, интервалы между отправками, время ответа
+              и список зависаний (смещение от начала, длительность)
+    """
+    counts = {OUTBOUND: 0, INBOUND: 0}
+    send_gaps, round_trips, stalls = [], [], []
+    start = last = last_sent = None
+    waiting_since = None  # Время отправки кадра, на который еще нет ответа
+
+    for record in reader:
+        counts[record.direction] += 1
+        if start is None:
+            start = record.timestamp
+        if last is not None and record.timestamp - last >= stall_threshold:
+            stalls.append((last - start, record.timestamp - last))
+        last = record.timestamp
+
+        if record.direction == OUTBOUND:
+            if last_sent is not None:
+                send_gaps.append(record.timestamp - last_sent)
+            last_sent = record.timestamp
+            if waiting_since is None:
+                waiting_since = record.timestamp
+        elif waiting_since is not None:
+            round_trips.append(record.timestamp - waiting_since)
+            waiting_since = None
+
+    return {
+        'outbound': counts[OUTBOUND],
+        'inbound': counts[INBOUND],
+        'duration': (last - start) if start is not None else 0.0,
+        'send_gaps': _summary(send_gaps),
+        'round_trips': _summary(round_trips),
+        'stalls': stalls,
+    }
+
+
+def print_report(report):
+    """Выводит отчет analyse() в консоль."""
+    print(f"Кадров: отправлено {report['outbound']}, принято {report['inbound']}, "
+          f"длительность {report['duration']:.3f} с")
+    for title, key in (("Интервал отправки", 'send_gaps'), ("Время ответа", 'round_trips')):
+        s = report[key]
+        print(f"{title}: n={s['count']} min={s['min'] * 1e3:.2f} мс mean={s['mean'] * 1e3:.2f} мс "
+              f"p50={s['p50'] * 1e3:.2f} мс p95={s['p95'] * 1e3:.2f} мс max={s['max'] * 1e3:.2f} мс")
+    for offset, length in report['stalls']:
+        print(f"Зависание: через {offset:.3f} с, длительность {length:.3f} с")
+
+
+def replay(reader, port, baudrate=protocol.BAUDRATE, time_scale=1.0, writer=None, settle=1.0):
+    """
+    Повторно отправляет исходящие кадры захвата с исходными интервалами.
+
+    Args:
+        reader (CaptureReader): Исходный захват
+        port (str): Порт Arduino или эмулятора
+        baudrate (int): Скорость соединения
+        time_scale (float): Ускорение воспроизведения (2.0 - вдвое быстрее)
+        writer (CaptureWriter, optional): Захват нового обмена
+        settle (float): Время ожидания ответов после последнего кадра (с)
+
+    Returns:
+        int: Количество отправленных кадров
+    """
+    import serial
+
+    connection = serial.Serial(port, baudrate, timeout=0.1)
+    if writer:
+        connection = CapturingSerial(connection, writer)
+
+    running = True
+
+    def read_loop():
+        while running:
+            connection.readline()
+
+    reader_thread = threading.Thread(target=read_loop, daemon=True)
+    reader_thread.start()
+
+    sent = 0
+    origin = started = None
+    try:
+        for record in reader:
+            if record.direction != OUTBOUND:
+                continue
+            if origin is None:
+                origin, started = record.timestamp, time.monotonic()
+            # Планирование по монотонным часам без накопления ошибки
+            delay = started + (record.timestamp - origin) / time_scale - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            connection.write(record.payload)
+            sent += 1
+        time.sleep(settle)
+    finally:
+        running = False
+        reader_thread.join()
+        connection.close()
+    return sent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Анализ и воспроизведение захвата обмена с Arduino")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    analyse_parser = commands.add_parser("analyse", help="анализ временных характеристик")
+    analyse_parser.add_argument("capture")
+    analyse_parser.add_argument("--stall", type=float, default=0.5, help="порог зависания (с)")
+
+    replay_parser = commands.add_parser("replay", help="воспроизведение исходящих кадров")
+    replay_parser.add_argument("capture")
+    target = replay_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--port", help="порт Arduino")
+    target.add_argument("--emulator", action="store_true", help="воспроизвести на эмуляторе")
+    replay_parser.add_argument("--baudrate", type=int, default=protocol.BAUDRATE)
+    replay_parser.add_argument("--time-scale", type=float, default=1.0)
+    replay_parser.add_argument("--out", help="файл захвата для нового обмена")
+
+    args = parser.parse_args()
+
+    with CaptureReader(args.capture) as capture:
+        if args.command == "analyse":
+            print_report(analyse(capture, args.stall))
+        else:
+            out = CaptureWriter(args.out) if args.out else None
+            simulator = None
+            port = args.port
+            if args.emulator:
+                from arduino_simulator import ArduinoSimulator
+                simulator = ArduinoSimulator(time_scale=args.time_scale)
+                port = simulator.start()
+            try:
+                count = replay(capture, port, args.baudrate, args.time_scale, out)
+                print(f"Воспроизведено кадров: {count}")
+            finally:
+                if simulator:
+                    simulator.stop()
+                if out:
+                    out.close()
+            if args.out:
+                with CaptureReader(args.out) as result:
+                    print_report(analyse(result))
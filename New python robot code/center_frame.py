@@ -1,7 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import json
 import matrics
+import program_format
+import program_io
 from commands_step import StepsCommandsFrame
 
 
@@ -284,65 +285,56 @@ class CenterFrame(ttk.LabelFrame):
             print("Программа остановлена")
 
     def save_steps(self):
-        """Сохраняет программу в файл JSON"""
+        """Сохраняет программу в файл JSON или в двоичном формате"""
         filepath = filedialog.asksaveasfilename(
             defaultextension=".json",
-            filetypes=[("JSON Files", "*.json")],
+            filetypes=[("JSON Files", "*.json"), ("Программа (двоичная)", "*" + program_format.EXTENSION)],
             title="Сохранить программу"
         )
         if not filepath:
             return
 
-        data = {
-            "steps": self.steps_commands.get_steps(),
-            "glue_point": {
-                'X': self.glue_point['X'].get(),
-                'Y': self.glue_point['Y'].get(),
-                'Z': self.glue_point['Z'].get(),
-                'rows': self.glue_point['rows'].get(),
-                'cols': self.glue_point['cols'].get()
-            },
-            "magazine_pos": {k: v.get() for k, v in self.magazine_pos.items()}
+        glue_data = {
+            'X': self.glue_point['X'].get(),
+            'Y': self.glue_point['Y'].get(),
+            'Z': self.glue_point['Z'].get(),
+            'rows': self.glue_point['rows'].get(),
+            'cols': self.glue_point['cols'].get()
         }
+        magazine_data = {k: v.get() for k, v in self.magazine_pos.items()}
 
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+            commands = list(self.steps_commands.get_steps().values())
+            program_io.save_program(filepath, commands, glue_data, magazine_data)
             self._update_positions()
             print(f"Программа сохранена в {filepath}")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка при сохранении: {str(e)}")
 
     def load_steps(self):
-        """Загружает программу из файла JSON"""
+        """Загружает программу из файла JSON или двоичного файла"""
         filepath = filedialog.askopenfilename(
-            filetypes=[("JSON Files", "*.json")],
+            filetypes=[("Программы", "*.json *" + program_format.EXTENSION), ("JSON Files", "*.json"),
+                       ("Программа (двоичная)", "*" + program_format.EXTENSION)],
             title="Загрузить программу"
         )
         if not filepath:
             return
 
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            # Очищаем текущие шаги
-            for step_num in list(self.steps_commands.steps.keys()):
-                self.steps_commands.delete_step(self.steps_commands.step_frames[step_num])
+            commands, glue_data, magazine_data = program_io.load_program(filepath)
 
-            # Загружаем новые шаги
-            for step_num, command in sorted(data["steps"].items()):
-                self.steps_commands.add_command(command)
+            # Заменяем все шаги за одну перерисовку
+            self.steps_commands.set_steps(commands)
 
             # Загружаем позиции
-            glue_data = data.get("glue_point", {})
             for k in ['X', 'Y', 'Z', 'rows', 'cols']:
                 if k in glue_data:
                     self.glue_point[k].set(glue_data[k])
 
             for k in ["X", "Y", "Z"]:
-                if k in data.get("magazine_pos", {}):
-                    self.magazine_pos[k].set(data["magazine_pos"][k])
+                if k in magazine_data:
+                    self.magazine_pos[k].set(magazine_data[k])
 
             self._update_positions()
             print(f"Программа загружена из {filepath}")
@@ -1,6 +1,12 @@
 import tkinter as tk
 from tkinter import ttk
 
+# Высота строки списка шагов (пикселей)
+ROW_HEIGHT = 24
+# Ширина колонки с номером шага и зоны кнопки удаления (пикселей)
+NUMBER_WIDTH = 66
+DELETE_WIDTH = 24
+
 
 class StepsCommandsFrame:
     """
@@ -8,6 +14,11 @@ class StepsCommandsFrame:
     Состоит из двух частей:
     - Список текущих шагов программы (с возможностью редактирования и удаления)
     - Панель с доступными командами для добавления в программу
+
+    Шаги хранятся в обычном списке команд, номер шага - это индекс + 1,
+    поэтому после удаления ничего не перенумеровывается. Список рисуется
+    на холсте, и только видимые строки: длина программы не влияет
+    на скорость прокрутки и удаления.
     """
 
     def __init__(self, parent, controller):
@@ -17,9 +28,11 @@ class StepsCommandsFrame:
         :param controller: контроллер для отправки команд
         """
         self.controller = controller
-        self.steps = {}  # Словарь для хранения шагов {номер: виджет Entry}
-        self.step_frames = {}  # Словарь для хранения фреймов шагов
-        self.current_step_num = 0  # Текущий номер шага
+        self.steps = []  # Команды шагов по порядку (шаг N - элемент N-1)
+        self.selected = None  # Индекс выделенного шага
+        self.first_row = 0  # Индекс первой видимой строки
+        self.editor = None  # Поле редактирования шага
+        self.editing = None  # Индекс редактируемого шага
 
         # Создаем основной контейнер
         self.main_frame = ttk.Frame(parent)
@@ -36,26 +49,22 @@ class StepsCommandsFrame:
         steps_frame.pack_propagate(False)  # Фиксируем ширину
         steps_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=False, padx=5, pady=5)
 
-        # Настройка прокрутки
-        self.canvas = tk.Canvas(steps_frame, width=240)
-        scrollbar = ttk.Scrollbar(steps_frame, orient="vertical", command=self.canvas.yview)
-
-        # Фрейм для содержимого с прокруткой
-        self.scrollable_frame = ttk.Frame(self.canvas, width=240)
-        self.scrollable_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-
-        # Размещаем элементы
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
+        # Холст, на котором рисуются видимые строки, и полоса прокрутки
+        self.canvas = tk.Canvas(steps_frame, width=240, highlightthickness=0, takefocus=True)
+        self.scrollbar = ttk.Scrollbar(steps_frame, orient="vertical", command=self.yview)
 
-        # Настройка прокрутки колесиком мыши
-        self.canvas.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(int(-1 * (e.delta / 120)), "units"))
-        self.scrollable_frame.bind("<MouseWheel>",
-                                   lambda e: self.canvas.yview_scroll(int(-1 * (e.delta / 120)), "units"))
+        # Перерисовка при изменении размера, прокрутка, выбор и редактирование
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll_to(self.first_row - int(e.delta / 120)))
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_to(self.first_row - 1))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_to(self.first_row + 1))
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<Double-Button-1>", self.start_edit)
+        self.canvas.bind("<Delete>", lambda e: self.selected is not None and self.delete_step(self.selected))
 
         # Размещаем canvas и scrollbar
         self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.scrollbar.pack(side="right", fill="y")
 
         # Добавляем первый шаг по умолчанию
         self.add_command("В исходное положение")
@@ -71,7 +80,9 @@ class StepsCommandsFrame:
             "Вперёд дозатором", "Вперёд присоской", "Включить вакуум",
             "Выключить вакуум", "Включить дозатор", "Выключить дозатор",
             "Включить магазин", "Подняться", "Опуститься до магазина",
-            "Опуститься до печки", "Притирка"
+            "Опуститься до печки", "Притирка",
+            # Блоки (program_blocks): число повторений меняется редактированием шага
+            "Повторить 2", "Для каждой точки сетки", "Конец блока"
         ]
 
         # Создаем кнопки команд (по 2 в ряд)
@@ -89,76 +100,157 @@ class StepsCommandsFrame:
                         width=22
                     ).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
 
-    def add_command(self, command):
+    def visible_rows(self):
         """
-        Добавляет новую команду в список шагов
-        :param command: текст команды для добавления
+        Количество строк, помещающихся на холсте
+        :return: число строк (не меньше 1)
+        """
+        return max(1, self.canvas.winfo_height() // ROW_HEIGHT)
+
+    def redraw(self):
+        """Перерисовывает только видимые строки и обновляет полосу прокрутки"""
+        self.canvas.delete("all")
+        width = self.canvas.winfo_width()
+        visible = self.visible_rows()
+
+        # Последняя строка может быть видна частично
+        last = min(len(self.steps), self.first_row + visible + 1)
+        for index in range(self.first_row, last):
+            top = (index - self.first_row) * ROW_HEIGHT
+            middle = top + ROW_HEIGHT // 2
+            if index == self.selected:
+                self.canvas.create_rectangle(0, top, width, top + ROW_HEIGHT, fill="#cce4f7", outline="")
+            self.canvas.create_text(4, middle, anchor="w", text=f"Шаг {index + 1}:")
+            self.canvas.create_text(NUMBER_WIDTH, middle, anchor="w", text=self.steps[index])
+            self.canvas.create_text(width - DELETE_WIDTH // 2, middle, text="×")
+
+        # Положение полосы прокрутки - доля видимых строк
+        total = max(1, len(self.steps))
+        self.scrollbar.set(self.first_row / total, min(1.0, (self.first_row + visible) / total))
+
+    def scroll_to(self, first_row):
         """
-        self.current_step_num += 1
+        Прокручивает список так, чтобы указанная строка была первой видимой
+        :param first_row: индекс строки
+        """
+        self.finish_edit()
+        first_row = max(0, min(first_row, len(self.steps) - self.visible_rows()))
+        if first_row != self.first_row:
+            self.first_row = first_row
+            self.redraw()
 
-        # Создаем фрейм для шага
-        step_frame = ttk.Frame(self.scrollable_frame)
-        step_frame.pack(fill=tk.X, pady=2)
+    def yview(self, *args):
+        """Обработчик полосы прокрутки (протокол yview Tk)"""
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.steps)))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_rows()
+            self.scroll_to(self.first_row + amount)
 
-        # Добавляем метку с номером шага
-        ttk.Label(step_frame, text=f"Шаг {self.current_step_num}:", width=8).pack(side=tk.LEFT)
+    def row_at(self, y):
+        """
+        Находит шаг под указанной координатой холста
+        :param y: координата Y
+        :return: индекс шага или None
+        """
+        index = self.first_row + int(y // ROW_HEIGHT)
+        return index if 0 <= index < len(self.steps) else None
 
-        # Поле для редактирования команды
-        entry = ttk.Entry(step_frame, width=25)
-        entry.insert(0, command)  # Вставляем переданную команду
-        entry.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=5)
+    def on_click(self, event):
+        """Выделяет шаг или удаляет его при нажатии на ×"""
+        self.canvas.focus_set()
+        self.finish_edit()
+        index = self.row_at(event.y)
+        if index is None:
+            return
+        if event.x >= self.canvas.winfo_width() - DELETE_WIDTH:
+            self.delete_step(index)
+        else:
+            self.selected = index
+            self.redraw()
 
-        # Кнопка удаления шага
-        ttk.Button(
-            step_frame,
-            text="×",  # Знак умножения как иконка удаления
-            width=2,
-            command=lambda f=step_frame: self.delete_step(f)
-        ).pack(side=tk.RIGHT)
+    def start_edit(self, event):
+        """Открывает поле редактирования команды поверх строки шага"""
+        index = self.row_at(event.y)
+        if index is None or event.x >= self.canvas.winfo_width() - DELETE_WIDTH:
+            return
+        self.finish_edit()
 
-        # Сохраняем ссылки на элементы
-        self.steps[self.current_step_num] = entry
-        self.step_frames[self.current_step_num] = step_frame
+        self.editing = index
+        self.editor = ttk.Entry(self.canvas)
+        self.editor.insert(0, self.steps[index])
+        self.editor.place(x=NUMBER_WIDTH - 4, y=(index - self.first_row) * ROW_HEIGHT,
+                          width=self.canvas.winfo_width() - NUMBER_WIDTH - DELETE_WIDTH, height=ROW_HEIGHT)
+        self.editor.bind("<Return>", lambda e: self.finish_edit())
+        self.editor.bind("<FocusOut>", lambda e: self.finish_edit())
+        self.editor.bind("<Escape>", lambda e: self.finish_edit(save=False))
+        self.editor.focus_set()
+        self.editor.select_range(0, tk.END)
 
-    def delete_step(self, step_frame):
+    def finish_edit(self, save=True):
+        """
+        Закрывает поле редактирования
+        :param save: сохранить введенную команду
+        """
+        if self.editor is None:
+            return
+        editor, index = self.editor, self.editing
+        self.editor = self.editing = None
+        if save:
+            self.steps[index] = editor.get()
+        editor.destroy()
+        self.redraw()
+
+    def add_command(self, command):
+        """
+        Добавляет новую команду в список шагов
+        :param command: текст команды для добавления
+        """
+        self.finish_edit()
+        self.steps.append(command)
+
+        # Прокручиваем к добавленному шагу
+        self.first_row = max(0, len(self.steps) - self.visible_rows())
+        self.redraw()
+
+    def delete_step(self, index):
         """
         Удаляет указанный шаг из программы
-        :param step_frame: фрейм шага для удаления
-        """
-        # Находим и удаляем шаг
-        for step_num, frame in list(self.step_frames.items()):
-            if frame == step_frame:
-                del self.steps[step_num]
-                del self.step_frames[step_num]
-                step_frame.destroy()
-                self.renumber_steps()  # Перенумеровываем оставшиеся шаги
-                break
-
-    def renumber_steps(self):
-        """Перенумеровывает шаги после удаления"""
-        # Сортируем оставшиеся шаги по номеру
-        sorted_frames = sorted(self.step_frames.items(), key=lambda x: x[0])
-
-        # Очищаем текущие данные
-        self.steps.clear()
-        self.step_frames.clear()
-        self.current_step_num = 0
-
-        # Перенумеровываем шаги
-        for old_num, frame in sorted_frames:
-            for child in frame.winfo_children():
-                if isinstance(child, ttk.Entry):
-                    self.current_step_num += 1
-                    # Обновляем номер шага в метке
-                    frame.winfo_children()[0].config(text=f"Шаг {self.current_step_num}:")
-                    # Сохраняем с новым номером
-                    self.steps[self.current_step_num] = child
-                    self.step_frames[self.current_step_num] = frame
-                    break
+        :param index: индекс шага (номер шага - 1)
+        """
+        self.finish_edit()
+        del self.steps[index]
+
+        # Корректируем выделение и прокрутку
+        if self.selected is not None:
+            if self.selected == index:
+                self.selected = None
+            elif self.selected > index:
+                self.selected -= 1
+        self.first_row = max(0, min(self.first_row, len(self.steps) - self.visible_rows()))
+        self.redraw()
+
+    def set_steps(self, commands):
+        """
+        Заменяет все шаги программы за одну перерисовку
+        :param commands: команды шагов по порядку
+        """
+        self.finish_edit()
+        self.steps = list(commands)
+        self.selected = None
+        self.first_row = 0
+        self.redraw()
+
+    def clear(self):
+        """Удаляет все шаги программы"""
+        self.set_steps([])
 
     def get_steps(self):
         """
         Возвращает список всех шагов программы
         :return: словарь {номер_шага: команда}
         """
-        return {step: self.steps[step].get() for step in sorted(self.steps)}
\ No newline at end of file
+        self.finish_edit()
+        return {number: command for number, command in enumerate(self.steps, start=1)}
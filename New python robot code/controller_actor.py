@@ -0,0 +1,177 @@
+"""
+Контроллер манипулятора с единственным владельцем-потоком.
+
+ManipulatorController не защищен блокировками: его состояние
+(current_position, grid_position, last_kinematics) меняют поток
+выполнения программы, кнопки интерфейса, ручное перемещение и поток
+чтения кадров состояния. Актор выполняет все обращения к контроллеру
+в одном потоке по очереди с приоритетами:
+
+    ручное перемещение > кадры состояния > команды и шаги программы
+
+Остановка через очередь не проходит: emergency_stop() отменяет еще не
+начатые команды и сразу, в вызывающем потоке, отправляет прошивке 'S'
+(ArduinoStepSender.abort() потокобезопасен), не дожидаясь выполняемого
+обработчика. Сегменты, которые этот обработчик успеет поставить после
+остановки, сбрасываются, когда он закончится.
+
+Каждое обращение возвращает concurrent.futures.Future: интерфейс
+может не ждать результата, исполнитель программы ждет его.
+"""
+import itertools
+import queue
+import threading
+from concurrent.futures import Future
+
+# Приоритеты (меньше - раньше)
+PRIORITY_JOG = 1
+PRIORITY_STATUS = 2
+PRIORITY_COMMAND = 3
+
+
+class ControllerActor:
+    """Последовательное выполнение обращений к ManipulatorController в своем потоке."""
+
+    def __init__(self, controller):
+        """
+        Args:
+            controller (ManipulatorController): Контроллер, которым владеет актор
+        """
+        self.controller = controller
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()  # Порядок обращений с одинаковым приоритетом
+        self._generation = 0  # Увеличивается остановкой: более ранние команды отменяются
+        self._lock = threading.Lock()
+        self._status = None  # Последний необработанный кадр состояния
+        self._status_listeners = []
+        self._thread = None
+
+        # Кадры состояния обрабатываются в потоке актора, а не в потоке чтения
+        sender = controller.arduino_sender
+        sender.remove_status_listener(controller._on_status)
+        sender.add_status_listener(self._post_status)
+
+    def start(self):
+        """Запускает поток актора."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=2.0):
+        """Останавливает поток актора; необработанные обращения отменяются."""
+        if self._thread is None:
+            return
+        self._put(-1, None, ())
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, priority, func, *args):
+        """
+        Ставит обращение к контроллеру в очередь.
+        Из потока актора выполняет его сразу (иначе ожидание результата
+        заблокировало бы очередь).
+
+        Args:
+            priority (int): Приоритет (PRIORITY_*)
+            func (callable): Функция, вызываемая в потоке актора
+            *args: Аргументы функции
+
+        Returns:
+            Future: Результат вызова
+        """
+        if threading.current_thread() is self._thread:
+            future = Future()
+            future.set_running_or_notify_cancel()
+            self._call(future, func, args)
+            return future
+        return self._put(priority, func, args)
+
+    def execute(self, command):
+        """
+        Выполняет команду манипулятора (ManipulatorController.execute_command).
+
+        Returns:
+            Future: Завершается, когда сегменты команды поставлены в очередь отправки
+        """
+        return self.submit(PRIORITY_COMMAND, self.controller.execute_command, command)
+
+    def jog(self, velocities):
+        """
+        Ручное перемещение (ManipulatorController.jog), раньше команд в очереди.
+
+        Returns:
+            Future: Результат jog()
+        """
+        return self.submit(PRIORITY_JOG, self.controller.jog, velocities)
+
+    def emergency_stop(self):
+        """
+        Останавливает оси: отменяет команды в очереди и сбрасывает очередь отправки.
+        Выполняется в вызывающем потоке, не дожидаясь обработчика в потоке актора.
+
+        Returns:
+            bool: Результат ArduinoStepSender.abort()
+        """
+        with self._lock:
+            self._generation += 1
+        return self.controller.arduino_sender.abort()
+
+    def add_status_listener(self, listener):
+        """
+        Подписывает обработчик на кадры состояния.
+        Обработчик вызывается в потоке актора после обновления положения контроллера.
+
+        Args:
+            listener (callable): Функция, принимающая protocol.StatusFrame
+        """
+        self._status_listeners.append(listener)
+
+    def _post_status(self, status):
+        """Принимает кадр состояния из потока чтения; в очереди хранится только последний."""
+        with self._lock:
+            pending, self._status = self._status is not None, status
+        if not pending:
+            self._put(PRIORITY_STATUS, self._handle_status, ())
+
+    def _handle_status(self):
+        with self._lock:
+            status, self._status = self._status, None
+        self.controller._on_status(status)
+        for listener in list(self._status_listeners):
+            listener(status)
+
+    def _put(self, priority, func, args):
+        future = Future()
+        with self._lock:
+            generation = self._generation
+        self._queue.put((priority, next(self._order), generation, func, args, future))
+        return future
+
+    def _run(self):
+        """Поток актора: обращения по приоритету, по одному."""
+        while True:
+            priority, _, generation, func, args, future = self._queue.get()
+            if func is None:
+                break
+            # Команды, поставленные до остановки, не выполняются
+            if priority >= PRIORITY_COMMAND and generation < self._generation:
+                future.cancel()
+                continue
+            if future.set_running_or_notify_cancel():
+                self._call(future, func, args)
+                # Остановка во время обработчика: сбрасываем сегменты, поставленные им после нее
+                if priority >= PRIORITY_COMMAND and generation < self._generation:
+                    self.controller.arduino_sender.abort()
+
+        # Обращения, оставшиеся после закрытия, отменяются
+        while not self._queue.empty():
+            self._queue.get_nowait()[-1].cancel()
+
+    @staticmethod
+    def _call(future, func, args):
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            print(f"Ошибка выполнения {getattr(func, '__name__', func)}: {e}")
+            future.set_exception(e)
@@ -0,0 +1,241 @@
+"""
+Выполнение сохраненной программы без графического интерфейса.
+
+Для запуска готовой программы на рабочем месте не нужны ни окно, ни
+перечисление COM-портов: модуль не импортирует tkinter, а pyserial и
+эмулятор загружаются только при подключении. Ход выполнения выводится
+в консоль и (по желанию) в файл состояния JSON, который атомарно
+перезаписывается перед каждым шагом - его можно читать из другой
+программы или системы мониторинга. Программа в двоичном формате
+(program_format) с актуальным планом выполняется его готовыми кадрами
+без расчета сегментов, по его длительностям выводится оставшееся время.
+
+Примеры:
+    python headless.py program.json --port /dev/ttyUSB0
+    python headless.py program.json --emulator --time-scale 4 --status-file status.json
+    python headless.py program.json            # без подключения, расчетное время
+    python headless.py program.json --emulator --trace trace.json
+
+Код возврата: 0 - программа выполнена полностью, 1 - прервана или
+ошибка подключения, 2 - ошибка чтения или проверки программы
+(program_validator).
+"""
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+import time
+
+import matrics
+import program_blocks
+import program_format
+import program_io
+import program_validator
+from manipulator import ManipulatorController
+from program_executor import ProgramExecutor
+
+
+class StatusReporter:
+    """Вывод хода выполнения в консоль и в файл состояния."""
+
+    def __init__(self, total, status_file=None, stream=None, durations=None):
+        """
+        Args:
+            total (int): Количество шагов программы
+            status_file (str, optional): Путь к файлу состояния JSON
+            stream (file, optional): Поток для вывода хода выполнения. Defaults to sys.stdout.
+            durations (list, optional): Расчетная длительность шагов из плана программы (с)
+        """
+        self.total = total
+        self.status_file = status_file
+        self.stream = stream or sys.stdout
+        self.started = time.monotonic()
+        # Оставшееся расчетное время перед каждым шагом
+        self.remaining = None
+        if durations:
+            self.remaining = [0.0] * (len(durations) + 1)
+            for index in range(len(durations) - 1, -1, -1):
+                self.remaining[index] = self.remaining[index + 1] + durations[index]
+
+    def step(self, index, command, position):
+        """
+        Сообщает о начале шага.
+
+        Args:
+            index (int): Индекс шага (с нуля)
+            command (str): Команда шага
+            position (dict): Текущее положение манипулятора {'x', 'y', 'z'}
+        """
+        remaining = self.remaining[index] if self.remaining else None
+        eta = f" (осталось ~{remaining:.1f} с)" if remaining is not None else ""
+        print(f"[{index + 1}/{self.total}] {command}{eta}", file=self.stream, flush=True)
+        self.write("running", index + 1, command, position, remaining)
+
+    def finish(self, completed, position):
+        """
+        Сообщает об окончании программы.
+
+        Args:
+            completed (bool): Программа выполнена полностью
+            position (dict): Текущее положение манипулятора
+        """
+        state = "done" if completed else "stopped"
+        elapsed = time.monotonic() - self.started
+        print(f"Программа {'выполнена' if completed else 'прервана'} за {elapsed:.2f} с",
+              file=self.stream, flush=True)
+        self.write(state, self.total if completed else None, None, position)
+
+    def write(self, state, step, command, position, remaining=None):
+        """Атомарно перезаписывает файл состояния (запись во временный файл и замена)."""
+        if not self.status_file:
+            return
+        data = {
+            "state": state,
+            "step": step,
+            "total": self.total,
+            "command": command,
+            "elapsed": round(time.monotonic() - self.started, 3),
+            "remaining": None if remaining is None else round(remaining, 3),
+            "position": position,
+            "time": time.time(),
+        }
+        temp = self.status_file + ".tmp"
+        try:
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp, self.status_file)
+        except OSError as e:
+            print(f"Ошибка записи файла состояния: {e}", file=sys.stderr)
+
+
+def apply_positions(glue_point, magazine_pos):
+    """
+    Устанавливает позиции печки и магазина из файла программы.
+    Отсутствующие в файле значения остаются прежними.
+
+    Args:
+        glue_point (dict): Позиции печки
+        magazine_pos (dict): Позиция магазина
+    """
+    matrics.save_positions({**matrics.glue_point, **glue_point}, {**matrics.magazine_pos, **magazine_pos})
+
+
+def run_program(commands, controller, reporter, plan=None):
+    """
+    Выполняет программу и ожидает ее окончания.
+    Ctrl+C или SIGTERM прерывают программу с остановкой осей.
+
+    Args:
+        commands (iterable): Команды программы
+        controller (ManipulatorController): Контроллер манипулятора
+        reporter (StatusReporter): Вывод хода выполнения
+        plan (program_format.ProgramFile, optional): Актуальный план программы
+
+    Returns:
+        bool: True если программа выполнена полностью
+    """
+    executor = ProgramExecutor(controller)
+    result = []
+
+    def on_step(index, command):
+        reporter.step(index, command, dict(controller.current_position))
+
+    def on_finish(completed):
+        result.append(completed)
+        reporter.finish(completed, dict(controller.current_position))
+
+    # SIGTERM (остановка службы) обрабатывается так же, как Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    executor.start(commands, on_step=on_step, on_finish=on_finish, plan=plan)
+    try:
+        # Ожидание с таймаутом, чтобы Ctrl+C обрабатывался во время выполнения
+        while not executor.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        print("Остановка программы...", file=reporter.stream, flush=True)
+        executor.stop()
+    return bool(result and result[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Выполнение программы манипулятора без интерфейса")
+    parser.add_argument("program", help="файл программы (JSON или " + program_format.EXTENSION + ")")
+    parser.add_argument("--port", help="порт Arduino (без порта - расчетное выполнение без подключения)")
+    parser.add_argument("--emulator", action="store_true", help="выполнить программу на эмуляторе прошивки")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="ускорение эмулятора")
+    parser.add_argument("--capture", help="записать обмен с Arduino в файл")
+    parser.add_argument("--status-file", help="файл состояния JSON, обновляемый перед каждым шагом")
+    parser.add_argument("--quiet", action="store_true", help="не выводить сообщения контроллера")
+    parser.add_argument("--metrics-prom", help="файл метрик для textfile collector Prometheus")
+    parser.add_argument("--metrics-csv", help="файл CSV со снимками метрик")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="период экспорта метрик (с)")
+    parser.add_argument("--trace", help="записать профиль выполнения в файл Chrome trace (profiling)")
+    parser.add_argument("--trace-sample", type=int, default=1, help="записывать каждый N-й вызов в профиль")
+    args = parser.parse_args(argv)
+
+    try:
+        steps, glue_point, magazine_pos = program_io.load_program(args.program)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка загрузки программы: {e}", file=sys.stderr)
+        return 2
+    apply_positions(glue_point, magazine_pos)
+
+    # Программа с ошибками не запускается: остановка на середине обходится дороже
+    issues = program_validator.validate_program(steps)
+    if issues:
+        print(f"Ошибки в программе:\n{program_validator.format_issues(issues)}", file=sys.stderr)
+        return 2
+    commands = program_blocks.expand(steps)
+
+    with contextlib.ExitStack() as stack:
+        # Длительность шагов берется из сохраненного плана, если он не устарел
+        plan, durations = None, None
+        if program_format.is_program_file(args.program):
+            program = stack.enter_context(program_format.ProgramFile(args.program))
+            durations = program.step_durations()
+            if durations is not None:
+                plan = program
+        reporter = StatusReporter(commands.count(), args.status_file, durations=durations)
+
+        if args.quiet:
+            devnull = stack.enter_context(open(os.devnull, 'w'))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+
+        if args.metrics_prom or args.metrics_csv:
+            import metrics
+            exporter = metrics.MetricsExporter(args.metrics_prom, args.metrics_csv, args.metrics_interval)
+            exporter.start()
+            stack.callback(exporter.stop)
+
+        if args.trace:
+            import profiling
+            profiling.enable(sample_every=args.trace_sample)
+            stack.callback(lambda: profiling.disable().dump(args.trace))
+
+        port = args.port
+        if args.emulator:
+            # Эмулятор нужен только для проверки программы без робота
+            from arduino_simulator import ArduinoSimulator
+            port = stack.enter_context(ArduinoSimulator(time_scale=args.time_scale)).port
+
+        controller = ManipulatorController(port=port, capture_path=args.capture)
+        sender = controller.arduino_sender
+        stack.callback(sender.close)
+        if port:
+            sender.debug_mode = False
+            if not sender.connect():
+                print(f"Не удалось подключиться к {port}", file=sys.stderr)
+                return 1
+        else:
+            # Без подключения положение считает контроллер по командам,
+            # а кадры плана ему ничего не дают
+            plan = None
+
+        completed = run_program(commands, controller, reporter, plan)
+    return 0 if completed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
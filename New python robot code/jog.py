@@ -0,0 +1,124 @@
+"""
+Канал ручного перемещения осей.
+
+Ползунки интерфейса меняют значение десятки раз в секунду. Канал хранит
+только последнее значение каждой оси и с фиксированной частотой
+отправляет один кадр со скоростями всех осей. Пока хоть одна ось
+движется, кадр повторяется каждый такт: прошивка останавливает оси,
+если кадры перестали приходить (protocol.JOG_TIMEOUT_MS). Отпускание
+ползунка отправляет нулевую скорость сразу, не дожидаясь такта.
+"""
+import threading
+import time
+
+import protocol
+
+# Частота отправки кадров ручного перемещения по умолчанию (Гц)
+DEFAULT_RATE_HZ = 20
+
+
+class JogChannel:
+    """Передача скоростей ручного перемещения: последнее значение побеждает."""
+
+    def __init__(self, send, rate_hz=DEFAULT_RATE_HZ):
+        """
+        Args:
+            send (callable): Отправка кадра, принимает словарь {ОСЬ: шаг/с}
+                (например, ManipulatorController.jog)
+            rate_hz (float): Частота отправки кадров (Гц)
+
+        Raises:
+            ValueError: Если период отправки не меньше таймаута прошивки
+        """
+        self.period = 1.0 / rate_hz
+        if self.period * 1000 >= protocol.JOG_TIMEOUT_MS:
+            raise ValueError(f"Частота {rate_hz} Гц слишком мала для таймаута {protocol.JOG_TIMEOUT_MS} мс")
+        self._send = send
+        self._lock = threading.Lock()  # Защищает _latest и _sent
+        self._send_lock = threading.Lock()  # Порядок кадров: такт и отпускание не перемешиваются
+        self._latest = {}  # Ось -> последняя скорость, еще не отправленная
+        self._sent = {}  # Ось -> скорость в последнем отправленном кадре
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Запускает поток отправки."""
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Останавливает все оси и поток отправки."""
+        self.release_all()
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def set(self, axis, velocity):
+        """
+        Задает скорость оси. Можно вызывать с любой частотой: до следующего
+        такта сохраняется только последнее значение.
+
+        Args:
+            axis (str): Ось из protocol.AXES
+            velocity (float): Скорость (шаг/с)
+        """
+        with self._lock:
+            self._latest[axis] = velocity
+        self._wake.set()
+
+    def release(self, axis):
+        """
+        Немедленно останавливает ось (отпускание ползунка).
+
+        Args:
+            axis (str): Ось из protocol.AXES
+        """
+        with self._send_lock:
+            with self._lock:
+                self._latest.pop(axis, None)
+                if not self._sent.get(axis):
+                    return
+                self._sent[axis] = 0.0
+                frame = dict(self._sent)
+            self._send(frame)
+
+    def release_all(self):
+        """Немедленно останавливает все оси."""
+        with self._send_lock:
+            with self._lock:
+                self._latest.clear()
+                if not any(self._sent.values()):
+                    return
+                self._sent = dict.fromkeys(self._sent, 0.0)
+                frame = dict(self._sent)
+            self._send(frame)
+
+    def _loop(self):
+        """Поток отправки: один кадр за такт, пока есть новые значения или движение."""
+        next_tick = time.monotonic()
+        while self._running:
+            with self._send_lock:
+                with self._lock:
+                    changed = {axis: v for axis, v in self._latest.items() if self._sent.get(axis) != v}
+                    self._latest.clear()
+                    self._sent.update(changed)
+                    moving = any(self._sent.values())
+                    frame = dict(self._sent)
+                # Кадр отправляется при изменении, а во время движения - каждый такт
+                if changed or moving:
+                    self._send(frame)
+
+            if moving:
+                # Планирование по монотонным часам; отставание не накапливается
+                next_tick = max(next_tick + self.period, time.monotonic())
+                time.sleep(max(0.0, next_tick - time.monotonic()))
+            else:
+                # Оси стоят - ждем нового значения без опроса
+                self._wake.wait()
+                next_tick = time.monotonic()
+            self._wake.clear()
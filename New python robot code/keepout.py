@@ -0,0 +1,449 @@
+"""
+Зоны запрета (оснастка, ограждения) и проверка траекторий на пересечение с ними.
+
+Зоны задаются в файле keepout.json многоугольниками и цилиндрами с
+верхней высотой top (в координатах Z контроллера, Z=1000 - верхнее
+положение):
+
+    {
+      "clearance": 5,
+      "tool_radius": 8,
+      "link_heights": {"L1": 1000, "L2": 1000},
+      "zones": [
+        {"name": "Прижим печки", "type": "polygon", "points": [[300, 60], [340, 60], [340, 90]], "top": 930},
+        {"name": "Стойка", "type": "cylinder", "center": [-120, 250], "radius": 25, "top": 1000}
+      ]
+    }
+
+Проверяется не только конечная точка команды: прошивка ведет все оси
+сегмента одновременно (согласованные профили), поэтому углы плеча,
+руки и высота меняются линейно в пространстве осей, а инструмент и
+рычаги описывают дуги. Каждый сегмент плана разбивается на отрезки,
+на которых ни одна точка рычагов не смещается больше чем на resolution,
+и для каждого положения проверяются:
+    инструмент - вертикаль от наконечника (высота Z) вверх, радиус tool_radius;
+    рычаги L1 (основание - локоть) и L2 (локоть - инструмент) - отрезки
+    на высоте link_heights: с рычагом пересекаются только зоны выше него.
+Зазор clearance и половина resolution добавляются к зонам, поэтому
+пропуск между положениями не может скрыть касание.
+
+Положения всего плана рассчитываются одним проходом (одни и те же
+константы и функции math для всех точек, как Kinematics.calc_angles_batch),
+а зоны-кандидаты для движения берутся из равномерной сетки ячеек по
+охватывающему прямоугольнику всех его положений: движения вдали от
+зон не проверяются точно.
+
+Сегменты до первого обнуления позиций (поиск исходного положения)
+не проверяются: положение осей до него неизвестно.
+
+    python keepout.py program.json
+    python keepout.py program.json --config keepout.json --resolution 1
+"""
+import argparse
+import bisect
+import json
+import math
+import os
+import sys
+import time
+from array import array
+from collections import namedtuple
+
+import protocol
+from kinematics import Kinematics
+
+# Файл зон запрета
+KEEPOUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "keepout.json")
+
+# Зазор до зон по умолчанию (мм)
+DEFAULT_CLEARANCE = 5.0
+# Наибольшее смещение точек рычагов между проверяемыми положениями (мм)
+DEFAULT_RESOLUTION = 2.0
+# Размер ячейки сетки поиска (мм)
+DEFAULT_CELL = 50.0
+
+# Проверяемые части манипулятора
+PART_TOOL = "tool"
+LINKS = ("L1", "L2")
+
+# Зоны: многоугольник (вершины [(x, y), ...]) и вертикальный цилиндр; top - верхняя высота (Z)
+PolygonZone = namedtuple('PolygonZone', 'name points top')
+CylinderZone = namedtuple('CylinderZone', 'name center radius top')
+
+# Настройки: зоны, зазор (мм), радиус инструмента (мм), высоты рычагов {L1, L2} (Z; по умолчанию MAX_Z)
+KeepoutConfig = namedtuple('KeepoutConfig', 'zones clearance tool_radius link_heights')
+
+# Пересечение: индекс сегмента плана, зона, часть манипулятора, положение инструмента
+Collision = namedtuple('Collision', 'segment zone part x y z')
+
+_RAD = math.pi / 180
+
+
+def _zone(data):
+    """Зона из описания в файле."""
+    name = str(data.get('name', ''))
+    top = float(data['top'])
+    if data.get('type') == 'polygon':
+        points = tuple((float(x), float(y)) for x, y in data['points'])
+        if len(points) < 3:
+            raise ValueError(f"Зона '{name}': у многоугольника меньше трех вершин")
+        return PolygonZone(name, points, top)
+    if data.get('type') == 'cylinder':
+        x, y = data['center']
+        radius = float(data['radius'])
+        if radius <= 0:
+            raise ValueError(f"Зона '{name}': радиус должен быть больше 0")
+        return CylinderZone(name, (float(x), float(y)), radius, top)
+    raise ValueError(f"Зона '{name}': неизвестный тип '{data.get('type')}' (polygon или cylinder)")
+
+
+def load_keepout(path=KEEPOUT_FILE):
+    """
+    Читает зоны запрета.
+
+    Args:
+        path (str): Путь к файлу JSON
+
+    Returns:
+        KeepoutConfig: Настройки; без зон, если файла нет
+
+    Raises:
+        ValueError: Если файл поврежден или зона описана неверно
+    """
+    if not path or not os.path.exists(path):
+        return KeepoutConfig((), DEFAULT_CLEARANCE, 0.0, {})
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        link_heights = {link: float(value) for link, value in data.get('link_heights', {}).items() if link in LINKS}
+        return KeepoutConfig(tuple(_zone(zone) for zone in data.get('zones', ())),
+                             float(data.get('clearance', DEFAULT_CLEARANCE)),
+                             float(data.get('tool_radius', 0.0)), link_heights)
+    except OSError as e:
+        raise ValueError(f"Ошибка чтения {path}: {e}") from None
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Ошибка в файле зон {path}: {e}") from None
+
+
+def _bounds(zone, margin):
+    """Охватывающий прямоугольник зоны с зазором: (x0, y0, x1, y1)."""
+    if isinstance(zone, CylinderZone):
+        (x, y), r = zone.center, zone.radius + margin
+        return x - r, y - r, x + r, y + r
+    xs = [x for x, _ in zone.points]
+    ys = [y for _, y in zone.points]
+    return min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin
+
+
+def _point_segment_distance(px, py, ax, ay, bx, by):
+    """Расстояние от точки до отрезка."""
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if not length_sq else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    return math.hypot(ax + t * dx - px, ay + t * dy - py)
+
+
+def _segments_distance(ax, ay, bx, by, cx, cy, dx, dy):
+    """Расстояние между отрезками AB и CD (0, если они пересекаются)."""
+    def cross(ox, oy, px, py, qx, qy):
+        return (px - ox) * (qy - oy) - (py - oy) * (qx - ox)
+
+    d1, d2 = cross(cx, cy, dx, dy, ax, ay), cross(cx, cy, dx, dy, bx, by)
+    d3, d4 = cross(ax, ay, bx, by, cx, cy), cross(ax, ay, bx, by, dx, dy)
+    if ((d1 > 0) != (d2 > 0)) and ((d3 > 0) != (d4 > 0)) and d1 and d2 and d3 and d4:
+        return 0.0
+    return min(_point_segment_distance(ax, ay, cx, cy, dx, dy), _point_segment_distance(bx, by, cx, cy, dx, dy),
+               _point_segment_distance(cx, cy, ax, ay, bx, by), _point_segment_distance(dx, dy, ax, ay, bx, by))
+
+
+def _inside_polygon(x, y, points):
+    """Точка внутри многоугольника (четность пересечений луча)."""
+    inside = False
+    px, py = points[-1]
+    for qx, qy in points:
+        if (qy > y) != (py > y) and x < px + (y - py) * (qx - px) / (qy - py):
+            inside = not inside
+        px, py = qx, qy
+    return inside
+
+
+def segment_hits_zone(zone, ax, ay, bx, by, margin):
+    """
+    Проверяет, подходит ли отрезок к зоне ближе margin (в плане XY).
+
+    Args:
+        zone (PolygonZone | CylinderZone): Зона
+        ax, ay, bx, by (float): Концы отрезка (для точки - совпадают)
+        margin (float): Зазор (мм)
+
+    Returns:
+        bool: True при пересечении
+    """
+    if isinstance(zone, CylinderZone):
+        return _point_segment_distance(*zone.center, ax, ay, bx, by) <= zone.radius + margin
+    if _inside_polygon(ax, ay, zone.points):
+        return True
+    px, py = zone.points[-1]
+    for qx, qy in zone.points:
+        if _segments_distance(ax, ay, bx, by, px, py, qx, qy) <= margin:
+            return True
+        px, py = qx, qy
+    return False
+
+
+class ZoneIndex:
+    """Равномерная сетка ячеек: по прямоугольнику - зоны, которые могут его задеть."""
+
+    def __init__(self, zones, margin, cell=DEFAULT_CELL):
+        """
+        Args:
+            zones (list): Зоны
+            margin (float): Зазор, на который расширяется каждая зона (мм)
+            cell (float): Размер ячейки (мм)
+        """
+        self.zones = tuple(zones)
+        self.margin = margin
+        self.cell = cell
+        self.bounds = tuple(_bounds(zone, margin) for zone in self.zones)  # Прямоугольники зон с зазором
+        self._cells = {}
+        for index, (x0, y0, x1, y1) in enumerate(self.bounds):
+            for ix in range(math.floor(x0 / cell), math.floor(x1 / cell) + 1):
+                for iy in range(math.floor(y0 / cell), math.floor(y1 / cell) + 1):
+                    self._cells.setdefault((ix, iy), []).append(index)
+
+    def __bool__(self):
+        return bool(self.zones)
+
+    def near(self, x0, y0, x1, y1):
+        """Индексы зон, которые могут задеть прямоугольник."""
+        cell = self.cell
+        found = set()
+        for ix in range(math.floor(min(x0, x1) / cell), math.floor(max(x0, x1) / cell) + 1):
+            for iy in range(math.floor(min(y0, y1) / cell), math.floor(max(y0, y1) / cell) + 1):
+                found.update(self._cells.get((ix, iy), ()))
+        return found
+
+
+def frame_segments(frames):
+    """
+    Цели осей по кадрам сегментов плана.
+
+    Args:
+        frames (iterable): Кадры сегментов (program_format.CompiledPlan.frames)
+
+    Returns:
+        list: Пары (цели осей {ОСЬ: шаги}, обнуление позиций)
+    """
+    segments = []
+    for frame in frames:
+        fields = protocol.parse_frame(frame)
+        segments.append(({axis: int(fields[axis]) for axis in protocol.AXES if axis in fields},
+                         protocol.ZERO in fields))
+    return segments
+
+
+class KeepoutChecker:
+    """Проверка движений плана на пересечение с зонами запрета."""
+
+    def __init__(self, config, kinematics=None, resolution=DEFAULT_RESOLUTION, cell=DEFAULT_CELL):
+        """
+        Args:
+            config (KeepoutConfig): Зоны и зазоры (load_keepout())
+            kinematics (Kinematics, optional): Параметры механики. По умолчанию - с файлом калибровки
+            resolution (float): Наибольшее смещение точек рычагов между положениями (мм)
+            cell (float): Размер ячейки сетки поиска (мм)
+        """
+        self.kinematics = kinematics or Kinematics()
+        self.config = config
+        self.resolution = resolution
+        # Пропуск между положениями не больше половины resolution от одного из них
+        margin = config.clearance + resolution / 2
+        self.tool_index = ZoneIndex(config.zones, margin + config.tool_radius, cell)
+        self.link_indexes = {}
+        for link in LINKS:
+            link_height = config.link_heights.get(link, self.kinematics.MAX_Z)
+            self.link_indexes[link] = ZoneIndex([zone for zone in config.zones if zone.top > link_height], margin, cell)
+
+    def __bool__(self):
+        return bool(self.config.zones)
+
+    def _moves(self, segments):
+        """Движения (индекс сегмента, начало, конец) в единицах осей: (плечо, рука, Z)."""
+        scale = protocol.STEPS_PER_UNIT
+        max_z = self.kinematics.MAX_Z
+        steps = dict.fromkeys(protocol.AXES, 0)
+        known = False
+        moves = []
+        for index, (targets, zero) in enumerate(segments):
+            if zero:
+                steps = dict.fromkeys(protocol.AXES, 0)
+                known = True
+                continue
+            start = (steps['PLECHO'] / scale['PLECHO'], steps['RUKA'] / scale['RUKA'],
+                     max_z - steps['LIFT'] / scale['LIFT'])
+            steps = {**steps, **targets}
+            end = (steps['PLECHO'] / scale['PLECHO'], steps['RUKA'] / scale['RUKA'],
+                   max_z - steps['LIFT'] / scale['LIFT'])
+            if known and start != end:
+                moves.append((index, start, end))
+        return moves
+
+    def _samples(self, moves):
+        """
+        Положения осей по всем движениям.
+
+        Returns:
+            tuple: Массивы: начало положений каждого движения (и конец последнего),
+                плечо, рука, Z по всем положениям подряд
+        """
+        kin = self.kinematics
+        reach = kin.L1 + kin.L2
+        starts, shoulder, arm, height = array('l', [0]), array('d'), array('d'), array('d')
+        for _, (s0, a0, z0), (s1, a1, z1) in moves:
+            # Наибольшее смещение точки рычагов: поворот плеча, руки и ход по Z
+            travel = reach * abs(s1 - s0) * _RAD + kin.L2 * abs(a1 - a0) * _RAD + abs(z1 - z0)
+            count = max(1, math.ceil(travel / self.resolution))
+            ds, da, dz = (s1 - s0) / count, (a1 - a0) / count, (z1 - z0) / count
+            shoulder.extend(s0 + k * ds for k in range(count + 1))
+            arm.extend(a0 + k * da for k in range(count + 1))
+            height.extend(z0 + k * dz for k in range(count + 1))
+            starts.append(len(height))
+        return starts, shoulder, arm, height
+
+    def _positions(self, shoulder, arm):
+        """Положения локтя и инструмента для всех положений осей: массивы ex, ey, tx, ty."""
+        kin = self.kinematics
+        l1, l2 = kin.L1, kin.L2
+        base_x, base_y = kin.BASE_X, kin.BASE_Y
+        shoulder_offset, arm_offset = kin.SHOULDER_OFFSET, kin.ARM_OFFSET - 180
+        cos, sin = math.cos, math.sin
+        ex, ey, tx, ty = array('d'), array('d'), array('d'), array('d')
+        for s, a in zip(shoulder, arm):
+            t1 = (s - shoulder_offset) * _RAD
+            t2 = t1 + (a + arm_offset) * _RAD
+            x, y = base_x + l1 * cos(t1), base_y + l1 * sin(t1)
+            ex.append(x)
+            ey.append(y)
+            tx.append(x + l2 * cos(t2))
+            ty.append(y + l2 * sin(t2))
+        return ex, ey, tx, ty
+
+    def check_segments(self, segments, first_only=False):
+        """
+        Проверяет движения по целям осей сегментов.
+
+        Сначала для каждого движения по охватывающему прямоугольнику всех
+        его положений выбираются зоны-кандидаты; положения проверяются
+        точно только для них.
+
+        Args:
+            segments (iterable): Пары (цели осей {ОСЬ: шаги}, обнуление) - frame_segments()
+            first_only (bool): Остановиться на первом пересечении
+
+        Returns:
+            list: Пересечения (Collision), по одному на сегмент, зону и часть манипулятора
+        """
+        if not self:
+            return []
+        moves = self._moves(segments)
+        starts, shoulder, arm, height = self._samples(moves)
+        ex, ey, tx, ty = self._positions(shoulder, arm)
+        base_x, base_y = self.kinematics.BASE_X, self.kinematics.BASE_Y
+        parts = [(PART_TOOL, self.tool_index)] + [(link, self.link_indexes[link]) for link in LINKS
+                                                   if self.link_indexes[link]]
+
+        collisions = []
+        for number, (segment, _, _) in enumerate(moves):
+            first, last = starts[number], starts[number + 1]
+            for part, index in parts:
+                if part == PART_TOOL:
+                    xs, ys = tx[first:last], ty[first:last]
+                elif part == "L1":
+                    xs, ys = ex[first:last] + array('d', [base_x]), ey[first:last] + array('d', [base_y])
+                else:
+                    xs, ys = ex[first:last] + tx[first:last], ey[first:last] + ty[first:last]
+                candidates = index.near(min(xs), min(ys), max(xs), max(ys))
+                if part == PART_TOOL and candidates:
+                    lowest = min(height[first:last])
+                    candidates = [zone for zone in candidates if lowest < index.zones[zone].top]
+
+                for zone_index in sorted(candidates):
+                    zone = index.zones[zone_index]
+                    x0, y0, x1, y1 = index.bounds[zone_index]
+                    for k in range(first, last):
+                        if part == PART_TOOL:
+                            if height[k] >= zone.top:
+                                continue
+                            ax, ay, bx, by = tx[k], ty[k], tx[k], ty[k]
+                        elif part == "L1":
+                            ax, ay, bx, by = base_x, base_y, ex[k], ey[k]
+                        else:
+                            ax, ay, bx, by = ex[k], ey[k], tx[k], ty[k]
+                        # Точная проверка - только если прямоугольники отрезка и зоны перекрываются
+                        if (max(ax, bx) < x0 or min(ax, bx) > x1 or max(ay, by) < y0 or min(ay, by) > y1
+                                or not segment_hits_zone(zone, ax, ay, bx, by, index.margin)):
+                            continue
+                        collisions.append(Collision(segment, zone.name, part, tx[k], ty[k], height[k]))
+                        if first_only:
+                            return collisions
+                        break
+        return collisions
+
+    def check_plan(self, plan):
+        """
+        Проверяет скомпилированный план программы.
+
+        Args:
+            plan (program_format.CompiledPlan): План (program_format.compile_plan())
+
+        Returns:
+            list: Пересечения (Collision)
+        """
+        return self.check_segments(frame_segments(plan.frames))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка программы на пересечение с зонами запрета")
+    parser.add_argument("program", help="файл программы")
+    parser.add_argument("--config", default=KEEPOUT_FILE, help="файл зон запрета")
+    parser.add_argument("--resolution", type=float, default=DEFAULT_RESOLUTION,
+                        help="наибольшее смещение рычагов между проверяемыми положениями (мм)")
+    args = parser.parse_args(argv)
+    if args.resolution <= 0:
+        parser.error("--resolution должно быть больше 0")
+
+    import program_blocks
+    import program_format
+    import program_io
+
+    try:
+        config = load_keepout(args.config)
+        steps, glue_point, magazine_pos = program_io.load_program(args.program)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+    if not config.zones:
+        print(f"Зоны запрета не заданы ({args.config})")
+        return 0
+
+    steps = list(steps)
+    plan = program_format.compile_plan(steps, glue_point, magazine_pos)
+    checker = KeepoutChecker(config, resolution=args.resolution)
+    start = time.perf_counter()
+    collisions = checker.check_plan(plan)
+    elapsed = time.perf_counter() - start
+
+    # Номер и команда шага развернутой программы для каждого сегмента
+    with program_format._program_positions(program_format._typed_positions(glue_point, magazine_pos)):
+        commands = list(program_blocks.expand(steps))
+    for collision in collisions:
+        step = bisect.bisect_right(plan.step_starts, collision.segment) - 1
+        print(f"Шаг {step + 1} ({commands[step]}): {collision.part} задевает зону '{collision.zone}' "
+              f"у X={collision.x:.1f} Y={collision.y:.1f} Z={collision.z:.1f}")
+    print(f"Сегментов: {len(plan.frames)}, зон: {len(config.zones)}, пересечений: {len(collisions)}, "
+          f"проверка {elapsed:.2f} с")
+    return 1 if collisions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
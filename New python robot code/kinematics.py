@@ -1,4 +1,41 @@
+import json
 import math
+import os
+
+# Файл калибровки (calibration.py), загружаемый при создании Kinematics
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration.json")
+
+# Номинальные параметры механики (используются без файла калибровки)
+DEFAULT_PARAMETERS = {
+    'L1': 228,  # Длина первого рычага (плечо), мм
+    'L2': 147.123,  # Длина второго рычага (предплечье), мм
+    'ARM_OFFSET': 21,  # Нулевое положение руки (градусы)
+    'SHOULDER_OFFSET': 90,  # Нулевое положение плеча (градусы)
+    'BASE_X': 0.0,  # Положение основания в координатах стола, мм
+    'BASE_Y': 0.0,
+}
+
+
+def load_calibration(path=CALIBRATION_FILE):
+    """
+    Читает параметры механики из файла калибровки.
+
+    Args:
+        path (str): Путь к файлу JSON
+
+    Returns:
+        dict: Параметры из DEFAULT_PARAMETERS, найденные в файле;
+            пустой словарь, если файла нет или он поврежден
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return {key: float(data['parameters'][key]) for key in DEFAULT_PARAMETERS if key in data['parameters']}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Ошибка чтения калибровки {path}: {e}")
+        return {}
 
 
 class Kinematics:
@@ -7,10 +44,20 @@ class Kinematics:
     Вычисляет углы поворота рычагов на основе координат.
     """
 
-    def __init__(self):
-        # Инициализация длин рычагов (в мм)
-        self.L1 = 228  # Длина первого рычага (плечо)
-        self.L2 = 147.123  # Длина второго рычага (предплечье)
+    def __init__(self, calibration=CALIBRATION_FILE):
+        """
+        Args:
+            calibration (str, optional): Файл калибровки; None - номинальные параметры
+        """
+        parameters = {**DEFAULT_PARAMETERS, **load_calibration(calibration)}
+        # Длины рычагов (в мм)
+        self.L1 = parameters['L1']  # Длина первого рычага (плечо)
+        self.L2 = parameters['L2']  # Длина второго рычага (предплечье)
+        # Нулевые положения осей (градусы) и положение основания (мм)
+        self.ARM_OFFSET = parameters['ARM_OFFSET']
+        self.SHOULDER_OFFSET = parameters['SHOULDER_OFFSET']
+        self.BASE_X = parameters['BASE_X']
+        self.BASE_Y = parameters['BASE_Y']
         self.MAX_Z = 1000  # Максимальная высота (исходное положение)
 
         # Сброс всех позиций в начальное состояние
@@ -71,13 +118,16 @@ class Kinematics:
         if x == 0 and y == 0:
             return 0.0, 0.0
 
+        # Координаты относительно основания
+        x, y = x - self.BASE_X, y - self.BASE_Y
+
         # Вычисляем расстояние до точки
         distance = math.hypot(x, y)
 
         # Вычисляем угол руки (по теореме косинусов)
         cos_arm = (self.L1 ** 2 + self.L2 ** 2 - distance ** 2) / (2 * self.L1 * self.L2)
         cos_arm = max(-1, min(1, cos_arm))  # Ограничиваем значение косинуса
-        arm_angle = math.degrees(math.acos(cos_arm)) - 21  # Коррекция угла
+        arm_angle = math.degrees(math.acos(cos_arm)) - self.ARM_OFFSET  # Коррекция угла
 
         # Вычисляем угол плеча
         cos_beta = (distance ** 2 + self.L1 ** 2 - self.L2 ** 2) / (2 * distance * self.L1) if distance != 0 else 0
@@ -90,18 +140,105 @@ class Kinematics:
         if x >= 0:
             if y >= 0:
                 # Первый квадрант (x>0, y>0)
-                shoulder_angle = beta + direction + 90
+                shoulder_angle = beta + direction + self.SHOULDER_OFFSET
             else:
                 # Четвертый квадрант (x>0, y<0)
-                shoulder_angle = beta + math.degrees(math.atan2(x, -y))
+                shoulder_angle = beta + math.degrees(math.atan2(x, -y)) + (self.SHOULDER_OFFSET - 90)
         else:
             # Для отрицательных X корректируем углы
-            arm_angle = 339 - math.degrees(math.acos(cos_arm))
+            arm_angle = (360 - self.ARM_OFFSET) - math.degrees(math.acos(cos_arm))
             if y >= 0:
                 # Второй квадрант (x<0, y>0)
-                shoulder_angle = 180 + math.degrees(math.atan2(-x, y)) - beta
+                shoulder_angle = (self.SHOULDER_OFFSET + 90) + math.degrees(math.atan2(-x, y)) - beta
             else:
                 # Третий квадрант (x<0, y<0)
-                shoulder_angle = 270 + math.degrees(math.atan2(-y, -x)) - beta
+                shoulder_angle = (self.SHOULDER_OFFSET + 180) + math.degrees(math.atan2(-y, -x)) - beta
+
+        return arm_angle, shoulder_angle
+
+    def calc_angles_batch(self, points):
+        """
+        Вычисляет углы для последовательности точек (сетки, траектории).
+        Результат совпадает с _calc_angles() для каждой точки, но константы
+        и функции math вычисляются один раз на весь набор.
+        Возвращает список кортежей: [(угол_руки, угол_плеча), ...]
+        """
+        l1_sq, l2_sq = self.L1 ** 2, self.L2 ** 2
+        arm_sum = l1_sq + l2_sq
+        arm_den = 2 * self.L1 * self.L2
+        beta_den = 2 * self.L1
+        base_x, base_y = self.BASE_X, self.BASE_Y
+        arm_offset, arm_mirror = self.ARM_OFFSET, 360 - self.ARM_OFFSET
+        q1, q4 = self.SHOULDER_OFFSET, self.SHOULDER_OFFSET - 90
+        q2, q3 = self.SHOULDER_OFFSET + 90, self.SHOULDER_OFFSET + 180
+        hypot, acos, atan2, degrees = math.hypot, math.acos, math.atan2, math.degrees
+
+        result = []
+        append = result.append
+        for x, y in points:
+            if x == 0 and y == 0:
+                append((0.0, 0.0))
+                continue
+
+            x, y = x - base_x, y - base_y
+            distance = hypot(x, y)
+            d_sq = distance ** 2
+            cos_arm = max(-1, min(1, (arm_sum - d_sq) / arm_den))
+            if distance != 0:
+                cos_beta = max(-1, min(1, (d_sq + l1_sq - l2_sq) / (distance * beta_den)))
+                beta = degrees(acos(cos_beta))
+            else:
+                # Точка совпадает с основанием (как в _calc_angles)
+                beta = 0
+
+            if x >= 0:
+                arm_angle = degrees(acos(cos_arm)) - arm_offset
+                if y >= 0:
+                    shoulder_angle = beta + degrees(atan2(y, x)) + q1
+                else:
+                    shoulder_angle = beta + degrees(atan2(x, -y)) + q4
+            else:
+                arm_angle = arm_mirror - degrees(acos(cos_arm))
+                if y >= 0:
+                    shoulder_angle = q2 + degrees(atan2(-x, y)) - beta
+                else:
+                    shoulder_angle = q3 + degrees(atan2(-y, -x)) - beta
+            append((arm_angle, shoulder_angle))
+        return result
+
+    def forward(self, arm_angle, shoulder_angle):
+        """
+        Прямая задача кинематики: обратная к _calc_angles().
+        Возвращает кортеж: (x, y)
+        """
+        # Нулевые углы соответствуют исходному положению
+        if arm_angle == 0 and shoulder_angle == 0:
+            return 0.0, 0.0
+
+        # По углу руки определяем ветвь решения (x >= 0 или x < 0)
+        if arm_angle <= 180 - self.ARM_OFFSET:
+            elbow = math.radians(arm_angle + self.ARM_OFFSET)
+            side = 1
+        else:
+            elbow = math.radians((360 - self.ARM_OFFSET) - arm_angle)
+            side = -1
+
+        # Расстояние до точки по теореме косинусов
+        distance = math.sqrt(max(0.0, self.L1 ** 2 + self.L2 ** 2 - 2 * self.L1 * self.L2 * math.cos(elbow)))
+        if distance == 0:
+            return 0.0, 0.0
+
+        cos_beta = (distance ** 2 + self.L1 ** 2 - self.L2 ** 2) / (2 * distance * self.L1)
+        beta = math.degrees(math.acos(max(-1, min(1, cos_beta))))
 
-        return arm_angle, shoulder_angle
\ No newline at end of file
+        direction = math.radians(shoulder_angle - self.SHOULDER_OFFSET - side * beta)
+        return self.BASE_X + distance * math.cos(direction), self.BASE_Y + distance * math.sin(direction)
+
+    def elbow(self, shoulder_angle):
+        """
+        Положение локтя (конца первого рычага) для угла плеча.
+        Первый рычаг направлен под углом (угол_плеча - SHOULDER_OFFSET) к оси X.
+        Возвращает кортеж: (x, y)
+        """
+        direction = math.radians(shoulder_angle - self.SHOULDER_OFFSET)
+        return self.BASE_X + self.L1 * math.cos(direction), self.BASE_Y + self.L1 * math.sin(direction)
@@ -1,15 +1,22 @@
 import tkinter as tk
 from tkinter import ttk
-import serial.tools.list_ports
-from serial import SerialException
-import threading
+
+import port_watcher
+import protocol
+
+# Ось, на которой стоит концевик (бит маски L кадра состояния - индекс оси)
+SENSOR_AXES = {
+    "Концевик верхний": 'PLECHO',
+    "Концевик нижний": 'LIFT',
+    "Концевик руки": 'RUKA',
+    "Концевик кисти": 'ORGON',
+}
 
 
 class LeftFrame(ttk.LabelFrame):
     def __init__(self, parent, controller):
         super().__init__(parent, text="Общее", width=300)
         self.controller = controller
-        self.serial_connection = None
 
         # Инициализация состояний
         self.sensors = ["Концевик верхний", "Концевик нижний",
@@ -30,11 +37,11 @@ class LeftFrame(ttk.LabelFrame):
         button_row = ttk.Frame(frame)
         button_row.pack(fill=tk.X, pady=(0, 5))
 
-        # Кнопка обновления портов
+        # Кнопка обновления портов (список перечисляется в фоновом потоке)
         ttk.Button(
             button_row,
             text="Обновить",
-            command=self.update_ports,
+            command=self.controller.port_watcher.refresh,
             width=14
         ).pack(side=tk.LEFT, padx=2, expand=True)
 
@@ -55,7 +62,8 @@ class LeftFrame(ttk.LabelFrame):
         )
         self.port_combobox.pack(fill=tk.X, pady=(0, 5))
 
-        self.update_ports()
+        # Список из кэша; изменения приходят через шину обновлений
+        self.update_ports(self.controller.port_watcher.ports())
 
     def setup_sensor_indicators(self):
         frame = ttk.LabelFrame(self, text="Состояние датчиков", padding=10)
@@ -75,6 +83,23 @@ class LeftFrame(ttk.LabelFrame):
 
             self.sensor_labels[sensor] = (indicator, status)
 
+    def update_sensors(self, limits):
+        """
+        Обновляет индикаторы концевиков по маске из кадра состояния.
+        Вызывается в потоке Tk (через шину обновлений интерфейса).
+
+        Args:
+            limits (int): Маска нажатых концевиков
+        """
+        for sensor in self.sensors:
+            state = bool(limits & (1 << protocol.AXES.index(SENSOR_AXES[sensor])))
+            if state == self.sensor_states[sensor]:
+                continue
+            self.sensor_states[sensor] = state
+            indicator, status = self.sensor_labels[sensor]
+            indicator.config(foreground="green" if state else "red")
+            status.config(text="Вкл" if state else "Выкл")
+
     def setup_control_button(self):
         tk.Button(
             self,
@@ -85,41 +110,57 @@ class LeftFrame(ttk.LabelFrame):
             bg='lightgray'
         ).pack(fill=tk.X, padx=5, pady=10)
 
-    def update_ports(self):
-        """Обновляет список доступных COM-портов"""
-        ports = [p.device for p in serial.tools.list_ports.comports()]
-        self.port_combobox['values'] = ports
-        if ports:
-            self.port_var.set(ports[0])
+    def update_ports(self, ports):
+        """
+        Обновляет список доступных COM-портов.
+        Вызывается в потоке Tk; порты перечисляет port_watcher.PortWatcher.
+
+        Args:
+            ports (tuple): Описания портов (port_watcher.PortInfo)
+        """
+        devices = [port.device for port in ports]
+        self.port_combobox['values'] = devices
+        # Выбранный порт сохраняется, пока он есть; иначе предпочитаем контроллер робота
+        if self.port_var.get() not in devices:
+            controllers = [port.device for port in ports if port_watcher.is_controller(port)]
+            self.port_var.set((controllers or devices or [""])[0])
+
+    def update_connection(self, connected, device):
+        """
+        Показывает состояние подключения, измененное без кнопки: обрыв связи
+        или восстановление соединения port_watcher.PortWatcher.
+        Вызывается в потоке Tk (через шину обновлений интерфейса).
+
+        Args:
+            connected (bool): Соединение установлено
+            device (str): Порт отправителя команд
+        """
+        if connected:
+            self.port_var.set(device)
+        self.connect_button.config(text="Отключиться" if connected else "Подключиться")
 
     def toggle_connection(self):
-        """Переключает состояние подключения"""
+        """
+        Переключает состояние подключения.
+        Портом владеет отправитель команд: он же читает ответы Arduino.
+        """
+        sender = self.controller.manipulator.arduino_sender
         if self.connect_button.cget("text") == "Подключиться":
             if port := self.port_var.get():
-                try:
-                    self.serial_connection = serial.Serial(port, baudrate=9600, timeout=1)
+                sender.port = port
+                sender.debug_mode = False
+                if sender.connect():
                     self.connect_button.config(text="Отключиться")
-                    threading.Thread(target=self.read_serial_data, daemon=True).start()
-                except SerialException as e:
-                    print(f"Ошибка подключения: {e}")
+                    # После повторного подключения платы соединение восстанавливается
+                    self.controller.port_watcher.follow(sender)
+                else:
+                    sender.debug_mode = True
         else:
-            if self.serial_connection:
-                self.serial_connection.close()
-                self.serial_connection = None
+            self.controller.port_watcher.follow(None)
+            sender.disconnect()
+            sender.debug_mode = True
             self.connect_button.config(text="Подключиться")
 
-    def read_serial_data(self):
-        """Чтение данных с последовательного порта"""
-        while self.serial_connection and self.serial_connection.is_open:
-            try:
-                line = self.serial_connection.readline().decode('utf-8').strip()
-                if line:
-                    print(f"Получено с Arduino: {line}")
-                    # Здесь можно добавить обработку полученных данных
-            except Exception as e:
-                print(f"Ошибка чтения данных: {e}")
-                break
-
     def home_position(self):
         """Отправка команды возврата в исходное положение"""
         self.controller.send_command("В исходное положение")
\ No newline at end of file
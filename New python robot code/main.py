@@ -1,11 +1,18 @@
 import tkinter as tk
 from tkinter import ttk
-import threading
-import time
+import argparse
 from left_frame import LeftFrame
 from center_frame import CenterFrame
 from right_frame import RightFrame
+from workspace_view import WorkspaceView
+import matrics
+import program_blocks
+import program_validator
+from controller_actor import ControllerActor, PRIORITY_STATUS
 from manipulator import ManipulatorController
+from port_watcher import PortWatcher
+from program_executor import ProgramExecutor
+from ui_bus import UiBus
 
 
 class SerialApp:
@@ -14,22 +21,22 @@ class SerialApp:
     Создает графический интерфейс и управляет выполнением программы.
     """
 
-    def __init__(self, root):
+    def __init__(self, root, capture_path=None):
         """
         Инициализация главного окна приложения.
 
         Args:
             root: Главное окно Tkinter
+            capture_path (str, optional): Файл для записи обмена с Arduino
         """
         self.root = root
         self._setup_main_window()  # Настройка основного окна
-        self._init_manipulator()  # Инициализация контроллера робота
+        self._init_manipulator(capture_path)  # Инициализация контроллера робота
         self._create_frames()  # Создание интерфейсных фреймов
         self._setup_program_controls()  # Настройка управления программой
+        self._setup_ui_bus()  # Обновление интерфейса из рабочих потоков
 
-        # Состояние выполнения программы
-        self.program_running = False
-        self.program_paused = False
+        # Номер выполняемого шага (0 - программа не выполняется)
         self.current_step = 0
 
     def _setup_main_window(self):
@@ -37,10 +44,18 @@ class SerialApp:
         self.root.title("Skara robot")  # Заголовок окна
         self.root.geometry("1280x700")  # Размер окна
 
-    def _init_manipulator(self):
+    def _init_manipulator(self, capture_path=None):
         """Инициализирует контроллер манипулятора"""
-        self.manipulator = ManipulatorController()  # Создаем контроллер робота
+        self.manipulator = ManipulatorController(capture_path=capture_path)  # Создаем контроллер робота
+        # Все обращения к контроллеру выполняются в потоке актора по приоритету
+        self.actor = ControllerActor(self.manipulator)
+        self.actor.start()
+        self.executor = ProgramExecutor(self.manipulator, actor=self.actor)  # Выполнение шагов программы
         self.port = None  # COM-порт (будет установлен позже)
+        # Список портов перечисляется в фоновом потоке, интерфейс читает кэш;
+        # переподключение выполняется в потоке актора (остановкой не отменяется)
+        self.port_watcher = PortWatcher(submit=lambda func: self.actor.submit(PRIORITY_STATUS, func))
+        self.port_watcher.start()
 
     def _create_frames(self):
         """Создает и размещает основные элементы интерфейса"""
@@ -56,6 +71,11 @@ class SerialApp:
         self.right_frame = RightFrame(self.root, self)
         self.right_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=5, pady=5)
 
+        # Схема рабочей зоны под ручным управлением
+        self.workspace = WorkspaceView(self.right_frame, self.manipulator.kinematics)
+        self.workspace.pack(padx=5, pady=5)
+        self.workspace.set_grid(matrics.get_grid_coordinates())
+
     def _setup_program_controls(self):
         """Привязывает кнопки управления программой к методам"""
         controls = {
@@ -68,6 +88,44 @@ class SerialApp:
         for control, command in controls.items():
             getattr(self.center_frame, control).config(command=command)
 
+    def _setup_ui_bus(self):
+        """
+        Создает шину обновлений интерфейса.
+        Рабочие потоки публикуют в нее значения, главный цикл Tk применяет их 30 раз в секунду.
+        """
+        self.ui_bus = UiBus(self.root)
+        self.ui_bus.subscribe('step', lambda step: self.center_frame.current_step.set(str(step)))
+        self.ui_bus.subscribe('coords', self._show_coords)
+        self.ui_bus.subscribe('limits', self.left_frame.update_sensors)
+        self.ui_bus.subscribe('pose', lambda angles: self.workspace.set_pose(*angles))
+        self.ui_bus.subscribe('grid', self.workspace.set_progress)
+        self.ui_bus.subscribe('ports', self.left_frame.update_ports)
+        self.ui_bus.subscribe('connection', lambda state: self.left_frame.update_connection(*state))
+        for lamp, variable in self.center_frame.lamp_states.items():
+            self.ui_bus.subscribe(('lamp', lamp), variable.set)
+        self.ui_bus.start()
+        self.port_watcher.add_listener(lambda ports, added, removed: self.ui_bus.post('ports', ports))
+        self.ui_bus.post('ports', self.port_watcher.ports())  # Список мог обновиться до подписки
+        self.port_watcher.add_connection_listener(
+            lambda connected, device: self.ui_bus.post('connection', (connected, device)))
+
+        # Положение и концевики по кадрам состояния прошивки (после обновления контроллера)
+        self.actor.add_status_listener(self._on_status)
+
+    def _on_status(self, status):
+        """
+        Публикует положение и концевики из кадра состояния.
+        Вызывается в потоке актора контроллера.
+
+        Args:
+            status (protocol.StatusFrame): Кадр состояния
+        """
+        position = self.manipulator.current_position
+        self.update_current_coords(position['x'], position['y'], position['z'])
+        self.ui_bus.post('limits', status.limits)
+        self.ui_bus.post('pose', self.manipulator.joint_angles)
+        self.ui_bus.post('grid', self.manipulator.grid_index())
+
     def send_command(self, command):
         """
         Отправляет команду на выполнение манипулятору.
@@ -75,21 +133,44 @@ class SerialApp:
         Args:
             command (str): Команда для выполнения
         """
-        self.manipulator.execute_command(command)
+        self.actor.execute(command)
 
     def start_program(self):
-        """Запускает выполнение программы"""
-        if not self.program_running:
-            self.program_running = True
-            self.program_paused = False
-            self.current_step = 0
-            # Запускаем в отдельном потоке, чтобы не блокировать интерфейс
-            threading.Thread(target=self._run_program, daemon=True).start()
+        """Запускает выполнение программы или продолжает ее после паузы"""
+        if self.executor.is_running():
+            self.executor.resume()
+            return
+
+        steps = self.center_frame.steps_commands.get_steps()
+        numbers = sorted(steps.keys())
+        program = [steps[number] for number in numbers]
+
+        # Ошибки в программе и позициях обнаруживаются до начала движения
+        issues = program_validator.validate_program(program)
+        if issues:
+            print(f"Программа не запущена:\n{program_validator.format_issues(issues)}")
+            return
+
+        # Блоки повторения и макросы разворачиваются во время выполнения
+        commands = program_blocks.expand(program)
+        self.workspace.set_grid(matrics.get_grid_coordinates())
+        sender = self.manipulator.arduino_sender
+
+        def on_step(index, command):
+            self.current_step = numbers[commands.source_index]
+            self.ui_bus.post('step', self.current_step)
+            self.ui_bus.post('grid', self.manipulator.grid_index())
+            # Без кадров состояния схема показывает цель последней команды
+            if sender.debug_mode:
+                self.ui_bus.post('pose', (sender.targets['RUKA'], sender.targets['PLECHO']))
+
+        # Выполняется в отдельном потоке, чтобы не блокировать интерфейс
+        self.executor.start(commands, on_step=on_step, on_finish=self._on_program_finish)
 
     def pause_program(self):
-        """Ставит программу на паузу"""
-        if self.program_running and not self.program_paused:
-            self.program_paused = True
+        """Ставит программу на паузу после текущего шага"""
+        if self.executor.is_running():
+            self.executor.pause()
 
     def restart_program(self):
         """Перезапускает программу с начала"""
@@ -97,68 +178,50 @@ class SerialApp:
         self.start_program()
 
     def stop_program(self):
-        """Полностью останавливает выполнение программы"""
-        self.program_running = False
-        self.program_paused = False
+        """Немедленно останавливает выполнение программы и оси манипулятора"""
+        if not self.executor.stop():
+            print("Предупреждение: поток выполнения программы не завершился")
         self.current_step = 0
-        self.center_frame.current_step.set("0")  # Сбрасываем отображение шага
+        self.ui_bus.post('step', 0)  # Сбрасываем отображение шага
 
-    def _run_program(self):
-        """
-        Основной цикл выполнения программы.
-        Выполняет команды последовательно с заданным интервалом.
+    def _on_program_finish(self, completed):
         """
-        steps = self.center_frame.steps_commands.get_steps()
-        total_steps = len(steps)
+        Вызывается потоком выполнения по окончании программы.
 
-        while self.program_running and self.current_step < total_steps:
-            if self.program_paused:
-                time.sleep(0.1)  # При паузе просто ждем
-                continue
-
-            # Получаем текущую команду
-            step_num = sorted(steps.keys())[self.current_step]
-            command = steps[step_num]
-
-            # Выполняем команду
-            self.manipulator.execute_command(command)
-
-            # Обновляем интерфейс
-            self.center_frame.current_step.set(str(step_num))
-
-            # Переходим к следующему шагу
-            self.current_step += 1
-
-            # Задержка между командами для стабильности работы
-            time.sleep(0.5)
-
-        # Завершение программы
-        self.program_running = False
-        self.center_frame.current_step.set("0")
+        Args:
+            completed (bool): True если выполнены все шаги
+        """
+        self.current_step = 0
+        self.ui_bus.post('step', 0)
 
     def update_current_coords(self, x, y, z):
         """
         Обновляет отображение текущих координат в интерфейсе.
+        Можно вызывать из любого потока.
 
         Args:
             x (float): Координата X
             y (float): Координата Y
             z (float): Координата Z
         """
-        coords = {'X': x, 'Y': y, 'Z': z}
-        for axis, value in coords.items():
+        self.ui_bus.post('coords', (x, y, z))
+
+    def _show_coords(self, coords):
+        """Выводит координаты (x, y, z) в интерфейс. Вызывается в потоке Tk."""
+        for axis, value in zip("XYZ", coords):
             self.center_frame.current_coords[axis].set(f"{value:.2f}")
 
     def update_lamp_state(self, lamp, state):
         """
         Обновляет состояние индикатора (лампочки) в интерфейсе.
+        Можно вызывать из любого потока.
 
         Args:
             lamp (str): Название индикатора ('Вакуум', 'Доза', 'Магазин')
             state (bool): Состояние (True/False)
         """
         if lamp in self.center_frame.lamp_states:
-            self.center_frame.lamp_states[lamp].set(state)
+            self.ui_bus.post(('lamp', lamp), state)
 
 
 def center_window(root):
@@ -180,14 +243,31 @@ def center_window(root):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Управление роботом Skara")
+    parser.add_argument("--capture", help="файл для записи обмена с Arduino")
+    parser.add_argument("--metrics-prom", help="файл метрик для textfile collector Prometheus")
+    parser.add_argument("--metrics-csv", help="файл CSV со снимками метрик")
+    args = parser.parse_args()
+
+    exporter = None
+    if args.metrics_prom or args.metrics_csv:
+        import metrics
+        exporter = metrics.MetricsExporter(args.metrics_prom, args.metrics_csv)
+        exporter.start()
+
     # Создаем главное окно
     root = tk.Tk()
 
     # Инициализируем приложение
-    app = SerialApp(root)
+    app = SerialApp(root, capture_path=args.capture)
 
     # Центрируем окно на экране
     center_window(root)
 
     # Запускаем главный цикл обработки событий
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.port_watcher.stop()
+    app.actor.close()
+
+    if exporter:
+        exporter.stop()
\ No newline at end of file
@@ -1,7 +1,47 @@
+import time
+
 import matrics
 import kinematics
+import metrics
+import program_blocks
+import protocol
 from steps_for_arduino import ArduinoStepSender
 
+# Команды, которые выполняет execute_command() (кроме перехода к точке сетки)
+COMMANDS = (
+    "В исходное положение", "Движение к печке", "Движение к магазину",
+    "Вперёд дозатором", "Вперёд присоской", "Включить вакуум",
+    "Выключить вакуум", "Включить дозатор", "Выключить дозатор",
+    "Включить магазин", "Подняться", "Опуститься до магазина",
+    "Опуститься до печки", "Притирка",
+)
+
+# Высота подъема над точкой по умолчанию (мм)
+LIFT_OFFSET = 20
+
+# Метрики контроллера
+COMMAND_SECONDS = metrics.histogram('scara_execute_command_seconds',
+                                    "Время расчета и постановки команды в очередь (с)", label='command')
+GRID_CYCLE_SECONDS = metrics.histogram('scara_grid_cycle_seconds', "Время между переходами к точкам сетки (с)")
+PARTS = metrics.counter(metrics.PARTS_METRIC, "Начато точек сетки (деталей)")
+UNKNOWN_COMMANDS = metrics.counter('scara_unknown_commands_total', "Неизвестные команды")
+
+
+def command_label(command):
+    """
+    Значение метки команды для метрик: переходы к точкам сетки и
+    неизвестные команды объединяются, чтобы число меток не росло.
+
+    Args:
+        command (str): Команда манипулятора
+
+    Returns:
+        str: Значение метки
+    """
+    if command in COMMANDS:
+        return command
+    return program_blocks.GRID_POINT if command.startswith(program_blocks.GRID_POINT) else "unknown"
+
 
 class ManipulatorController:
     """
@@ -9,31 +49,44 @@ class ManipulatorController:
     Обрабатывает команды, управляет перемещениями и взаимодействует с Arduino.
     """
 
-    def __init__(self, port=None):
+    def __init__(self, port=None, capture_path=None, sender=None):
         """
         Инициализация контроллера манипулятора.
 
         Args:
             port (str, optional): COM-порт для подключения к Arduino. Defaults to None.
+            capture_path (str, optional): Файл для записи обмена с Arduino. Defaults to None.
+            sender (ArduinoStepSender, optional): Готовый отправитель команд
+                (например, RecordingStepSender для моделирования). Defaults to None.
         """
         # Настройка соединения с Arduino (в режиме отладки)
-        self.arduino_sender = ArduinoStepSender(port=port, debug_mode=True)
+        self.arduino_sender = sender or ArduinoStepSender(port=port, debug_mode=True, capture_path=capture_path)
 
-        # Текущее положение манипулятора (в мм)
+        # Текущее положение манипулятора (в мм). При подключении к Arduino
+        # обновляется по кадрам состояния, иначе - по отправленным командам
         self.current_position = {'x': 0, 'y': 0, 'z': 1000}  # Z=1000 - верхнее положение
+        self.joint_angles = (0.0, 0.0)  # Углы (руки, плеча) по кадрам состояния
+        self.limit_switches = 0  # Маска нажатых концевиков
+        self.moving = 0  # Маска движущихся осей
+        self._jog_active = False  # Ручное перемещение с ненулевой скоростью
+        self._jogged = False  # Положение изменено вручную, цели не синхронизированы
 
         # Положение в рабочей сетке (строка и столбец)
         self.grid_position = {'row': 0, 'col': 0}
 
-        # Последние рассчитанные координаты для кинематики
+        # Последние рассчитанные координаты для кинематики (цель последней команды)
         self.last_kinematics = {'x': 0, 'y': 0, 'z': 1000}
 
         # Модуль для расчетов кинематики
         self.kinematics = kinematics.Kinematics()
 
         # Параметры манипулятора
-        self.lift_offset = 20  # Высота подъема над точкой (мм)
+        self.lift_offset = LIFT_OFFSET  # Высота подъема над точкой (мм)
         self.was_rubbing = False  # Флаг выполнения притирки
+        self._grid_point_time = None  # Время перехода к предыдущей точке сетки (для метрик)
+
+        # Положение по обратной связи от прошивки
+        self.arduino_sender.add_status_listener(self._on_status)
 
     def execute_command(self, command):
         """
@@ -42,6 +95,12 @@ class ManipulatorController:
         Args:
             command (str): Название команды из списка доступных
         """
+        start = time.perf_counter()
+        self._execute_command(command)
+        COMMAND_SECONDS.labels(command_label(command)).observe(time.perf_counter() - start)
+
+    def _execute_command(self, command):
+        """Выполняет команду (без замера времени)."""
         # Словарь соответствия команд методам
         cmd_map = {
             # Основные движения
@@ -70,7 +129,18 @@ class ManipulatorController:
         # Выполняем команду если она есть в словаре
         if command in cmd_map:
             cmd_map[command]()
+            return
+
+        # Переход к точке сетки (выдается обходом сетки в program_blocks)
+        try:
+            point = program_blocks.parse_grid_point(command)
+        except ValueError as e:
+            print(f"Ошибка: {e}")
+            return
+        if point is not None:
+            self.set_grid_position(*point)
         else:
+            UNKNOWN_COMMANDS.inc()
             print(f"Ошибка: Неизвестная команда '{command}'")
 
     def go_home(self):
@@ -78,8 +148,9 @@ class ManipulatorController:
         # Рассчитываем подъем на максимальную высоту
         lift_diff = self.kinematics.calculate_lift(self.kinematics.MAX_Z)
 
-        # Отправляем команды сброса на Arduino
-        self.arduino_sender.send_step(
+        # Отправляем команды сброса на Arduino, положение на концевиках
+        # принимается за начало координат
+        self.arduino_sender.home(
             ruka=-1000,  # Сброс положения руки
             plecho=-1000,  # Сброс положения плеча
             lift=lift_diff,  # Подъем на максимальную высоту
@@ -92,19 +163,18 @@ class ManipulatorController:
 
     def move_to_glue_point(self):
         """Перемещает манипулятор к текущей точке на печке."""
-        # Получаем координаты сетки из модуля matrics
-        grid = matrics.get_grid_coordinates()
+        # Получаем координаты текущей точки сетки из модуля matrics
         current_pos = (self.grid_position['row'], self.grid_position['col'])
+        coords = matrics.get_grid_point(*current_pos)
 
         # Проверяем что позиция существует в сетке
-        if current_pos not in grid:
+        if coords is None:
             print(f"Ошибка: Позиция {current_pos} отсутствует в сетке")
             return
 
         # Получаем координаты цели
-        coords = grid[current_pos]
         target_x, target_y = float(coords['X']), float(coords['Y'])
-        current_z = self.current_position['z']
+        current_z = self.last_kinematics['z']
 
         # Выполняем перемещение в XY-плоскости
         self._move_to(target_x, target_y, current_z)
@@ -112,19 +182,19 @@ class ManipulatorController:
 
         # Если была выполнена притирка, обновляем позицию
         if self.was_rubbing:
-            self._update_position_after_rubbing(grid)
+            self._update_position_after_rubbing()
 
-    def _update_position_after_rubbing(self, grid):
+    def _update_position_after_rubbing(self):
         """Обновляет позицию в сетке после выполнения притирки."""
         old_pos = (self.grid_position['row'], self.grid_position['col'])
         self._update_grid_position()
         new_pos = (self.grid_position['row'], self.grid_position['col'])
 
         # Если позиция изменилась, перемещаемся к новой точке
-        if old_pos != new_pos and new_pos in grid:
-            new_coords = grid[new_pos]
+        new_coords = matrics.get_grid_point(*new_pos)
+        if old_pos != new_pos and new_coords is not None:
             new_x, new_y = float(new_coords['X']), float(new_coords['Y'])
-            self._move_to(new_x, new_y, self.current_position['z'])
+            self._move_to(new_x, new_y, self.last_kinematics['z'])
             print(f"Смещение к новой позиции: X={new_x:.1f}, Y={new_y:.1f}")
 
         self.was_rubbing = False
@@ -133,7 +203,7 @@ class ManipulatorController:
         """Перемещает манипулятор к позиции магазина."""
         magazine = matrics.magazine_pos
         target_x, target_y = float(magazine['X']), float(magazine['Y'])
-        current_z = self.current_position['z']
+        current_z = self.last_kinematics['z']
 
         self._move_to(target_x, target_y, current_z)
         print(f"Перемещение к магазину: X={target_x:.1f}, Y={target_y:.1f}")
@@ -142,7 +212,7 @@ class ManipulatorController:
         """Поднимает манипулятор на заданное расстояние над текущей позицией."""
         try:
             glue_z = float(matrics.glue_point['Z'])
-            current_z = self.current_position['z']
+            current_z = self.last_kinematics['z']
             target_z = min(glue_z + self.lift_offset, self.kinematics.MAX_Z)
 
             # Устанавливаем новые позиции для расчета
@@ -184,7 +254,7 @@ class ManipulatorController:
 
     def _move_down(self, target_z):
         """Внутренний метод для опускания манипулятора."""
-        current_z = self.current_position['z']
+        current_z = self.last_kinematics['z']
 
         # Устанавливаем позиции для расчета
         self.kinematics.set_positions(z=current_z, z1=target_z)
@@ -237,6 +307,95 @@ class ManipulatorController:
         self.last_kinematics = {'x': x, 'y': y, 'z': z}
         self.current_position = {'x': x, 'y': y, 'z': z}
 
+    def _on_status(self, status):
+        """
+        Обновляет текущее положение по кадру состояния прошивки.
+        Вызывается из потока чтения отправителя команд.
+
+        Args:
+            status (protocol.StatusFrame): Кадр состояния
+        """
+        # Позиции двигателей включают выбранный люфт - переводим в положения осей
+        # со смещением последнего выполненного сегмента, а не последнего сформированного
+        offset = self.arduino_sender.backlash_offset(status.done)
+        units = {axis: (steps - offset[axis]) / protocol.STEPS_PER_UNIT[axis]
+                 for axis, steps in zip(protocol.AXES, status.positions)}
+        x, y = self.kinematics.forward(units['RUKA'], units['PLECHO'])
+        # LIFT отсчитывает опускание от верхнего положения
+        z = self.kinematics.MAX_Z - units['LIFT']
+
+        self.current_position = {'x': x, 'y': y, 'z': z}
+        self.joint_angles = (units['RUKA'], units['PLECHO'])
+        self.limit_switches = status.limits
+        self.moving = status.moving
+
+        # После ручного перемещения следующие команды считаются от фактического положения
+        if self._jogged and not self._jog_active and not status.moving:
+            self.arduino_sender.sync_targets(status.positions)
+            self.last_kinematics = dict(self.current_position)
+            self._jogged = False
+
+    def jog(self, velocities):
+        """
+        Ручное перемещение осей с постоянной скоростью.
+
+        Args:
+            velocities (dict): Скорости осей {ОСЬ: шаг/с}, ноль останавливает ось
+
+        Returns:
+            bool: True если кадр отправлен
+        """
+        self._jog_active = any(velocities.values())
+        if not self.arduino_sender.jog(velocities):
+            return False
+        self._jogged = True
+        return True
+
+    def wait_idle(self, timeout=None):
+        """
+        Ожидает окончания всех отправленных перемещений.
+
+        Args:
+            timeout (float, optional): Максимальное время ожидания (с)
+
+        Returns:
+            bool: True если манипулятор остановился, False по таймауту
+        """
+        return self.arduino_sender.wait_idle(timeout)
+
+    def grid_index(self):
+        """
+        Порядковый номер текущей точки сетки (строка * столбцов + столбец).
+
+        Returns:
+            int: Индекс в порядке обхода сетки
+        """
+        return self.grid_position['row'] * int(matrics.glue_point['cols']) + self.grid_position['col']
+
+    def set_grid_position(self, row, col):
+        """
+        Явно задает текущую точку сетки. Следующая команда "Движение к печке"
+        перемещает к этой точке без автоматического сдвига после притирки.
+
+        Args:
+            row (int): Номер строки
+            col (int): Номер столбца
+        """
+        if matrics.get_grid_point(row, col) is None:
+            print(f"Ошибка: Позиция {(row, col)} отсутствует в сетке")
+            return
+        self.grid_position = {'row': row, 'col': col}
+        self.was_rubbing = False
+        self._mark_grid_point()
+
+    def _mark_grid_point(self):
+        """Учитывает в метриках переход к новой точке сетки (готовую деталь)."""
+        now = time.monotonic()
+        if self._grid_point_time is not None:
+            GRID_CYCLE_SECONDS.observe(now - self._grid_point_time)
+        self._grid_point_time = now
+        PARTS.inc()
+
     def _update_grid_position(self):
         """Обновляет позицию в рабочей сетке (автоматический инкремент)."""
         rows = int(matrics.glue_point['rows'])
@@ -254,6 +413,7 @@ class ManipulatorController:
                 # Если достигли конца сетки, начинаем сначала
                 self.grid_position['row'] = 0
 
+        self._mark_grid_point()
         print(f"Новая позиция в сетке: строка={self.grid_position['row']}, столбец={self.grid_position['col']}")
 
     def _reset_positions(self):
@@ -7,6 +7,9 @@ glue_point = {
     "cols": "1"  # Количество столбцов в сетке
 }
 
+# Расстояние между соседними точками сетки (мм)
+GRID_STEP = 10
+
 magazine_pos = {
     "X": "0.00",  # Координата X магазина
     "Y": "0.00",  # Координата Y магазина
@@ -98,21 +101,28 @@ def get_grid_coordinates():
     # Получаем параметры сетки из glue_point
     rows = int(glue_point['rows'])
     cols = int(glue_point['cols'])
-    base_x = float(glue_point['X'])
-    base_y = float(glue_point['Y'])
-    base_z = float(glue_point['Z'])
-
-    # Создаем пустой словарь для координат
-    grid_coords = {}
 
     # Генерируем координаты для каждой ячейки сетки
-    for row in range(rows):
-        for col in range(cols):
-            # Вычисляем координаты с шагом 10 мм между точками
-            grid_coords[(row, col)] = {
-                'X': str(base_x + col * 10),  # X увеличивается по столбцам
-                'Y': str(base_y + row * 10),  # Y увеличивается по строкам
-                'Z': str(base_z)  # Z одинаков для всех точек
-            }
-
-    return grid_coords
\ No newline at end of file
+    return {(row, col): get_grid_point(row, col) for row in range(rows) for col in range(cols)}
+
+
+def get_grid_point(row, col):
+    """
+    Возвращает координаты одной точки сетки без построения всей сетки.
+
+    Args:
+        row (int): Номер строки
+        col (int): Номер столбца
+
+    Returns:
+        dict: {'X': x, 'Y': y, 'Z': z} или None, если точки нет в сетке
+    """
+    if not (0 <= row < int(glue_point['rows']) and 0 <= col < int(glue_point['cols'])):
+        return None
+
+    # Вычисляем координаты с шагом GRID_STEP между точками
+    return {
+        'X': str(float(glue_point['X']) + col * GRID_STEP),  # X увеличивается по столбцам
+        'Y': str(float(glue_point['Y']) + row * GRID_STEP),  # Y увеличивается по строкам
+        'Z': str(float(glue_point['Z']))  # Z одинаков для всех точек
+    }
\ No newline at end of file
@@ -0,0 +1,382 @@
+"""
+Метрики производительности: счетчики и гистограммы с фиксированными корзинами.
+
+Метрики создаются один раз при импорте модулей и обновляются на горячем
+пути без блокировок: счетчик - одно сложение, гистограмма - bisect по
+границам корзин и два сложения. Запись значения занимает доли
+микросекунды (python metrics.py выводит замер). Цена этого - при
+одновременной записи одной метрики из нескольких потоков изредка может
+потеряться одно значение; для статистики это допустимо, а блокировка
+увеличила бы время записи в несколько раз.
+
+Метрики с меткой (например, команда) объединяются в семейство:
+family.labels("Подняться") возвращает метрику для значения метки,
+созданную при первом обращении.
+
+Экспорт:
+- write_prometheus() - текстовый файл для textfile collector
+  node_exporter (атомарная замена файла);
+- CsvExporter - периодическая дозапись снимков в CSV с ротацией файлов;
+- MetricsExporter - поток, выполняющий оба экспорта с заданным периодом
+  и вычисляющий производительность (деталей в час).
+"""
+import argparse
+import bisect
+import csv
+import os
+import threading
+import time
+
+# Границы корзин по умолчанию (с): от 100 мкс до 60 с
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Счетчик готовых деталей (точек сетки) для расчета производительности
+PARTS_METRIC = 'scara_parts_total'
+
+
+class Counter:
+    """Монотонно растущий счетчик."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels  # Пары (метка, значение)
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Увеличивает счетчик."""
+        self.value += amount
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Последняя корзина - +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Добавляет значение."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        """
+        Копия значений; общее количество считается по корзинам.
+
+        Returns:
+            tuple: (количества по корзинам, общее количество, сумма)
+        """
+        counts = list(self.counts)
+        return counts, sum(counts), self.sum
+
+    def quantile(self, q, counts=None):
+        """
+        Оценка квантиля по корзинам (верхняя граница корзины, содержащей квантиль).
+
+        Args:
+            q (float): Квантиль от 0 до 1
+            counts (list, optional): Количества по корзинам из snapshot()
+
+        Returns:
+            float: Граница корзины (inf для последней) или None, если значений нет
+        """
+        counts = counts if counts is not None else self.snapshot()[0]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, value in enumerate(counts):
+            seen += value
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+class Family:
+    """Семейство метрик одного имени с одной меткой."""
+
+    def __init__(self, registry, factory, label):
+        self._registry = registry
+        self._factory = factory
+        self.label = label
+        self._children = {}
+
+    def labels(self, value):
+        """
+        Метрика для значения метки (создается при первом обращении).
+
+        Args:
+            value (str): Значение метки
+
+        Returns:
+            Counter или Histogram
+        """
+        metric = self._children.get(value)
+        if metric is None:
+            metric = self._children[value] = self._registry.register(self._factory(((self.label, value),)))
+        return metric
+
+
+class Registry:
+    """Набор метрик процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}  # (имя, метки) -> метрика
+
+    def register(self, metric):
+        """Регистрирует метрику; для уже зарегистрированной возвращает существующую."""
+        with self._lock:
+            return self._metrics.setdefault((metric.name, metric.labels), metric)
+
+    def counter(self, name, help_text, label=None):
+        """
+        Создает счетчик или семейство счетчиков с меткой label.
+
+        Returns:
+            Counter или Family
+        """
+        if label:
+            return Family(self, lambda labels: Counter(name, help_text, labels), label)
+        return self.register(Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, label=None):
+        """
+        Создает гистограмму или семейство гистограмм с меткой label.
+
+        Returns:
+            Histogram или Family
+        """
+        if label:
+            return Family(self, lambda labels: Histogram(name, help_text, buckets, labels), label)
+        return self.register(Histogram(name, help_text, buckets))
+
+    def metrics(self):
+        """Все метрики, упорядоченные по имени."""
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda m: (m.name, m.labels))
+
+    def get(self, name):
+        """Метрика без меток по имени или None."""
+        with self._lock:
+            return self._metrics.get((name, ()))
+
+
+# Метрики процесса
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+
+
+def _format_labels(labels, extra=()):
+    """Метки в формате Prometheus: {a="1",b="2"}."""
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_prometheus(registry=REGISTRY):
+    """
+    Текст метрик в формате экспозиции Prometheus.
+
+    Returns:
+        str: Текст с HELP/TYPE и значениями
+    """
+    lines = []
+    described = set()
+    for metric in registry.metrics():
+        if metric.name not in described:
+            described.add(metric.name)
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if metric.kind == 'counter':
+            lines.append(f"{metric.name}{_format_labels(metric.labels)} {metric.value}")
+            continue
+        counts, count, total = metric.snapshot()
+        cumulative = 0
+        for bound, value in zip((*metric.buckets, '+Inf'), counts):
+            cumulative += value
+            lines.append(f"{metric.name}_bucket{_format_labels(metric.labels, (('le', bound),))} {cumulative}")
+        lines.append(f"{metric.name}_sum{_format_labels(metric.labels)} {total}")
+        lines.append(f"{metric.name}_count{_format_labels(metric.labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, registry=REGISTRY, extra=None):
+    """
+    Записывает метрики в файл для textfile collector (через временный файл).
+
+    Args:
+        path (str): Путь к файлу .prom
+        registry (Registry): Набор метрик
+        extra (dict, optional): Дополнительные значения {имя: число} (тип gauge)
+    """
+    text = format_prometheus(registry)
+    for name, value in (extra or {}).items():
+        text += f"# TYPE {name} gauge\n{name} {value}\n"
+    temp = path + ".tmp"
+    with open(temp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp, path)
+
+
+class CsvExporter:
+    """
+    Дозапись снимков метрик в CSV с ротацией.
+    Одна строка - одна метрика: время, имя, метки, количество, сумма,
+    медиана и p95 (для гистограмм - за все время, оценка по корзинам).
+    """
+
+    COLUMNS = ('time', 'metric', 'labels', 'count', 'sum', 'p50', 'p95')
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=5):
+        """
+        Args:
+            path (str): Путь к файлу CSV
+            max_bytes (int): Размер файла, после которого он переименовывается в path.1
+            backups (int): Сколько старых файлов хранить
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def _rotate(self):
+        """Сдвигает старые файлы: path.N-1 -> path.N, ..., path -> path.1."""
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write(self, registry=REGISTRY, extra=None, timestamp=None):
+        """
+        Дописывает снимок всех метрик.
+
+        Args:
+            registry (Registry): Набор метрик
+            extra (dict, optional): Дополнительные значения {имя: число}
+            timestamp (float, optional): Время снимка. Defaults to time.time().
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+        new_file = not os.path.exists(self.path)
+
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(self.COLUMNS)
+            for metric in registry.metrics():
+                labels = ";".join(f"{key}={value}" for key, value in metric.labels)
+                if metric.kind == 'counter':
+                    writer.writerow((f"{timestamp:.3f}", metric.name, labels, metric.value, "", "", ""))
+                    continue
+                counts, count, total = metric.snapshot()
+                writer.writerow((f"{timestamp:.3f}", metric.name, labels, count, f"{total:.6f}",
+                                 metric.quantile(0.5, counts), metric.quantile(0.95, counts)))
+            for name, value in (extra or {}).items():
+                writer.writerow((f"{timestamp:.3f}", name, "", "", value, "", ""))
+
+
+class MetricsExporter:
+    """Периодический экспорт метрик в файл Prometheus и/или CSV."""
+
+    def __init__(self, prometheus_path=None, csv_path=None, interval=10.0, registry=REGISTRY):
+        """
+        Args:
+            prometheus_path (str, optional): Файл для textfile collector
+            csv_path (str, optional): Файл CSV
+            interval (float): Период экспорта (с)
+            registry (Registry): Набор метрик
+        """
+        self.prometheus_path = prometheus_path
+        self.csv = CsvExporter(csv_path) if csv_path else None
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_parts = None  # (время, количество деталей) прошлого экспорта
+
+    def start(self):
+        """Запускает поток экспорта."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Останавливает поток и выполняет последний экспорт."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.export()
+
+    def parts_per_hour(self):
+        """
+        Производительность за время с прошлого вызова.
+
+        Returns:
+            float: Деталей в час или None при первом вызове
+        """
+        parts = self.registry.get(PARTS_METRIC)
+        now, value = time.monotonic(), parts.value if parts else 0
+        last, self._last_parts = self._last_parts, (now, value)
+        if last is None or now <= last[0]:
+            return None
+        return (value - last[1]) * 3600.0 / (now - last[0])
+
+    def export(self):
+        """Выполняет экспорт один раз."""
+        rate = self.parts_per_hour()
+        extra = {'scara_parts_per_hour': round(rate, 3)} if rate is not None else {}
+        try:
+            if self.prometheus_path:
+                write_prometheus(self.prometheus_path, self.registry, extra)
+            if self.csv:
+                self.csv.write(self.registry, extra)
+        except OSError as e:
+            print(f"Ошибка экспорта метрик: {e}")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замер накладных расходов метрик")
+    parser.add_argument("--samples", type=int, default=1_000_000, help="количество значений")
+    args = parser.parse_args()
+
+    registry = Registry()
+    samples = registry.histogram('bench_seconds', "Замер")
+    events = registry.counter('bench_total', "Замер")
+    values = [(i % 1000) * 1e-5 for i in range(1000)]
+
+    start = time.perf_counter()
+    for i in range(args.samples):
+        samples.observe(values[i % 1000])
+    observe = (time.perf_counter() - start) / args.samples
+
+    start = time.perf_counter()
+    for _ in range(args.samples):
+        events.inc()
+    inc = (time.perf_counter() - start) / args.samples
+
+    print(f"Histogram.observe: {observe * 1e9:.0f} нс, Counter.inc: {inc * 1e9:.0f} нс")
@@ -0,0 +1,67 @@
+"""
+Расчет времени перемещения по трапециевидному профилю AccelStepper
+и согласование скоростей осей внутри одного сегмента.
+"""
+import math
+
+import protocol
+
+
+def move_time(steps, max_speed=protocol.MAX_SPEED, acceleration=protocol.ACCELERATION):
+    """
+    Вычисляет время перемещения с разгоном и торможением.
+
+    Args:
+        steps (float): Длина перемещения в шагах (знак не важен)
+        max_speed (float): Максимальная скорость (шаг/с)
+        acceleration (float): Ускорение (шаг/с^2)
+
+    Returns:
+        float: Время перемещения (с)
+    """
+    steps = abs(steps)
+    if not steps:
+        return 0.0
+    # Путь разгона до max_speed и торможения до нуля
+    ramp = max_speed ** 2 / acceleration
+    if steps <= ramp:
+        # Треугольный профиль: скорость не успевает достичь максимума
+        return 2 * math.sqrt(steps / acceleration)
+    return steps / max_speed + max_speed / acceleration
+
+
+def scaled_profiles(deltas, max_speed=protocol.MAX_SPEED, acceleration=protocol.ACCELERATION):
+    """
+    Подбирает скорость и ускорение каждой оси так, чтобы все оси сегмента
+    пришли в цель одновременно. Профили получаются масштабированными
+    копиями профиля самой длинной оси, как в прошивке.
+
+    Args:
+        deltas (list): Перемещения осей в шагах
+
+    Returns:
+        list: Пары (max_speed, acceleration) для каждой оси (None для неподвижных)
+    """
+    longest = max((abs(d) for d in deltas), default=0)
+    profiles = []
+    for delta in deltas:
+        if not delta:
+            profiles.append(None)
+            continue
+        ratio = abs(delta) / longest
+        profiles.append((max_speed * ratio, acceleration * ratio))
+    return profiles
+
+
+def segment_time(deltas, max_speed=protocol.MAX_SPEED, acceleration=protocol.ACCELERATION):
+    """
+    Вычисляет длительность согласованного сегмента.
+
+    Args:
+        deltas (list): Перемещения осей в шагах
+
+    Returns:
+        float: Время, за которое все оси приходят в цель (с)
+    """
+    longest = max((abs(d) for d in deltas), default=0)
+    return move_time(longest, max_speed, acceleration)
@@ -0,0 +1,370 @@
+"""
+Подбор параметров программы по расчетному времени цикла без робота.
+
+Перебираются высота подъема (lift_offset контроллера), порядок обхода
+сетки (program_blocks.GRID_ORDERS), правило объединения сегментов и
+скорость/ускорение двигателей. Каждый вариант рассчитывается
+контроллером с отправителем без подключения (RecordingStepSender), как
+план программы в program_format, а время - по профилю разгона
+(motion_profile) с выдержками после команд пневматики
+(program_executor.COMMAND_DWELL).
+
+Правила объединения соседних сегментов движения (без выходов и
+обнуления, без выдержки между ними, с непересекающимися осями - ни
+одна ось не меняет направление внутри сегмента):
+    none     - не объединять (как сейчас выполняет контроллер);
+    lift     - подъем объединяется со следующим перемещением по XY:
+               рука начинает движение, не дожидаясь верхней точки;
+    disjoint - объединяются любые такие соседние сегменты.
+Контроллер сегменты не объединяет, а скорость и ускорение заданы в
+прошивке, поэтому такие варианты - оценка "что если": они помечаются в
+таблице, но лучшим и в --output выбирается только вариант, применимый
+без изменения контроллера и прошивки. По умолчанию объединение не
+перебирается.
+
+Если заданы зоны запрета (keepout), варианты, траектория которых
+задевает зону, отбрасываются: низкий подъем и объединение сегментов
+выбираются только там, где они не приводят к столкновению. Без файла
+зон подъем ниже текущего (manipulator.LIFT_OFFSET) и объединение не
+предлагаются вовсе.
+
+Кадры программы зависят только от высоты подъема и порядка обхода,
+поэтому на процесс приходится одна пара (высота, порядок): она
+рассчитывается контроллером один раз, а правила объединения и профили
+движения перебираются по готовым кадрам. Задачи распределяются по всем
+ядрам (ProcessPoolExecutor).
+
+    python optimizer.py                                   # стандартная программа по сетке
+    python optimizer.py program.json --lift 5,10,20 --speeds 3000,4000 --output best.json
+    python optimizer.py --coalesce none,lift,disjoint     # с оценкой "что если"
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import keepout
+import motion_profile
+import program_blocks
+import program_format
+import protocol
+from manipulator import LIFT_OFFSET, ManipulatorController
+from program_executor import COMMAND_DWELL, STANDARD_GLUE_POINT, STANDARD_GLUE_PROGRAM, STANDARD_MAGAZINE_POS
+from steps_for_arduino import RecordingStepSender
+
+# Правила объединения сегментов
+COALESCE_NONE = "none"
+COALESCE_LIFT = "lift"
+COALESCE_DISJOINT = "disjoint"
+COALESCE_RULES = (COALESCE_NONE, COALESCE_LIFT, COALESCE_DISJOINT)
+
+# Вариант параметров
+Candidate = namedtuple('Candidate', 'lift_offset order coalesce max_speed acceleration')
+
+# Результат расчета: время программы и на одну точку сетки (с), количество сегментов,
+# траектория не задевает зоны запрета
+Evaluation = namedtuple('Evaluation', 'candidate program_time cycle_time segments safe')
+
+# Сегмент плана: цели осей {ОСЬ: шаги}, есть ли выходы, обнуление позиций, выдержка после сегмента (с)
+Segment = namedtuple('Segment', 'targets io zero dwell')
+
+# Стандартная программа по всей сетке: деталь из магазина на каждую точку
+STANDARD_GRID_PROGRAM = (
+    STANDARD_GLUE_PROGRAM[0], program_blocks.FOR_EACH_GRID, *STANDARD_GLUE_PROGRAM[1:], program_blocks.END,
+)
+
+
+def is_applicable(candidate):
+    """
+    Проверяет, что вариант можно применить без изменения контроллера и прошивки.
+
+    Args:
+        candidate (Candidate): Вариант параметров
+
+    Returns:
+        bool: False для объединения сегментов и скорости/ускорения не из прошивки
+    """
+    return (candidate.coalesce == COALESCE_NONE and candidate.max_speed == protocol.MAX_SPEED
+            and candidate.acceleration == protocol.ACCELERATION)
+
+
+def plan_segments(steps, glue_point, magazine_pos, lift_offset, order, dwell=None):
+    """
+    Рассчитывает сегменты программы контроллером без подключения.
+
+    Args:
+        steps (list): Шаги программы (с блоками)
+        glue_point (dict): Позиции печки
+        magazine_pos (dict): Позиция магазина
+        lift_offset (float): Высота подъема над точкой (мм)
+        order (str): Порядок обхода сетки
+        dwell (dict, optional): Выдержка после команд. По умолчанию COMMAND_DWELL
+
+    Returns:
+        tuple: (список Segment, количество точек сетки)
+    """
+    dwell = COMMAND_DWELL if dwell is None else dwell
+    sender = RecordingStepSender()
+    controller = ManipulatorController(sender=sender)
+    controller.lift_offset = lift_offset
+
+    segments = []
+    points = 0
+    with program_format._program_positions(program_format._typed_positions(glue_point, magazine_pos)), \
+            open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for command in program_blocks.expand(steps, order):
+            if command.startswith(program_blocks.GRID_POINT):
+                points += 1
+            start = len(sender.frames)
+            controller.execute_command(command)
+            for frame in sender.frames[start:]:
+                fields = protocol.parse_frame(frame)
+                del fields[protocol.SEGMENT]
+                targets = {axis: int(fields.pop(axis)) for axis in protocol.AXES if axis in fields}
+                zero = fields.pop(protocol.ZERO, None) is not None
+                segments.append(Segment(targets, bool(fields), zero, 0.0))
+            # Выдержка - после последнего сегмента команды
+            if len(sender.frames) > start and dwell.get(command):
+                segments[-1] = segments[-1]._replace(dwell=dwell[command])
+    return segments, points
+
+
+def _is_motion(segment):
+    return bool(segment.targets) and not segment.io and not segment.zero
+
+
+def coalesce(segments, rule):
+    """
+    Объединяет соседние сегменты движения по правилу.
+
+    Args:
+        segments (list): Сегменты плана (Segment)
+        rule (str): Правило (COALESCE_RULES)
+
+    Returns:
+        list: Сегменты после объединения
+    """
+    if rule == COALESCE_NONE:
+        return list(segments)
+
+    result = []
+    positions = dict.fromkeys(protocol.AXES, 0)  # Цели перед последним сегментом результата
+    for segment in segments:
+        previous = result[-1] if result else None
+        if (previous is not None and _is_motion(previous) and _is_motion(segment) and not previous.dwell
+                and not previous.targets.keys() & segment.targets.keys()
+                and (rule == COALESCE_DISJOINT or _is_lift_up(previous, positions))):
+            result[-1] = previous._replace(targets={**previous.targets, **segment.targets}, dwell=segment.dwell)
+            continue
+        if previous is not None:
+            positions = _apply(previous, positions)
+        result.append(segment)
+    return result
+
+
+def _is_lift_up(segment, positions):
+    """Сегмент - только подъем (LIFT отсчитывает опускание: подъем уменьшает значение оси)."""
+    if set(segment.targets) != {'LIFT'}:
+        return False
+    return (segment.targets['LIFT'] - positions['LIFT']) / protocol.STEPS_PER_UNIT['LIFT'] < 0
+
+
+def _apply(segment, positions):
+    """Цели осей после сегмента."""
+    if segment.zero:
+        return dict.fromkeys(protocol.AXES, 0)
+    return {**positions, **segment.targets}
+
+
+def program_time(segments, max_speed=protocol.MAX_SPEED, acceleration=protocol.ACCELERATION):
+    """
+    Расчетное время выполнения сегментов с выдержками.
+
+    Args:
+        segments (list): Сегменты плана (Segment)
+        max_speed (float): Максимальная скорость (шаг/с)
+        acceleration (float): Ускорение (шаг/с^2)
+
+    Returns:
+        float: Время (с)
+    """
+    positions = dict.fromkeys(protocol.AXES, 0)
+    total = 0.0
+    for segment in segments:
+        if segment.targets:
+            deltas = [target - positions[axis] for axis, target in segment.targets.items()]
+            total += motion_profile.segment_time(deltas, max_speed, acceleration)
+        total += segment.dwell
+        positions = _apply(segment, positions)
+    return total
+
+
+def evaluate_group(steps, glue_point, magazine_pos, lift_offset, order, rules, motions, zones=None):
+    """
+    Рассчитывает все варианты с одной высотой подъема и порядком обхода.
+    Выполняется в процессе пула.
+
+    Args:
+        rules (list): Правила объединения
+        motions (list): Пары (скорость, ускорение)
+        zones (keepout.KeepoutConfig, optional): Зоны запрета
+
+    Returns:
+        list: Результаты (Evaluation)
+    """
+    segments, points = plan_segments(steps, glue_point, magazine_pos, lift_offset, order)
+    checker = keepout.KeepoutChecker(zones) if zones and zones.zones else None
+    results = []
+    for rule in rules:
+        merged = coalesce(segments, rule)
+        # Траектория не зависит от скорости: проверяется один раз на правило
+        safe = not checker or not checker.check_segments([(s.targets, s.zero) for s in merged], first_only=True)
+        for max_speed, acceleration in motions:
+            total = program_time(merged, max_speed, acceleration)
+            results.append(Evaluation(Candidate(lift_offset, order, rule, max_speed, acceleration),
+                                      total, total / max(points, 1), len(merged), safe))
+    return results
+
+
+def optimize(steps, glue_point, magazine_pos, lifts, orders, rules, motions, workers=None, zones=None):
+    """
+    Перебирает все сочетания параметров.
+
+    Args:
+        steps (list): Шаги программы
+        glue_point (dict): Позиции печки
+        magazine_pos (dict): Позиция магазина
+        lifts (list): Высоты подъема (мм)
+        orders (list): Порядки обхода сетки
+        rules (list): Правила объединения сегментов
+        motions (list): Пары (скорость, ускорение)
+        workers (int, optional): Количество процессов. По умолчанию - по числу ядер; 1 - без пула
+        zones (keepout.KeepoutConfig, optional): Зоны запрета
+
+    Returns:
+        list: Результаты (Evaluation), от лучшего к худшему; задевающие зоны - в конце
+    """
+    groups = [(steps, glue_point, magazine_pos, lift, order, rules, motions, zones)
+              for lift in lifts for order in orders]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(groups) == 1:
+        batches = [evaluate_group(*group) for group in groups]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(groups))) as pool:
+            batches = list(pool.map(evaluate_group, *zip(*groups)))
+    results = [result for batch in batches for result in batch]
+    # При равном времени предпочтение - большей высоте подъема и меньшей скорости
+    return sorted(results, key=lambda r: (not r.safe, round(r.program_time, 9), -r.candidate.lift_offset,
+                                          r.candidate.max_speed, r.candidate.acceleration))
+
+
+def _numbers(text):
+    return [float(value) for value in text.split(",") if value.strip()]
+
+
+def _names(text, allowed, option):
+    names = [value.strip() for value in text.split(",") if value.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"{option}: неизвестные значения {', '.join(unknown)} (допустимы {', '.join(allowed)})")
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Подбор параметров программы по расчетному времени цикла")
+    parser.add_argument("program", nargs="?", help="файл программы (по умолчанию - стандартная программа по сетке)")
+    parser.add_argument("--lift", default="5,10,15,20,25,30", help="высоты подъема lift_offset (мм)")
+    parser.add_argument("--orders", default=",".join(program_blocks.GRID_ORDERS), help="порядки обхода сетки")
+    parser.add_argument("--coalesce", default=COALESCE_NONE,
+                        help=f"правила объединения сегментов ({', '.join(COALESCE_RULES)}; кроме none - что если)")
+    parser.add_argument("--speeds", default=str(protocol.MAX_SPEED), help="максимальные скорости (шаг/с)")
+    parser.add_argument("--accelerations", default=str(protocol.ACCELERATION), help="ускорения (шаг/с^2)")
+    parser.add_argument("--workers", type=int, help="количество процессов (по умолчанию - по числу ядер)")
+    parser.add_argument("--top", type=int, default=5, help="сколько лучших вариантов вывести")
+    parser.add_argument("--output", help="записать лучший вариант в файл JSON")
+    parser.add_argument("--keepout", default=keepout.KEEPOUT_FILE, help="файл зон запрета")
+    args = parser.parse_args(argv)
+
+    try:
+        lifts = _numbers(args.lift)
+        orders = _names(args.orders, program_blocks.GRID_ORDERS, "--orders")
+        rules = _names(args.coalesce, COALESCE_RULES, "--coalesce")
+        motions = [(speed, acceleration) for speed in _numbers(args.speeds)
+                   for acceleration in _numbers(args.accelerations)]
+        if not (lifts and orders and rules and motions) or min(lifts) < 0 or min(min(m) for m in motions) <= 0:
+            raise ValueError("нужны непустые списки, высоты не меньше 0, скорости и ускорения больше 0")
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.program:
+        import program_io
+        try:
+            steps, glue_point, magazine_pos = program_io.load_program(args.program)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка загрузки программы: {e}", file=sys.stderr)
+            return 2
+        steps = list(steps)
+    else:
+        steps, glue_point, magazine_pos = list(STANDARD_GRID_PROGRAM), STANDARD_GLUE_POINT, STANDARD_MAGAZINE_POS
+    try:
+        zones = keepout.load_keepout(args.keepout)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not zones.zones:
+        # Без зон запрета нельзя проверить, что более низкая траектория ничего не задевает
+        allowed_lifts = [lift for lift in lifts if lift >= LIFT_OFFSET]
+        allowed_rules = [rule for rule in rules if rule == COALESCE_NONE]
+        if (allowed_lifts, allowed_rules) != (lifts, rules):
+            print(f"Зоны запрета не заданы ({args.keepout}): подъем ниже {LIFT_OFFSET:g} мм "
+                  f"и объединение сегментов не рассматриваются")
+        lifts, rules = allowed_lifts, allowed_rules
+        if not (lifts and rules):
+            print("Нет вариантов для перебора без зон запрета", file=sys.stderr)
+            return 2
+
+    results = optimize(steps, glue_point, magazine_pos, lifts, orders, rules, motions, args.workers, zones)
+    current = next((r for r in results if r.candidate == Candidate(LIFT_OFFSET, program_blocks.ORDER_ROWS, COALESCE_NONE,
+                                                                   protocol.MAX_SPEED, protocol.ACCELERATION)), None)
+
+    rejected = sum(1 for result in results if not result.safe)
+    print(f"Вариантов: {len(results)}, зон запрета: {len(zones.zones)}, задевают зоны: {rejected}")
+    results = [result for result in results if result.safe]
+    if not results:
+        print("Все варианты задевают зоны запрета")
+        return 1
+    print(f"{'подъем':>7} {'обход':>10} {'объед.':>8} {'скорость':>8} {'ускор.':>7} {'сегм.':>6} "
+          f"{'программа':>10} {'на точку':>9}")
+    for result in results[:args.top]:
+        c = result.candidate
+        label = "" if is_applicable(c) else "  что если"
+        print(f"{c.lift_offset:7g} {c.order:>10} {c.coalesce:>8} {c.max_speed:8g} {c.acceleration:7g} "
+              f"{result.segments:6d} {result.program_time:9.2f}с {result.cycle_time:8.2f}с{label}")
+    if not all(is_applicable(result.candidate) for result in results[:args.top]):
+        print("что если - требует объединения сегментов в контроллере или других MAX_SPEED/ACCELERATION в прошивке")
+    best = next((result for result in results if is_applicable(result.candidate)), None)
+    if best is None:
+        print("Нет вариантов, применимых без изменения контроллера и прошивки")
+        return 1
+    print(f"Лучший применимый вариант: подъем {best.candidate.lift_offset:g} мм, обход {best.candidate.order}, "
+          f"{best.program_time:.2f} с")
+    if current is not None:
+        saving = current.program_time - best.program_time
+        print(f"Текущие параметры: {current.program_time:.2f} с, лучший применимый вариант быстрее на "
+              f"{saving:.2f} с ({saving / current.program_time * 100:.0f}%)")
+
+    if args.output:
+        data = {**best.candidate._asdict(), 'program_time': best.program_time, 'cycle_time': best.cycle_time}
+        temp_path = args.output + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, args.output)
+        print(f"Лучший применимый вариант сохранен в {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
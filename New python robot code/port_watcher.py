@@ -0,0 +1,339 @@
+"""
+Фоновое отслеживание последовательных портов.
+
+Перечисление портов (serial.tools.list_ports.comports()) на машинах с
+большим количеством виртуальных портов занимает до нескольких секунд,
+поэтому оно выполняется в фоновом потоке: список кэшируется, интерфейс
+читает только кэш. Список обновляется периодически, а на Linux с
+установленным pyudev - сразу по событию подключения или отключения
+устройства.
+
+Контроллер робота определяется по VID/PID платы (Arduino и
+распространенные USB-UART преобразователи) или, по желанию, проверкой
+ответа: в порт отправляется запрос состояния '?', прошивка отвечает
+кадром состояния.
+
+Если отслеживаемый отправитель команд потерял соединение (кабель
+отключен), после появления порта того же устройства (по серийному
+номеру, иначе по VID/PID или имени порта) порт открывается снова -
+в потоке владельца отправителя (ControllerActor), если он задан.
+Очередь сегментов при обрыве сбрасывается, выполняемая программа
+останавливается, а движение разрешается только после поиска исходного
+положения. Об исчезновении устройства и восстановлении соединения
+сообщается обработчикам состояния подключения.
+"""
+import threading
+import time
+from collections import namedtuple
+
+import protocol
+
+# Описание порта: имя устройства, описание, VID, PID, серийный номер
+PortInfo = namedtuple('PortInfo', 'device description vid pid serial_number')
+
+# Известные платы контроллера: (VID, PID), PID None - любой
+CONTROLLER_IDS = (
+    (0x2341, None),  # Arduino
+    (0x2A03, None),  # Arduino (arduino.org)
+    (0x1A86, 0x7523),  # CH340 (клоны Arduino)
+    (0x0403, 0x6001),  # FTDI FT232R
+    (0x10C4, 0xEA60),  # Silicon Labs CP210x
+)
+
+# Период опроса списка портов по умолчанию (с)
+DEFAULT_INTERVAL = 2.0
+
+# Интервал ожидания событий udev, между интервалами проверяются refresh() и stop() (с)
+UDEV_SLICE = 0.2
+
+
+def is_controller(port):
+    """
+    Проверяет по VID/PID, похож ли порт на контроллер робота.
+
+    Args:
+        port (PortInfo): Описание порта
+
+    Returns:
+        bool: True для известных плат
+    """
+    return any(port.vid == vid and (pid is None or port.pid == pid) for vid, pid in CONTROLLER_IDS)
+
+
+def list_ports():
+    """
+    Перечисляет порты (медленно - вызывать не в потоке интерфейса).
+
+    Returns:
+        tuple: Описания портов (PortInfo), отсортированные по имени
+    """
+    import serial.tools.list_ports
+
+    return tuple(sorted((PortInfo(p.device, p.description, p.vid, p.pid, p.serial_number)
+                         for p in serial.tools.list_ports.comports()), key=lambda p: p.device))
+
+
+def handshake(device, baudrate=protocol.BAUDRATE, timeout=4.0):
+    """
+    Проверяет, отвечает ли на порту прошивка робота.
+    Плата Arduino перезагружается при открытии порта, поэтому проверка
+    занимает несколько секунд.
+
+    Args:
+        device (str): Имя порта
+        baudrate (int): Скорость
+        timeout (float): Время ожидания кадра состояния (с)
+
+    Returns:
+        bool: True, если получен кадр состояния
+    """
+    import serial
+
+    try:
+        with serial.Serial(device, baudrate, timeout=0.2) as connection:
+            deadline = time.monotonic() + timeout
+            next_query = 0.0
+            while time.monotonic() < deadline:
+                # Запрос повторяется: первые байты теряются, пока плата загружается
+                if time.monotonic() >= next_query:
+                    connection.write(protocol.QUERY.encode('ascii'))
+                    next_query = time.monotonic() + 0.5
+                line = connection.readline().decode('utf-8', errors='replace').strip()
+                if not line:
+                    continue
+                try:
+                    if protocol.decode_status(protocol.parse_frame(line)) is not None:
+                        return True
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return False
+
+
+class PortWatcher:
+    """
+    Фоновый поток со списком портов.
+    Обработчики изменений вызываются в потоке отслеживания.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, use_handshake=False, lister=list_ports, submit=None):
+        """
+        Args:
+            interval (float): Период опроса (с)
+            use_handshake (bool): Проверять ответом порты с неизвестными VID/PID
+            lister (callable): Функция перечисления портов
+            submit (callable, optional): submit(func) - выполнить переподключение
+                в потоке владельца отправителя; без него - в потоке отслеживания
+        """
+        self.interval = interval
+        self.use_handshake = use_handshake
+        self._lister = lister
+        self._submit = submit
+        self._ports = ()  # Кэш списка портов
+        self._controllers = set()  # Порты, признанные контроллером
+        self._checked = set()  # Порты, уже проверенные ответом
+        self._listeners = []
+        self._connection_listeners = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+        self._sender = None  # Отправитель, соединение которого восстанавливается
+        self._sender_port = None  # Описание порта, к которому он был подключен
+
+    def start(self):
+        """Запускает поток отслеживания."""
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Останавливает поток отслеживания."""
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def refresh(self):
+        """Запрашивает внеочередное обновление списка (не ждет его)."""
+        self._wakeup.set()
+
+    def ports(self):
+        """
+        Последний известный список портов (без обращения к системе).
+
+        Returns:
+            tuple: Описания портов (PortInfo)
+        """
+        return self._ports
+
+    def controller_ports(self):
+        """
+        Порты из кэша, признанные контроллером робота.
+
+        Returns:
+            list: Описания портов (PortInfo)
+        """
+        with self._lock:
+            return [port for port in self._ports if port.device in self._controllers]
+
+    def add_listener(self, listener):
+        """
+        Добавляет обработчик изменений списка.
+
+        Args:
+            listener (callable): listener(ports, added, removed) - новый список и изменения
+        """
+        self._listeners.append(listener)
+
+    def add_connection_listener(self, listener):
+        """
+        Добавляет обработчик состояния подключения отслеживаемого отправителя.
+        Вызывается в потоке отслеживания (устройство исчезло) или в потоке
+        переподключения (соединение восстановлено).
+
+        Args:
+            listener (callable): listener(connected, device) - есть ли соединение и имя порта
+        """
+        self._connection_listeners.append(listener)
+
+    def follow(self, sender):
+        """
+        Восстанавливать соединение отправителя после повторного подключения платы.
+
+        Args:
+            sender (ArduinoStepSender): Подключенный отправитель; None - не отслеживать
+        """
+        with self._lock:
+            self._sender = sender
+            self._sender_port = next((port for port in self._ports if sender and port.device == sender.port),
+                                     PortInfo(sender.port, None, None, None, None) if sender else None)
+
+    def _run(self):
+        """Цикл отслеживания: опрос по таймеру или по событию udev."""
+        monitor = self._udev_monitor()
+        while self._running:
+            self._scan()
+            if monitor is not None:
+                self._wait_udev(monitor)
+            else:
+                self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def _wait_udev(self, monitor):
+        """
+        Ожидает события udev до конца периода опроса.
+        monitor.poll() не прерывается событием _wakeup, поэтому ожидание
+        идет интервалами UDEV_SLICE с проверкой refresh() и stop() между ними.
+        """
+        deadline = time.monotonic() + self.interval
+        while self._running and not self._wakeup.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            # Событие udev прерывает ожидание раньше периода опроса
+            if monitor.poll(timeout=min(UDEV_SLICE, remaining)) is not None:
+                time.sleep(0.5)  # Даем системе создать устройство порта
+                return
+
+    def _udev_monitor(self):
+        """Монитор событий tty через pyudev или None, если pyudev не установлен."""
+        try:
+            import pyudev
+        except ImportError:
+            return None
+        try:
+            monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            monitor.filter_by('tty')
+            monitor.start()
+            return monitor
+        except (OSError, ValueError) as e:
+            print(f"События udev недоступны, используется опрос: {e}")
+            return None
+
+    def _scan(self):
+        """Обновляет кэш и сообщает об изменениях."""
+        try:
+            ports = self._lister()
+        except Exception as e:
+            print(f"Ошибка перечисления портов: {e}")
+            return
+
+        previous = {port.device for port in self._ports}
+        current = {port.device for port in ports}
+        added = [port for port in ports if port.device not in previous]
+        removed = sorted(previous - current)
+
+        controllers = {port.device for port in ports if is_controller(port)}
+        if self.use_handshake:
+            for port in added:
+                if port.device not in controllers and port.device not in self._checked:
+                    self._checked.add(port.device)
+                    if handshake(port.device):
+                        controllers.add(port.device)
+            controllers |= {device for device in self._controllers if device in current}
+        self._checked &= current
+
+        with self._lock:
+            self._ports = ports
+            self._controllers = controllers
+        if added or removed:
+            for listener in list(self._listeners):
+                try:
+                    listener(ports, added, removed)
+                except Exception as e:
+                    print(f"Ошибка обработчика списка портов: {e}")
+            self._reconnect(added, removed)
+
+    def _notify_connection(self, connected, device):
+        """Сообщает обработчикам о состоянии подключения."""
+        for listener in list(self._connection_listeners):
+            try:
+                listener(connected, device)
+            except Exception as e:
+                print(f"Ошибка обработчика состояния подключения: {e}")
+
+    def _reconnect(self, added, removed):
+        """Подключает отслеживаемый отправитель к вернувшемуся устройству."""
+        with self._lock:
+            sender, known = self._sender, self._sender_port
+        if sender is None or sender.debug_mode:
+            return
+        if known.device in removed:
+            self._notify_connection(False, known.device)
+        if sender.connection is not None or not added:
+            return
+
+        if known.serial_number:
+            candidates = [port for port in added if port.serial_number == known.serial_number]
+        elif known.vid is not None:
+            candidates = [port for port in added if (port.vid, port.pid) == (known.vid, known.pid)]
+        else:
+            candidates = [port for port in added if port.device == known.device]
+        if not candidates:
+            return
+
+        port = candidates[0]
+        print(f"Устройство снова подключено ({port.device}), восстанавливаем соединение")
+        if self._submit is not None:
+            self._submit(lambda: self._connect(sender, port))
+        else:
+            self._connect(sender, port)
+
+    def _connect(self, sender, port):
+        """Подключает отправитель к порту (в потоке владельца отправителя)."""
+        # Пока переподключение ждало очереди, отправитель могли отключить или подключить вручную
+        with self._lock:
+            if self._sender is not sender:
+                return
+        if sender.connection is not None:
+            return
+        sender.port = port.device
+        if sender.connect():
+            with self._lock:
+                self._sender_port = port
+            print("Соединение восстановлено; позиции осей сброшены прошивкой - выполните поиск исходного положения")
+            self._notify_connection(True, port.device)
@@ -0,0 +1,275 @@
+"""
+Профилирование горячего пути с выводом в формате Chrome trace.
+
+По умолчанию ничего не меняется и накладных расходов нет: функции
+горячего пути остаются исходными. enable() подменяет их обертками,
+которые записывают интервалы (имя, поток, начало, длительность) в
+заранее выделенный кольцевой буфер, disable() возвращает исходные
+функции. В режиме выборки (sample_every=N) записывается только каждый
+N-й вызов каждой функции.
+
+Буфер сохраняется в JSON формата Trace Event (chrome://tracing,
+Perfetto) - выполнение программы видно на временной шкале по потокам.
+
+    python profiling.py program.json --out trace.json
+    python profiling.py program.json --out trace.json --sample 10
+"""
+import argparse
+import contextlib
+import functools
+import importlib
+import itertools
+import json
+import os
+import threading
+import time
+from array import array
+
+# Функции, оборачиваемые enable(): (модуль, класс или None, атрибут)
+HOT_PATH = (
+    ('kinematics', 'Kinematics', '_calc_angles'),
+    ('matrics', None, 'get_grid_coordinates'),
+    ('matrics', None, 'get_grid_point'),
+    ('manipulator', 'ManipulatorController', 'execute_command'),
+    ('manipulator', 'ManipulatorController', '_move_to'),
+    ('steps_for_arduino', 'ArduinoStepSender', 'send_step'),
+)
+
+# Размер буфера по умолчанию (интервалов)
+DEFAULT_CAPACITY = 1 << 20
+
+
+class TraceBuffer:
+    """
+    Кольцевой буфер интервалов в массивах фиксированного размера.
+    Место под запись выделяется атомарно (next() счетчика под GIL),
+    поэтому запись из нескольких потоков не требует блокировки.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        Args:
+            capacity (int): Количество хранимых интервалов (старые перезаписываются)
+        """
+        self.capacity = capacity
+        self.starts = array('q', bytes(8 * capacity))  # Начало (нс, perf_counter_ns)
+        self.durations = array('q', bytes(8 * capacity))  # Длительность (нс)
+        self.names = array('H', bytes(2 * capacity))  # Номер имени в self.labels
+        self.threads = array('L', bytes(array('L').itemsize * capacity))  # Номер потока
+        self.labels = []  # Имена интервалов
+        self._label_ids = {}
+        self._slots = itertools.count()
+        self._written = 0
+
+    def label_id(self, name):
+        """Номер имени интервала (регистрируется при первом обращении)."""
+        index = self._label_ids.get(name)
+        if index is None:
+            index = self._label_ids.setdefault(name, len(self.labels))
+            if index == len(self.labels):
+                self.labels.append(name)
+        return index
+
+    def record(self, label, start, duration):
+        """
+        Записывает интервал.
+
+        Args:
+            label (int): Номер имени из label_id()
+            start (int): Начало (нс)
+            duration (int): Длительность (нс)
+        """
+        slot = next(self._slots)
+        index = slot % self.capacity
+        self.starts[index] = start
+        self.durations[index] = duration
+        self.names[index] = label
+        self.threads[index] = threading.get_ident() & 0xFFFFFFFF
+        self._written = slot + 1
+
+    def __len__(self):
+        return min(self._written, self.capacity)
+
+    def clear(self):
+        """Очищает буфер (массивы не перевыделяются)."""
+        self._slots = itertools.count()
+        self._written = 0
+
+    def events(self):
+        """
+        Записанные интервалы в порядке записи.
+
+        Returns:
+            list: Кортежи (имя, поток, начало нс, длительность нс)
+        """
+        written = self._written
+        first = max(0, written - self.capacity)
+        result = []
+        for slot in range(first, written):
+            index = slot % self.capacity
+            result.append((self.labels[self.names[index]], self.threads[index],
+                           self.starts[index], self.durations[index]))
+        return result
+
+    def to_chrome_trace(self, pid=None):
+        """
+        Интервалы в формате Trace Event.
+
+        Returns:
+            dict: {'traceEvents': [...], 'displayTimeUnit': 'ms'}
+        """
+        pid = os.getpid() if pid is None else pid
+        events = self.events()
+        origin = min((start for _, _, start, _ in events), default=0)
+        trace = [{'name': name, 'ph': 'X', 'pid': pid, 'tid': thread,
+                  'ts': (start - origin) / 1000, 'dur': duration / 1000}
+                 for name, thread, start, duration in events]
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path):
+        """
+        Сохраняет интервалы в JSON для chrome://tracing или Perfetto.
+
+        Args:
+            path (str): Путь к файлу
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+
+
+# Буфер и исходные функции при включенном профилировании
+_buffer = None
+_originals = []  # (владелец, атрибут, исходная функция)
+_lock = threading.Lock()
+
+
+def _wrap(func, name, buffer, sample_every):
+    """Обертка функции, записывающая интервал каждого (или каждого N-го) вызова."""
+    label = buffer.label_id(name)
+    clock = time.perf_counter_ns
+    record = buffer.record
+
+    if sample_every <= 1:
+        @functools.wraps(func)
+        def traced(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(label, start, clock() - start)
+        return traced
+
+    calls = itertools.count()
+
+    @functools.wraps(func)
+    def sampled(*args, **kwargs):
+        if next(calls) % sample_every:
+            return func(*args, **kwargs)
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(label, start, clock() - start)
+    return sampled
+
+
+def enable(capacity=DEFAULT_CAPACITY, sample_every=1, targets=HOT_PATH):
+    """
+    Включает профилирование: подменяет функции горячего пути обертками.
+
+    Args:
+        capacity (int): Размер буфера (интервалов)
+        sample_every (int): Записывать каждый N-й вызов каждой функции
+        targets (iterable): Функции (модуль, класс или None, атрибут)
+
+    Returns:
+        TraceBuffer: Буфер, в который пишутся интервалы
+    """
+    global _buffer
+    with _lock:
+        if _buffer is not None:
+            return _buffer
+        _buffer = TraceBuffer(capacity)
+        for module_name, class_name, attribute in targets:
+            owner = importlib.import_module(module_name)
+            if class_name:
+                owner = getattr(owner, class_name)
+            func = getattr(owner, attribute)
+            name = f"{class_name}.{attribute}" if class_name else f"{module_name}.{attribute}"
+            _originals.append((owner, attribute, func))
+            setattr(owner, attribute, _wrap(func, name, _buffer, sample_every))
+        return _buffer
+
+
+def disable():
+    """
+    Выключает профилирование и возвращает исходные функции.
+
+    Returns:
+        TraceBuffer: Заполненный буфер или None, если профилирование не было включено
+    """
+    global _buffer
+    with _lock:
+        while _originals:
+            owner, attribute, func = _originals.pop()
+            setattr(owner, attribute, func)
+        buffer, _buffer = _buffer, None
+        return buffer
+
+
+def is_enabled():
+    """Проверяет, включено ли профилирование."""
+    return _buffer is not None
+
+
+@contextlib.contextmanager
+def _recording_span(buffer, name):
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        buffer.record(buffer.label_id(name), start, time.perf_counter_ns() - start)
+
+
+def span(name):
+    """
+    Контекстный менеджер для произвольного участка кода.
+    При выключенном профилировании возвращает пустой контекст.
+
+    Args:
+        name (str): Имя интервала
+    """
+    buffer = _buffer
+    if buffer is None:
+        return contextlib.nullcontext()
+    return _recording_span(buffer, name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Профилирование программы без подключения к Arduino")
+    parser.add_argument("program", help="файл программы")
+    parser.add_argument("--out", default="trace.json", help="файл Chrome trace")
+    parser.add_argument("--sample", type=int, default=1, help="записывать каждый N-й вызов")
+    args = parser.parse_args()
+
+    import program_blocks
+    import program_io
+    from headless import apply_positions
+    from manipulator import ManipulatorController
+    from steps_for_arduino import RecordingStepSender
+
+    steps, glue, magazine = program_io.load_program(args.program)
+    apply_positions(glue, magazine)
+
+    trace = enable(sample_every=args.sample)
+    controller = ManipulatorController(sender=RecordingStepSender())
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for step in program_blocks.expand(steps):
+            with span("step"):
+                controller.execute_command(step)
+    elapsed = time.perf_counter() - started
+    disable()
+
+    trace.dump(args.out)
+    print(f"Программа рассчитана за {elapsed * 1e3:.1f} мс, записано интервалов: {len(trace)} -> {args.out}")
@@ -0,0 +1,287 @@
+"""
+Блоки программы: повторение, обход сетки печки и макросы.
+
+Блоки записываются обычными шагами программы, поэтому список шагов и
+формат файлов не меняются:
+
+    Макрос Нанесение
+        Движение к печке
+        Опуститься до печки
+        Включить дозатор
+        Выключить дозатор
+        Подняться
+    Конец блока
+    В исходное положение
+    Для каждой точки сетки
+        Выполнить Нанесение
+    Конец блока
+    Повторить 3
+        Притирка
+    Конец блока
+
+Блоки разворачиваются генератором во время выполнения: в памяти
+хранится только разобранная программа и стек вложенных блоков, а не
+все шаги, поэтому обход сетки в десятки тысяч точек занимает столько
+же памяти, сколько и одна точка.
+
+Перед каждой итерацией обхода сетки генератор выдает команду
+"Точка сетки строка,столбец": контроллер явно переходит к этой точке,
+а не сдвигается по сетке после притирки. Порядок обхода - по строкам
+(каждая строка слева направо) или змейкой (четные строки слева направо,
+нечетные - справа налево, без холостого возврата в начало строки).
+"""
+from collections import namedtuple
+
+import matrics
+
+# Ключевые слова блоков
+REPEAT = "Повторить"
+FOR_EACH_GRID = "Для каждой точки сетки"
+MACRO = "Макрос"
+CALL = "Выполнить"
+END = "Конец блока"
+# Команда перехода к точке сетки (выполняется контроллером)
+GRID_POINT = "Точка сетки"
+
+# Порядок обхода сетки
+ORDER_ROWS = "rows"
+ORDER_SERPENTINE = "serpentine"
+GRID_ORDERS = (ORDER_ROWS, ORDER_SERPENTINE)
+
+# Узлы разобранной программы; source - индекс шага в исходном списке
+Command = namedtuple('Command', 'source text')
+Repeat = namedtuple('Repeat', 'source count body')
+ForEachGrid = namedtuple('ForEachGrid', 'source body')
+Call = namedtuple('Call', 'source name')
+
+
+def _keyword_argument(text, keyword):
+    """Возвращает аргумент после ключевого слова или None, если шаг начинается не с него."""
+    if text == keyword or text.startswith(keyword + " "):
+        return text[len(keyword):].strip()
+    return None
+
+
+def parse_grid_point(command):
+    """
+    Разбирает команду перехода к точке сетки.
+
+    Args:
+        command (str): Команда вида "Точка сетки 2,5"
+
+    Returns:
+        tuple: (строка, столбец) или None, если это другая команда
+
+    Raises:
+        ValueError: Если номера строки и столбца некорректны
+    """
+    argument = _keyword_argument(command.strip(), GRID_POINT)
+    if argument is None:
+        return None
+    row, sep, col = argument.partition(",")
+    try:
+        return int(row), int(col)
+    except ValueError:
+        raise ValueError(f"Некорректная точка сетки: '{command}'") from None
+
+
+def parse_program(commands):
+    """
+    Разбирает шаги программы в дерево блоков.
+
+    Args:
+        commands (iterable): Шаги программы по порядку
+
+    Returns:
+        tuple: (список узлов основной программы, словарь {имя: узлы макроса})
+
+    Raises:
+        ValueError: Если блоки не сбалансированы, число повторений
+            некорректно, макрос не определен или вызывает сам себя
+    """
+    program = []
+    macros = {}
+    # Стек открытых блоков: (узлы тела, конструктор узла по телу, номер шага)
+    stack = []
+    body = program
+
+    for index, command in enumerate(commands):
+        text = command.strip()
+        number = index + 1
+
+        if text == END:
+            if not stack:
+                raise ValueError(f"Шаг {number}: '{END}' без начала блока")
+            parent, build, _ = stack.pop()
+            node = build(body)
+            body = parent
+            if node is not None:
+                body.append(node)
+            continue
+
+        repeat = _keyword_argument(text, REPEAT)
+        name = _keyword_argument(text, MACRO)
+        called = _keyword_argument(text, CALL)
+        if repeat is not None:
+            try:
+                count = int(repeat)
+            except ValueError:
+                raise ValueError(f"Шаг {number}: некорректное число повторений '{repeat}'") from None
+            if count < 0:
+                raise ValueError(f"Шаг {number}: число повторений не может быть отрицательным")
+            stack.append((body, lambda b, i=index, c=count: Repeat(i, c, b), number))
+            body = []
+        elif text == FOR_EACH_GRID:
+            stack.append((body, lambda b, i=index: ForEachGrid(i, b), number))
+            body = []
+        elif name is not None:
+            if stack:
+                raise ValueError(f"Шаг {number}: макрос можно определить только вне блоков")
+            if not name:
+                raise ValueError(f"Шаг {number}: не указано имя макроса")
+            if name in macros:
+                raise ValueError(f"Шаг {number}: макрос '{name}' уже определен")
+            macros[name] = None  # Имя занято до конца определения
+            stack.append((body, lambda b, n=name: macros.__setitem__(n, b), number))
+            body = []
+        elif called is not None:
+            body.append(Call(index, called))
+        else:
+            body.append(Command(index, text))
+
+    if stack:
+        raise ValueError(f"Шаг {stack[-1][2]}: блок не закрыт ('{END}')")
+    _check_calls(program, macros)
+    return program, macros
+
+
+def _check_calls(program, macros):
+    """Проверяет, что вызываемые макросы определены и не вызывают сами себя."""
+    def calls(nodes):
+        for node in nodes:
+            if isinstance(node, Call):
+                yield node
+            elif isinstance(node, (Repeat, ForEachGrid)):
+                yield from calls(node.body)
+
+    def visit(nodes, active):
+        for call in calls(nodes):
+            if call.name not in macros:
+                raise ValueError(f"Шаг {call.source + 1}: макрос '{call.name}' не определен")
+            if call.name in active:
+                raise ValueError(f"Шаг {call.source + 1}: макрос '{call.name}' вызывает сам себя")
+            visit(macros[call.name], active | {call.name})
+
+    visit(program, frozenset())
+    for name, body in macros.items():
+        visit(body, frozenset({name}))
+
+
+def _grid_size():
+    """Размер сетки печки из текущих параметров matrics."""
+    return int(matrics.glue_point['rows']), int(matrics.glue_point['cols'])
+
+
+def grid_points(rows, cols, order=ORDER_ROWS):
+    """
+    Точки сетки в порядке обхода.
+
+    Args:
+        rows (int): Количество строк
+        cols (int): Количество столбцов
+        order (str): Порядок обхода (GRID_ORDERS)
+
+    Returns:
+        generator: Пары (строка, столбец)
+    """
+    for row in range(rows):
+        reverse = order == ORDER_SERPENTINE and row % 2
+        for col in (range(cols - 1, -1, -1) if reverse else range(cols)):
+            yield row, col
+
+
+class ProgramExpander:
+    """
+    Ленивое разворачивание программы с блоками в последовательность команд.
+
+    Объект можно передавать исполнителю вместо списка команд. Атрибут
+    source_index - индекс исходного шага, из которого получена последняя
+    выданная команда (для подсветки шага в интерфейсе).
+    """
+
+    def __init__(self, commands, order=ORDER_ROWS):
+        """
+        Args:
+            commands (iterable): Шаги программы по порядку
+            order (str): Порядок обхода сетки (GRID_ORDERS)
+
+        Raises:
+            ValueError: Если программа содержит ошибки в блоках или порядок обхода неизвестен
+        """
+        if order not in GRID_ORDERS:
+            raise ValueError(f"Неизвестный порядок обхода сетки: '{order}'")
+        self.program, self.macros = parse_program(commands)
+        self.order = order
+        self.source_index = None
+
+    def __iter__(self):
+        return self._expand(self.program)
+
+    def _expand(self, nodes):
+        """Генератор команд: вложенные блоки разворачиваются по мере выполнения."""
+        for node in nodes:
+            if isinstance(node, Command):
+                self.source_index = node.source
+                yield node.text
+            elif isinstance(node, Repeat):
+                for _ in range(node.count):
+                    yield from self._expand(node.body)
+            elif isinstance(node, ForEachGrid):
+                # Размер сетки читается при входе в блок
+                rows, cols = _grid_size()
+                for row, col in grid_points(rows, cols, self.order):
+                    self.source_index = node.source
+                    yield f"{GRID_POINT} {row},{col}"
+                    yield from self._expand(node.body)
+            else:
+                yield from self._expand(self.macros[node.name])
+
+    def count(self):
+        """
+        Количество команд после разворачивания (без самого разворачивания).
+
+        Returns:
+            int: Число команд
+        """
+        return self._count(self.program)
+
+    def _count(self, nodes):
+        total = 0
+        for node in nodes:
+            if isinstance(node, Command):
+                total += 1
+            elif isinstance(node, Repeat):
+                total += node.count * self._count(node.body)
+            elif isinstance(node, ForEachGrid):
+                rows, cols = _grid_size()
+                total += rows * cols * (1 + self._count(node.body))
+            else:
+                total += self._count(self.macros[node.name])
+        return total
+
+
+def expand(commands, order=ORDER_ROWS):
+    """
+    Разворачивает программу с блоками в последовательность команд.
+
+    Args:
+        commands (iterable): Шаги программы по порядку
+        order (str): Порядок обхода сетки (GRID_ORDERS)
+
+    Returns:
+        ProgramExpander: Итерируемая последовательность команд
+
+    Raises:
+        ValueError: Если программа содержит ошибки в блоках
+    """
+    return ProgramExpander(commands, order)
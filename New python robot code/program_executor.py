@@ -0,0 +1,561 @@
+"""
+Выполнение программы с ожиданием окончания команд.
+
+Вместо фиксированной паузы после каждого шага исполнитель следит, когда
+команда действительно выполнится: по ответу DONE прошивки на последний
+сегмент команды или, без обратной связи (режим отладки), по расчетной
+длительности движения по профилю разгона. Шаги движения отправляются с
+опережением на один шаг: следующий уже стоит в очереди прошивки, пока
+выполняется текущий, и робот не простаивает между ними. Перед командой
+пневматики исполнитель дожидается окончания движения, после команды с
+выдержкой - окончания выдержки. Время отсчитывается по монотонным часам,
+отклонение фактической длительности шага от расчетной сохраняется для
+анализа (кроме поиска концевиков с неизвестного положения, длительность
+которого заранее не известна).
+
+Пауза, продолжение и остановка построены на threading.Event: ожидание
+прерывается сразу, без периодического опроса флагов. Ответ DONE
+ожидается интервалами WAIT_SLICE: между ними проверяются остановка и
+связь с Arduino, при потере связи программа прерывается. Одновременно
+может выполняться только одна программа.
+
+Пример сравнения с прежним циклом на стандартной программе нанесения клея:
+    python program_executor.py
+    python program_executor.py --emulator --time-scale 4
+"""
+import argparse
+import contextlib
+import io
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import CancelledError
+
+import matrics
+import metrics
+from controller_actor import PRIORITY_COMMAND
+from manipulator import ManipulatorController, command_label
+from steps_for_arduino import RecordingStepSender
+
+# Пауза после каждой команды в прежнем цикле выполнения программы (с)
+LEGACY_STEP_INTERVAL = 0.5
+
+# Интервал проверки остановки и связи при ожидании DONE (с)
+WAIT_SLICE = 0.1
+
+# Выдержка после команд пневматики (с): вакууму нужно время на захват
+# детали, дозатору - на выдавливание клея. Прежняя фиксированная пауза
+# давала им эти 0.5 с неявно.
+COMMAND_DWELL = {
+    "Включить вакуум": 0.5,
+    "Включить дозатор": 0.5,
+}
+
+# Команды пневматики: перед ними исполнитель дожидается окончания движения
+PNEUMATIC_COMMANDS = frozenset(("Включить вакуум", "Выключить вакуум", "Включить дозатор", "Выключить дозатор"))
+
+# Команда, с которой начинается и которой заканчивается цикл стандартной программы
+HOME_COMMAND = "В исходное положение"
+
+# Стандартная программа: взять деталь из магазина, нанести клей и притереть
+STANDARD_GLUE_PROGRAM = (
+    "В исходное положение",
+    "Вперёд присоской",
+    "Движение к магазину",
+    "Опуститься до магазина",
+    "Включить вакуум",
+    "Подняться",
+    "Вперёд дозатором",
+    "Движение к печке",
+    "Опуститься до печки",
+    "Включить дозатор",
+    "Выключить дозатор",
+    "Подняться",
+    "Вперёд присоской",
+    "Опуститься до печки",
+    "Притирка",
+    "Выключить вакуум",
+    "Подняться",
+    "В исходное положение",
+)
+
+# Позиции для оценки стандартной программы (мм)
+STANDARD_GLUE_POINT = {"X": "250.00", "Y": "120.00", "Z": "900.00", "rows": "2", "cols": "3"}
+STANDARD_MAGAZINE_POS = {"X": "180.00", "Y": "-200.00", "Z": "940.00"}
+
+# Фактическая длительность шагов программы (с ожиданием окончания движения)
+STEP_SECONDS = metrics.histogram('scara_step_seconds', "Фактическая длительность шага программы (с)",
+                                 label='command')
+STEP_TIMEOUTS = metrics.counter('scara_step_timeouts_total', "Шаги, не завершившиеся за расчетное время")
+
+# Длительность шага (с); planned - None, если расчетная длительность не известна
+StepTiming = namedtuple('StepTiming', 'command planned actual')
+# Отправленный шаг: расчетная длительность, известна ли она, номер последнего сегмента, выдержка
+_Step = namedtuple('_Step', 'command planned known seq dwell')
+
+
+class ProgramExecutor:
+    """
+    Выполняет команды манипулятора, отправляя следующий шаг, пока
+    выполняется текущий. Пауза вступает в силу после текущего шага
+    (уже отправленный следующий шаг тоже выполняется), остановка
+    прерывает движение сразу и останавливает оси командой 'S'.
+    """
+
+    def __init__(self, manipulator, dwell=None, timeout_margin=2.0, history=1000, actor=None):
+        """
+        Args:
+            manipulator (ManipulatorController): Контроллер манипулятора
+            dwell (dict, optional): Выдержка после команд {команда: с}.
+                По умолчанию COMMAND_DWELL
+            timeout_margin (float): Во сколько раз ожидание DONE может
+                превысить расчетную длительность до предупреждения
+            history (int): Сколько последних шагов хранить в timings
+            actor (ControllerActor, optional): Владелец контроллера; команды
+                и остановка передаются через него
+        """
+        self.manipulator = manipulator
+        self.actor = actor
+        self.dwell = COMMAND_DWELL if dwell is None else dwell
+        self.timeout_margin = timeout_margin
+        self.timings = deque(maxlen=history)  # Последние StepTiming
+
+        # Управление выполнением
+        self._resume = threading.Event()  # Установлен - программа не на паузе
+        self._resume.set()
+        self._stop = threading.Event()  # Установлен - выполнение прервано
+        self._lock = threading.Lock()
+        self._thread = None
+        self._mark = 0.0  # Момент начала выполняемого шага (монотонные часы)
+        self._plan = None  # Скомпилированный план выполняемой программы (program_format.ProgramFile)
+
+    def start(self, commands, on_step=None, on_finish=None, plan=None):
+        """
+        Запускает программу в отдельном потоке.
+
+        Args:
+            commands (iterable): Команды манипулятора
+            on_step (callable, optional): Вызывается в начале выполнения каждого
+                шага с (номер, команда)
+            on_finish (callable, optional): Вызывается по окончании с флагом
+                True, если программа выполнена полностью
+            plan (program_format.ProgramFile, optional): Актуальный план программы;
+                кадры шагов отправляются из него без расчета сегментов
+
+        Returns:
+            bool: False если программа уже выполняется
+        """
+        with self._lock:
+            if self.is_running():
+                return False
+            self._stop.clear()
+            self._resume.set()
+            self._plan = plan
+            self._thread = threading.Thread(target=self._run_thread, args=(commands, on_step, on_finish),
+                                            daemon=True)
+            self._thread.start()
+        return True
+
+    def _run_thread(self, commands, on_step, on_finish):
+        """Тело потока выполнения программы."""
+        try:
+            self._run(commands, on_step)
+        finally:
+            if on_finish:
+                on_finish(not self._stop.is_set())
+
+    def is_running(self):
+        """Проверяет, выполняется ли программа."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        """
+        Ожидает окончания программы, запущенной start().
+
+        Args:
+            timeout (float, optional): Максимальное время ожидания (с)
+
+        Returns:
+            bool: True если программа не выполняется
+        """
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.is_running()
+
+    def is_paused(self):
+        """Проверяет, стоит ли программа на паузе."""
+        return not self._resume.is_set()
+
+    def pause(self):
+        """Приостанавливает программу перед следующим шагом."""
+        self._resume.clear()
+
+    def resume(self):
+        """Продолжает приостановленную программу."""
+        self._resume.set()
+
+    def stop(self, timeout=2.0):
+        """
+        Прерывает программу и останавливает оси.
+        Команда 'S' отправляется прошивке в обход очереди сегментов.
+
+        Args:
+            timeout (float): Максимальное время ожидания завершения потока (с)
+
+        Returns:
+            bool: True если поток выполнения завершился
+        """
+        with self._lock:
+            self._stop.set()
+            self._resume.set()  # Будим поток, стоящий на паузе
+            if self.actor is not None:
+                self.actor.emergency_stop()
+            else:
+                self.manipulator.arduino_sender.abort()
+            thread = self._thread
+        if thread is None or thread is threading.current_thread():
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def execute_step(self, command):
+        """
+        Выполняет команду и ожидает ее окончания.
+
+        Args:
+            command (str): Команда манипулятора
+
+        Returns:
+            StepTiming: Расчетная и фактическая длительность шага (с)
+        """
+        self._mark = time.monotonic()
+        step = self._send(None, command)
+        if step is None:
+            return StepTiming(command, 0.0, time.monotonic() - self._mark)
+        return self._complete(step)
+
+    def _send(self, index, command):
+        """
+        Ставит сегменты команды в очередь отправки, не дожидаясь их выполнения.
+        Шаг программы с планом отправляется готовыми кадрами плана.
+
+        Args:
+            index (int): Номер шага программы (None - команда вне программы)
+            command (str): Команда манипулятора
+
+        Returns:
+            _Step: Отправленный шаг или None, если команда отменена остановкой
+        """
+        sender = self.manipulator.arduino_sender
+        planned_before, unknown_before = sender.planned_time, sender.unknown_segments
+        if index is not None and self._plan is not None:
+            call = (sender.send_planned, *self._plan.step_plan(index))
+        else:
+            call = (self.manipulator.execute_command, command)
+        if self.actor is not None:
+            try:
+                self.actor.submit(PRIORITY_COMMAND, *call).result()
+            except CancelledError:
+                # Команда отменена остановкой до начала выполнения
+                return None
+        else:
+            call[0](*call[1:])
+        return _Step(command, sender.planned_time - planned_before, sender.unknown_segments == unknown_before,
+                     sender.seq, self.dwell.get(command, 0.0))
+
+    def _complete(self, step):
+        """
+        Ожидает окончания отправленного шага и его выдержки.
+        Шаг начинается, когда закончился предыдущий (self._mark).
+
+        Returns:
+            StepTiming: Расчетная и фактическая длительность шага (с)
+        """
+        sender = self.manipulator.arduino_sender
+        if sender.debug_mode:
+            # Обратной связи нет - ждем расчетное время движения
+            self._sleep_until(self._mark + step.planned)
+        elif not self._wait_done(sender, step.seq, step.planned * self.timeout_margin + 1.0) \
+                and self._link_alive(sender, step.command):
+            STEP_TIMEOUTS.inc()
+            print(f"Предупреждение: команда '{step.command}' не завершилась за расчетное время {step.planned:.2f} с")
+            # abort() завершает ожидание, отмечая сегменты выполненными
+            if not self._wait_done(sender, step.seq):
+                self._link_alive(sender, step.command)
+
+        if step.dwell:
+            self._sleep_until(time.monotonic() + step.dwell)
+
+        now = time.monotonic()
+        timing = StepTiming(step.command, step.planned + step.dwell if step.known else None, now - self._mark)
+        self._mark = now
+        self.timings.append(timing)
+        STEP_SECONDS.labels(command_label(step.command)).observe(timing.actual)
+        return timing
+
+    def _wait_done(self, sender, seq, timeout=None):
+        """
+        Ожидает DONE сегмента короткими интервалами, чтобы заметить
+        остановку программы и потерю связи.
+
+        Args:
+            sender (ArduinoStepSender): Отправитель команд
+            seq (int): Номер сегмента
+            timeout (float, optional): Максимальное время ожидания (с)
+
+        Returns:
+            bool: True если сегмент выполнен, False по таймауту, остановке или потере связи
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = WAIT_SLICE if deadline is None else min(WAIT_SLICE, deadline - time.monotonic())
+            if sender.wait_done(seq, max(remaining, 0.0)):
+                return True
+            if self._stop.is_set() or sender.connection is None:
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def _link_alive(self, sender, command):
+        """
+        Прерывает программу, если ожидание закончилось из-за потери связи.
+
+        Returns:
+            bool: False если программа остановлена или связь потеряна
+        """
+        if self._stop.is_set():
+            return False
+        if sender.connection is None:
+            print(f"Программа остановлена на команде '{command}': нет связи с Arduino")
+            self._stop.set()
+            sender.abort()
+            return False
+        return True
+
+    def run(self, commands, on_step=None, plan=None):
+        """
+        Выполняет список команд.
+
+        Args:
+            commands (iterable): Команды манипулятора
+            on_step (callable, optional): Вызывается в начале выполнения каждого
+                шага с (номер, команда)
+            plan (program_format.ProgramFile, optional): Актуальный план программы;
+                кадры шагов отправляются из него без расчета сегментов
+
+        Returns:
+            float: Фактическое время выполнения (с)
+        """
+        self._stop.clear()
+        self._resume.set()
+        self._plan = plan
+        return self._run(commands, on_step)
+
+    def _is_barrier(self, command):
+        """Перед командой пневматики или с выдержкой предыдущий шаг должен закончиться."""
+        return command in PNEUMATIC_COMMANDS or bool(self.dwell.get(command))
+
+    def _run(self, commands, on_step):
+        """
+        Цикл выполнения: шаг отправляется, пока выполняется предыдущий,
+        затем исполнитель ждет окончания предыдущего. Пауза и остановка
+        проверяются перед каждым шагом.
+        """
+        start = time.monotonic()
+        sender = self.manipulator.arduino_sender
+        drops = sender.drops
+        current = None  # Выполняемый шаг, за которым уже отправлен следующий
+        for index, command in enumerate(commands):
+            if current is not None and (self.is_paused() or self._is_barrier(command)):
+                self._complete(current)
+                current = None
+            self._resume.wait()
+            if self._stop.is_set():
+                break
+            if sender.drops != drops:
+                # Очередь сброшена при обрыве связи, позиции осей неизвестны
+                print(f"Программа остановлена на шаге {index + 1}: связь с Arduino прервана")
+                self._stop.set()
+                break
+            if current is None:
+                self._mark = time.monotonic()
+            step = self._send(index, command)
+            if step is None:
+                break
+            if current is not None:
+                self._complete(current)
+                if self._stop.is_set():
+                    break
+            if on_step:
+                on_step(index, command)
+            current = step
+            if step.dwell:
+                # Следующий шаг отправляется только после выдержки
+                self._complete(current)
+                current = None
+        if current is not None and not self._stop.is_set():
+            self._complete(current)
+        return time.monotonic() - start
+
+    def jitter(self):
+        """
+        Сводка отклонений фактической длительности шагов от расчетной.
+
+        Шаги без расчетной длительности (поиск концевиков с неизвестного
+        положения) не учитываются.
+
+        Returns:
+            dict: count, mean, max (с) и p95 абсолютного отклонения
+        """
+        values = [t.actual - t.planned for t in self.timings if t.planned is not None]
+        if not values:
+            return {'count': 0, 'mean': 0.0, 'max': 0.0, 'p95': 0.0}
+        magnitudes = sorted(abs(v) for v in values)
+        return {
+            'count': len(values),
+            'mean': sum(values) / len(values),
+            'max': max(values, key=abs),
+            'p95': magnitudes[min(len(magnitudes) - 1, int(0.95 * len(magnitudes)))],
+        }
+
+    def _sleep_until(self, deadline):
+        """Ожидание до момента монотонных часов без накопления ошибки; прерывается stop()."""
+        remaining = deadline - time.monotonic()
+        while remaining > 0 and not self._stop.wait(remaining):
+            remaining = deadline - time.monotonic()
+
+
+@contextlib.contextmanager
+def standard_positions():
+    """Временно устанавливает позиции печки и магазина стандартной программы."""
+    saved = dict(matrics.glue_point), dict(matrics.magazine_pos)
+    matrics.glue_point.update(STANDARD_GLUE_POINT)
+    matrics.magazine_pos.update(STANDARD_MAGAZINE_POS)
+    try:
+        yield
+    finally:
+        matrics.glue_point.update(saved[0])
+        matrics.magazine_pos.update(saved[1])
+
+
+def compare_cycle_time(program=STANDARD_GLUE_PROGRAM, interval=LEGACY_STEP_INTERVAL, dwell=None):
+    """
+    Сравнивает расчетное время цикла с фиксированной паузой и с ожиданием окончания команд.
+
+    Считается установившийся цикл: робот начинает его в исходном
+    положении, где закончил предыдущий, поэтому длительность поиска
+    концевиков известна. В прежнем цикле команда отправлялась каждые
+    interval секунд, а робот выполнял очередь сегментов по порядку:
+    команды длиннее паузы накладывались на следующие, и пневматика
+    получала выдержку, только если очередь к этому моменту опустела.
+    Исполнитель отправляет следующий шаг движения, пока выполняется
+    текущий, и останавливает очередь только ради выдержки пневматики.
+
+    Args:
+        program (iterable): Команды программы
+        interval (float): Фиксированная пауза прежнего цикла (с)
+        dwell (dict, optional): Выдержка после команд. По умолчанию COMMAND_DWELL
+
+    Returns:
+        dict: steps - число шагов, overrun - шагов длиннее паузы,
+              unheld - команд пневматики, не получивших выдержку в прежнем цикле,
+              legacy - цикл с паузой interval, legacy_held - он же с выдержкой
+              пневматики, executor - цикл исполнителя (с)
+    """
+    dwell = COMMAND_DWELL if dwell is None else dwell
+    program = list(program)
+    sender = RecordingStepSender()
+    controller = ManipulatorController(sender=sender)
+
+    durations = []
+    with standard_positions(), contextlib.redirect_stdout(io.StringIO()):
+        # Предыдущий цикл закончился в исходном положении
+        controller.execute_command(HOME_COMMAND)
+        for command in program:
+            before = sender.planned_time
+            controller.execute_command(command)
+            durations.append(sender.planned_time - before)
+
+    def legacy_cycle(holds):
+        finish, unheld = 0.0, 0
+        for index, (command, duration) in enumerate(zip(program, durations)):
+            finish = max(finish, index * interval) + duration
+            # Следующая команда начинается сразу, если очередь не пуста
+            hold = dwell.get(command, 0.0)
+            if hold and hold > (index + 1) * interval - finish:
+                unheld += 1
+                if holds:
+                    finish += hold
+        return max(finish, len(durations) * interval), unheld
+
+    legacy, unheld = legacy_cycle(holds=False)
+    legacy_held, _ = legacy_cycle(holds=True)
+    steps = [d + dwell.get(c, 0.0) for c, d in zip(program, durations)]
+    return {
+        'steps': len(steps),
+        'overrun': sum(1 for step in steps if step > interval),
+        'unheld': unheld,
+        'legacy': legacy,
+        'legacy_held': legacy_held,
+        'executor': sum(steps),
+    }
+
+
+def run_on_emulator(program=STANDARD_GLUE_PROGRAM, time_scale=1.0):
+    """
+    Выполняет программу на эмуляторе прошивки и измеряет отклонения.
+
+    Args:
+        program (iterable): Команды программы
+        time_scale (float): Ускорение эмулятора
+
+    Returns:
+        tuple: (время выполнения с учетом time_scale, сводка jitter())
+    """
+    from arduino_simulator import ArduinoSimulator
+
+    dwell = {command: value / time_scale for command, value in COMMAND_DWELL.items()}
+    with ArduinoSimulator(time_scale=time_scale) as simulator:
+        controller = ManipulatorController(port=simulator.port)
+        sender = controller.arduino_sender
+        sender.debug_mode = False
+        sender.connect()
+        executor = ProgramExecutor(controller, dwell=dwell, timeout_margin=2.0 / time_scale)
+        try:
+            with standard_positions(), contextlib.redirect_stdout(io.StringIO()):
+                elapsed = executor.run(program)
+        finally:
+            sender.close()
+
+    # Переводим длительности шагов во время реального робота
+    executor.timings = deque(
+        (StepTiming(t.command,
+                    None if t.planned is None
+                    else t.planned - dwell.get(t.command, 0.0) + COMMAND_DWELL.get(t.command, 0.0),
+                    t.actual * time_scale) for t in executor.timings),
+        maxlen=executor.timings.maxlen)
+    return elapsed * time_scale, executor.jitter()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Время цикла стандартной программы нанесения клея")
+    parser.add_argument("--interval", type=float, default=LEGACY_STEP_INTERVAL,
+                        help="фиксированная пауза прежнего цикла (с)")
+    parser.add_argument("--emulator", action="store_true", help="выполнить программу на эмуляторе")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="ускорение эмулятора")
+    args = parser.parse_args()
+
+    report = compare_cycle_time(interval=args.interval)
+    print(f"Шагов: {report['steps']}, из них длиннее паузы {args.interval:.2f} с: {report['overrun']}")
+    print(f"Фиксированная пауза {args.interval:.2f} с: {report['legacy']:.2f} с "
+          f"(команд пневматики без выдержки: {report['unheld']})")
+    print(f"Фиксированная пауза с выдержкой пневматики: {report['legacy_held']:.2f} с")
+    print(f"Исполнитель (шаги движения отправляются с опережением): {report['executor']:.2f} с, "
+          f"экономия {report['legacy_held'] - report['executor']:.2f} с "
+          f"({report['executor'] - report['legacy']:+.2f} с к паузе без выдержки)")
+
+    if args.emulator:
+        elapsed, jitter = run_on_emulator(time_scale=args.time_scale)
+        print(f"Эмулятор: {elapsed:.2f} с, отклонение шага ({jitter['count']} шагов с известной длительностью): среднее {jitter['mean'] * 1e3:.1f} мс, "
+              f"p95 {jitter['p95'] * 1e3:.1f} мс, max {jitter['max'] * 1e3:.1f} мс")
@@ -0,0 +1,477 @@
+"""
+Двоичный формат программы манипулятора с версией и скомпилированным планом.
+
+Формат файла (все числа - little-endian):
+- заголовок HEADER: MAGIC, версия, флаги, количество команд в таблице,
+  количество шагов, количество кадров плана и хэш содержимого (SHA-256);
+- позиции POSITIONS: X, Y, Z печки (double), строки и столбцы сетки
+  (uint32), X, Y, Z магазина (double);
+- таблица команд: длина (uint16) и текст команды в UTF-8 для каждой
+  различной команды программы;
+- шаги: номер команды в таблице (uint16) для каждого шага;
+- план (при флаге FLAG_PLAN): количество шагов плана (uint32), первый
+  кадр каждого шага плана (uint32, шагов + 1), расчетная длительность кадров (double), смещения кадров
+  (uint32, кадров + 1), байты кадров подряд и SHA-256 всех предыдущих
+  байтов плана.
+
+Размер файла должен точно совпадать с размером, вычисленным по
+заголовку: обрезанный или дописанный файл не открывается. Контрольная
+сумма плана проверяется перед его использованием.
+
+Файл читается через mmap: при открытии разбирается только таблица
+команд, шаги и кадры плана читаются по запросу. Хэш содержимого
+считается по байтам позиций, таблицы команд и шагов вместе с
+параметрами механики (protocol, kinematics). Если при сохранении хэш
+совпадает с хэшем существующего файла, план берется из него без
+повторной компиляции; при изменении параметров механики план
+считается устаревшим.
+
+План - это кадры сегментов, которые сформирует контроллер при первом
+выполнении программы из исходного положения (первая точка сетки
+печки), с номерами сегментов начиная с 1. Блоки программы
+(program_blocks) в плане развернуты, поэтому шагов плана может быть
+больше, чем шагов в файле. Актуальный план выполняется без расчета
+сегментов: headless передает его кадры отправителю
+(ArduinoStepSender.send_planned), а его длительности дают оставшееся время.
+"""
+import contextlib
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+import matrics
+
+MAGIC = b'SPRG'
+VERSION = 3
+FLAG_PLAN = 1
+HEADER = struct.Struct('<4sHHIII32s')
+POSITIONS = struct.Struct('<dddIIddd')
+LENGTH = struct.Struct('<H')
+COUNT = struct.Struct('<I')
+DIGEST_SIZE = hashlib.sha256().digest_size
+
+# Расширение файлов программ в двоичном формате
+EXTENSION = '.sprg'
+
+CompiledPlan = namedtuple('CompiledPlan', 'frames durations step_starts')
+
+
+def is_program_file(filepath):
+    """
+    Проверяет, что файл записан в двоичном формате программы.
+
+    Args:
+        filepath (str): Путь к файлу
+
+    Returns:
+        bool: True если файл начинается с MAGIC
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _typed_positions(glue_point, magazine_pos):
+    """Переводит позиции (строки интерфейса или числа) в числа с проверкой matrics."""
+    def number(value, default, **limits):
+        return float(matrics.validate_value(str(value), default, **limits))
+
+    return (number(glue_point.get('X', 0), 0.0), number(glue_point.get('Y', 0), 0.0),
+            number(glue_point.get('Z', 0), 0.0, min_val=0, max_val=1000),
+            int(number(glue_point.get('rows', 1), 1, min_val=1)),
+            int(number(glue_point.get('cols', 1), 1, min_val=1)),
+            number(magazine_pos.get('X', 0), 0.0), number(magazine_pos.get('Y', 0), 0.0),
+            number(magazine_pos.get('Z', 0), 0.0, min_val=0, max_val=1000))
+
+
+def _mechanics_key():
+    """Параметры механики, от которых зависят кадры плана."""
+    import backlash
+    import kinematics
+    import protocol
+
+    model = kinematics.Kinematics()
+    return repr((VERSION, sorted(protocol.STEPS_PER_UNIT.items()), protocol.MAX_SPEED, protocol.ACCELERATION,
+                 model.L1, model.L2, model.ARM_OFFSET, model.SHOULDER_OFFSET, model.BASE_X, model.BASE_Y,
+                 model.MAX_Z, sorted(backlash.load_backlash().items()))).encode()
+
+
+def content_hash(body):
+    """
+    Хэш содержимого программы.
+
+    Args:
+        body (bytes): Байты позиций, таблицы команд и шагов
+
+    Returns:
+        bytes: SHA-256 (32 байта)
+    """
+    digest = hashlib.sha256(_mechanics_key())
+    digest.update(body)
+    return digest.digest()
+
+
+def _encode_body(commands, positions):
+    """
+    Кодирует позиции, таблицу команд и шаги.
+
+    Returns:
+        tuple: (байты, количество команд в таблице, количество шагов)
+
+    Raises:
+        ValueError: Если различных команд больше 65535
+    """
+    table = {}
+    steps = array('H')
+    for command in commands:
+        index = table.setdefault(command, len(table))
+        if index > 0xFFFF:
+            raise ValueError("Слишком много различных команд в программе")
+        steps.append(index)
+    if sys.byteorder != 'little':
+        steps.byteswap()
+
+    parts = [POSITIONS.pack(*positions)]
+    for command in table:
+        data = command.encode('utf-8')
+        parts.append(LENGTH.pack(len(data)) + data)
+    parts.append(steps.tobytes())
+    return b''.join(parts), len(table), len(steps)
+
+
+def _encode_plan(plan):
+    """Кодирует скомпилированный план."""
+    starts = array('I', plan.step_starts)
+    durations = array('d', plan.durations)
+    offsets = array('I', [0])
+    for frame in plan.frames:
+        offsets.append(offsets[-1] + len(frame))
+    if sys.byteorder != 'little':
+        for values in (starts, durations, offsets):
+            values.byteswap()
+    data = b''.join((COUNT.pack(len(plan.step_starts) - 1), starts.tobytes(), durations.tobytes(), offsets.tobytes(),
+                     b''.join(frame.encode('ascii') for frame in plan.frames)))
+    return data + hashlib.sha256(data).digest()
+
+
+@contextlib.contextmanager
+def _program_positions(positions):
+    """Временно устанавливает позиции печки и магазина программы в matrics."""
+    saved = dict(matrics.glue_point), dict(matrics.magazine_pos)
+    gx, gy, gz, rows, cols, mx, my, mz = positions
+    matrics.glue_point.update({'X': str(gx), 'Y': str(gy), 'Z': str(gz), 'rows': str(rows), 'cols': str(cols)})
+    matrics.magazine_pos.update({'X': str(mx), 'Y': str(my), 'Z': str(mz)})
+    try:
+        yield
+    finally:
+        matrics.glue_point.update(saved[0])
+        matrics.magazine_pos.update(saved[1])
+
+
+def compile_plan(commands, glue_point, magazine_pos):
+    """
+    Формирует кадры сегментов программы без подключения к Arduino.
+    Блоки программы (program_blocks) разворачиваются: шаг плана - одна
+    команда развернутой программы.
+
+    Args:
+        commands (iterable): Команды программы
+        glue_point (dict): Позиции печки
+        magazine_pos (dict): Позиция магазина
+
+    Returns:
+        CompiledPlan: Кадры, их расчетная длительность и первый кадр каждого шага
+    """
+    # Контроллер нужен только для компиляции: не загружаем его при чтении файла
+    from manipulator import ManipulatorController
+    from program_blocks import expand
+    from steps_for_arduino import RecordingStepSender
+
+    sender = RecordingStepSender()
+    controller = ManipulatorController(sender=sender)
+    starts = []
+    with _program_positions(_typed_positions(glue_point, magazine_pos)), \
+            open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for command in expand(commands):
+            starts.append(len(sender.frames))
+            controller.execute_command(command)
+    starts.append(len(sender.frames))
+    return CompiledPlan(sender.frames, sender.durations, starts)
+
+
+def save_program_file(filepath, commands, glue_point, magazine_pos, plan=True):
+    """
+    Сохраняет программу в двоичном формате.
+    Файл записывается во временный и заменяется целиком, поэтому
+    открытые для чтения копии остаются корректными.
+
+    Args:
+        filepath (str): Путь к файлу
+        commands (iterable): Команды шагов по порядку
+        glue_point (dict): Позиции печки
+        magazine_pos (dict): Позиция магазина
+        plan (bool): Сохранить скомпилированный план
+
+    Returns:
+        bool: True если план взят из существующего файла без компиляции
+    """
+    commands = list(commands)
+    positions = _typed_positions(glue_point, magazine_pos)
+    body, table_size, step_count = _encode_body(commands, positions)
+    digest = content_hash(body)
+
+    plan_data, frame_count, reused = b'', 0, False
+    if plan:
+        if is_program_file(filepath):
+            # Поврежденный или старый файл просто перезаписывается
+            with contextlib.suppress(ValueError), ProgramFile(filepath) as existing:
+                if existing.content_hash == digest and existing.is_plan_current():
+                    plan_data, frame_count, reused = existing.plan_bytes(), existing.frame_count, True
+        if not reused:
+            compiled = compile_plan(commands, glue_point, magazine_pos)
+            plan_data, frame_count = _encode_plan(compiled), len(compiled.frames)
+
+    header = HEADER.pack(MAGIC, VERSION, FLAG_PLAN if plan else 0, table_size, step_count, frame_count, digest)
+    temp = filepath + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(header)
+        f.write(body)
+        f.write(plan_data)
+    os.replace(temp, filepath)
+    return reused
+
+
+class ProgramSteps:
+    """Последовательность команд шагов, читаемая из файла по запросу."""
+
+    def __init__(self, table, indices):
+        self._table = table
+        self._indices = indices
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._table[i] for i in self._indices[index]]
+        return self._table[self._indices[index]]
+
+    def __iter__(self):
+        table = self._table
+        for index in self._indices:
+            yield table[index]
+
+
+class ProgramFile:
+    """
+    Чтение программы в двоичном формате через mmap.
+    Используется как контекстный менеджер.
+    """
+
+    def __init__(self, filepath):
+        """
+        Args:
+            filepath (str): Путь к файлу
+
+        Raises:
+            ValueError: Если файл не является программой поддерживаемой версии
+                или его размер не совпадает с заголовком
+        """
+        self.filepath = filepath
+        self._map = None
+        self._views = []  # Представления отображения, освобождаемые при закрытии
+        self._plan = None
+        self._plan_intact = None  # Результат проверки контрольной суммы плана
+        self._file = open(filepath, 'rb')
+        if os.fstat(self._file.fileno()).st_size < HEADER.size + POSITIONS.size:
+            self._file.close()
+            raise ValueError(f"Файл '{filepath}' не является программой")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, flags, self._table_size, self.step_count, self.frame_count, self.content_hash = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Файл '{filepath}' не является программой версии {VERSION}")
+        self.has_plan = bool(flags & FLAG_PLAN)
+        try:
+            self._parse()
+        except ValueError:
+            self.close()
+            raise
+
+    def _parse(self):
+        """Разбирает таблицу команд и проверяет размер файла по заголовку."""
+        # Позиции и таблица команд
+        offset = HEADER.size
+        self.positions = POSITIONS.unpack_from(self._map, offset)
+        offset += POSITIONS.size
+        table = []
+        for _ in range(self._table_size):
+            self._require(offset + LENGTH.size)
+            (length,) = LENGTH.unpack_from(self._map, offset)
+            offset += LENGTH.size
+            self._require(offset + length)
+            table.append(self._map[offset:offset + length].decode('utf-8'))
+            offset += length
+
+        # Шаги читаются прямо из отображения файла
+        self._plan_offset = offset + 2 * self.step_count
+        self._require(self._plan_offset)
+        self._body = (HEADER.size, self._plan_offset)
+        self.steps = ProgramSteps(table, self._array('H', offset, self.step_count))
+
+        end = self._plan_offset
+        self.plan_steps = 0
+        if self.has_plan:
+            # Шагов плана больше, чем шагов файла, если в программе есть блоки
+            self._require(end + COUNT.size)
+            (self.plan_steps,) = COUNT.unpack_from(self._map, end)
+            last_offset = end + COUNT.size + 4 * (self.plan_steps + 1) + 12 * self.frame_count
+            self._require(last_offset + COUNT.size)
+            (data_size,) = COUNT.unpack_from(self._map, last_offset)
+            end = last_offset + COUNT.size + data_size + DIGEST_SIZE
+        if end != len(self._map):
+            raise ValueError(f"Файл '{self.filepath}' поврежден: по заголовку {end} байт, в файле {len(self._map)}")
+
+    def _require(self, end):
+        """Проверяет, что файл не короче end байт."""
+        if end > len(self._map):
+            raise ValueError(f"Файл '{self.filepath}' обрезан: нужно не меньше {end} байт, в файле {len(self._map)}")
+
+    def _array(self, typecode, offset, count):
+        """Массив чисел из файла: без копирования на little-endian машинах."""
+        view = memoryview(self._map)[offset:offset + count * array(typecode).itemsize]
+        if sys.byteorder == 'little':
+            self._views.append(view)
+            self._views.append(view.cast(typecode))
+            return self._views[-1]
+        values = array(typecode, view.tobytes())
+        values.byteswap()
+        return values
+
+    @property
+    def glue_point(self):
+        """dict: Позиции печки (числа)"""
+        x, y, z, rows, cols = self.positions[:5]
+        return {'X': x, 'Y': y, 'Z': z, 'rows': rows, 'cols': cols}
+
+    @property
+    def magazine_pos(self):
+        """dict: Позиция магазина (числа)"""
+        x, y, z = self.positions[5:]
+        return {'X': x, 'Y': y, 'Z': z}
+
+    def is_plan_current(self):
+        """
+        Проверяет, что план сохранен и соответствует программе и текущим параметрам механики.
+
+        Returns:
+            bool: True если план можно использовать без компиляции
+        """
+        start, end = self._body
+        return (self.has_plan and content_hash(self._map[start:end]) == self.content_hash
+                and self._check_plan_digest())
+
+    def _check_plan_digest(self):
+        """Сверяет байты плана с контрольной суммой в конце файла (один раз)."""
+        if self._plan_intact is None:
+            end = len(self._map) - DIGEST_SIZE
+            self._plan_intact = hashlib.sha256(self._map[self._plan_offset:end]).digest() == self._map[end:]
+        return self._plan_intact
+
+    def plan_bytes(self):
+        """Байты плана в файле (для переноса в новый файл без компиляции)."""
+        return self._map[self._plan_offset:] if self.has_plan else b''
+
+    def _plan_arrays(self):
+        """Массивы плана: первые кадры шагов, длительности, смещения кадров и начало байтов кадров."""
+        if self._plan is None:
+            self._plan = self._read_plan_arrays()
+        return self._plan
+
+    def _read_plan_arrays(self):
+        """Читает массивы плана (один раз)."""
+        offset = self._plan_offset + COUNT.size
+        starts = self._array('I', offset, self.plan_steps + 1)
+        offset += 4 * (self.plan_steps + 1)
+        durations = self._array('d', offset, self.frame_count)
+        offset += 8 * self.frame_count
+        offsets = self._array('I', offset, self.frame_count + 1)
+        return starts, durations, offsets, offset + 4 * (self.frame_count + 1)
+
+    def step_frames(self, index):
+        """
+        Кадры сегментов шага из плана.
+
+        Args:
+            index (int): Индекс шага плана (с нуля)
+
+        Returns:
+            list: Строки кадров
+        """
+        starts, _, offsets, data = self._plan_arrays()
+        return [self._map[data + offsets[i]:data + offsets[i + 1]].decode('ascii')
+                for i in range(starts[index], starts[index + 1])]
+
+    def step_plan(self, index):
+        """
+        Кадры сегментов шага из плана и их расчетная длительность.
+
+        Args:
+            index (int): Индекс шага плана (с нуля)
+
+        Returns:
+            tuple: (строки кадров, длительности кадров в с)
+        """
+        starts, durations, _, _ = self._plan_arrays()
+        return self.step_frames(index), list(durations[starts[index]:starts[index + 1]])
+
+    def step_durations(self):
+        """
+        Расчетная длительность каждого шага по плану.
+
+        Returns:
+            list: Длительности шагов (с) или None, если плана нет или он устарел
+        """
+        if not self.is_plan_current():
+            return None
+        starts, durations, _, _ = self._plan_arrays()
+        return [sum(durations[starts[i]:starts[i + 1]]) for i in range(len(starts) - 1)]
+
+    def plan(self):
+        """
+        Скомпилированный план целиком.
+
+        Returns:
+            CompiledPlan: План или None, если он не сохранен или поврежден
+        """
+        if not self.has_plan or not self._check_plan_digest():
+            return None
+        starts, durations, offsets, data = self._plan_arrays()
+        frames = [self._map[data + offsets[i]:data + offsets[i + 1]].decode('ascii')
+                  for i in range(self.frame_count)]
+        return CompiledPlan(frames, list(durations), list(starts))
+
+    def close(self):
+        """Закрывает файл."""
+        if self._map is not None:
+            self.steps = self._plan = None
+            for view in reversed(self._views):
+                view.release()
+            self._views = []
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,92 @@
+"""
+Чтение и запись программ манипулятора в JSON.
+
+Формат файла:
+    {
+        "steps": {"1": "В исходное положение", "2": "Движение к печке", ...},
+        "glue_point": {"X": "...", "Y": "...", "Z": "...", "rows": "...", "cols": "..."},
+        "magazine_pos": {"X": "...", "Y": "...", "Z": "..."}
+    }
+Ключи шагов - номера в виде строк, порядок шагов определяется их числовым
+значением (шаг "10" идет после шага "2").
+
+Файлы с расширением program_format.EXTENSION записываются в двоичном
+формате (program_format); при загрузке формат определяется по
+содержимому файла.
+"""
+import json
+import os
+
+import program_format
+
+
+def parse_steps(steps):
+    """
+    Переводит словарь шагов из файла в список команд по порядку номеров.
+
+    Args:
+        steps (dict): Словарь {номер: команда}, номера - строки или числа
+
+    Returns:
+        list: Команды в порядке возрастания номеров
+
+    Raises:
+        ValueError: Если номер шага не является целым числом
+    """
+    numbered = []
+    for key, command in steps.items():
+        try:
+            number = int(key)
+        except (TypeError, ValueError):
+            raise ValueError(f"Некорректный номер шага: '{key}'") from None
+        numbered.append((number, command))
+    numbered.sort(key=lambda item: item[0])
+    return [command for _, command in numbered]
+
+
+def load_program(filepath):
+    """
+    Загружает программу из файла.
+
+    Args:
+        filepath (str): Путь к файлу JSON
+
+    Returns:
+        tuple: (список команд, позиции печки, позиция магазина)
+
+    Raises:
+        ValueError: Если файл содержит некорректные шаги
+    """
+    if program_format.is_program_file(filepath):
+        with program_format.ProgramFile(filepath) as program:
+            # Позиции - строки, как в JSON и в полях интерфейса
+            glue_point = {key: str(value) for key, value in program.glue_point.items()}
+            magazine_pos = {key: str(value) for key, value in program.magazine_pos.items()}
+            return list(program.steps), glue_point, magazine_pos
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return parse_steps(data.get("steps", {})), data.get("glue_point", {}), data.get("magazine_pos", {})
+
+
+def save_program(filepath, commands, glue_point, magazine_pos):
+    """
+    Сохраняет программу в файл.
+
+    Args:
+        filepath (str): Путь к файлу JSON
+        commands (list): Команды шагов по порядку
+        glue_point (dict): Позиции печки
+        magazine_pos (dict): Позиция магазина
+    """
+    if os.path.splitext(filepath)[1].lower() == program_format.EXTENSION:
+        program_format.save_program_file(filepath, commands, glue_point, magazine_pos)
+        return
+
+    data = {
+        "steps": {str(number): command for number, command in enumerate(commands, start=1)},
+        "glue_point": glue_point,
+        "magazine_pos": magazine_pos,
+    }
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
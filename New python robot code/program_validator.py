@@ -0,0 +1,285 @@
+"""
+Проверка программы перед выполнением.
+
+Проверяется то, что во время выполнения обнаружится слишком поздно:
+- неизвестные команды (execute_command только выводит ошибку и
+  продолжает программу) и ошибки в блоках (program_blocks);
+- достижимость точек печки и магазина: кинематика молча ограничивает
+  косинус и отправляет неверные углы для точек вне кольца
+  |L1 - L2| <= r <= L1 + L2;
+- высота Z печки и магазина в пределах 0..MAX_Z;
+- вакуум включен, когда присоска уходит от магазина после опускания к нему;
+- дозатор выключен перед каждым перемещением.
+
+Достижимость сетки проверяется аналитически по строкам: для каждой
+строки вычисляется диапазон достижимых столбцов, поэтому проверка
+сетки в десятки тысяч точек занимает доли миллисекунды. Правила
+пневматики проверяются по дереву блоков без разворачивания: тело цикла
+моделируется, пока состояние в начале итерации не повторится.
+
+    python program_validator.py program.json
+"""
+import argparse
+import math
+from collections import namedtuple
+
+import matrics
+import program_blocks
+from kinematics import Kinematics
+from manipulator import COMMANDS
+
+# Найденная ошибка: номер шага (None - ошибка параметров) и описание
+Issue = namedtuple('Issue', 'step message')
+
+# Команды перемещения в плоскости XY
+TRAVEL_COMMANDS = ("В исходное положение", "Движение к печке", "Движение к магазину")
+
+# Состояние при моделировании: место, опущена ли голова, взята ли деталь, вакуум, дозатор
+State = namedtuple('State', 'location lowered picked vacuum dispenser')
+INITIAL_STATE = State('home', False, False, False, False)
+
+
+def _number(value, name, issues):
+    """Переводит значение параметра в число, при ошибке добавляет замечание."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        issues.append(Issue(None, f"Некорректное значение {name}: '{value}'"))
+        return None
+
+
+def _columns_within(base_x, cols, limit):
+    """
+    Диапазон столбцов, для которых |base_x + col * GRID_STEP| <= limit.
+
+    Returns:
+        tuple: (первый, последний) столбец; пустой диапазон, если первый > последнего
+    """
+    step = matrics.GRID_STEP
+    first = max(0, math.ceil((-limit - base_x) / step - 1e-9))
+    last = min(cols - 1, math.floor((limit - base_x) / step + 1e-9))
+    return first, last
+
+
+def unreachable_grid_points(base_x, base_y, rows, cols, inner, outer):
+    """
+    Считает точки сетки вне кольца досягаемости inner <= r <= outer.
+
+    Args:
+        base_x (float): X первой точки сетки относительно основания
+        base_y (float): Y первой точки сетки относительно основания
+        rows (int): Количество строк
+        cols (int): Количество столбцов
+        inner (float): Минимальный радиус досягаемости (мм)
+        outer (float): Максимальный радиус досягаемости (мм)
+
+    Returns:
+        tuple: (количество недостижимых точек, первая такая точка (строка, столбец) или None)
+    """
+    count, first = 0, None
+    for row in range(rows):
+        y2 = (base_y + row * matrics.GRID_STEP) ** 2
+        # Столбцы внутри внешнего круга и (строго) внутри внутреннего
+        reach = _columns_within(base_x, cols, math.sqrt(outer ** 2 - y2)) if y2 <= outer ** 2 else (0, -1)
+        hole = _columns_within(base_x, cols, math.sqrt(inner ** 2 - y2) - 1e-9) if y2 < inner ** 2 else (0, -1)
+        hole = max(hole[0], reach[0]), min(hole[1], reach[1])
+
+        reachable = max(0, reach[1] - reach[0] + 1) - max(0, hole[1] - hole[0] + 1)
+        if reachable == cols:
+            continue
+        count += cols - reachable
+        if first is None:
+            if reach[0] > 0 or reach[0] > reach[1]:
+                first = (row, 0)
+            elif hole[0] <= hole[1]:
+                first = (row, hole[0])
+            else:
+                first = (row, reach[1] + 1)
+    return count, first
+
+
+def _check_positions(glue_point, magazine_pos, uses_grid, uses_magazine, issues):
+    """Проверяет высоты и достижимость точек печки и магазина."""
+    model = Kinematics()
+    inner, outer = abs(model.L1 - model.L2), model.L1 + model.L2
+
+    glue_z = _number(glue_point.get('Z'), "Z печки", issues)
+    magazine_z = _number(magazine_pos.get('Z'), "Z магазина", issues)
+    for name, z in (("печки", glue_z), ("магазина", magazine_z)):
+        if z is not None and not 0 <= z <= model.MAX_Z:
+            issues.append(Issue(None, f"Высота Z {name} {z:g} вне диапазона 0..{model.MAX_Z}"))
+
+    if uses_grid:
+        base_x = _number(glue_point.get('X'), "X печки", issues)
+        base_y = _number(glue_point.get('Y'), "Y печки", issues)
+        rows = _number(glue_point.get('rows'), "строк сетки", issues)
+        cols = _number(glue_point.get('cols'), "столбцов сетки", issues)
+        if None not in (base_x, base_y, rows, cols):
+            if rows < 1 or cols < 1 or rows != int(rows) or cols != int(cols):
+                issues.append(Issue(None, f"Некорректный размер сетки {rows:g} x {cols:g}"))
+            else:
+                rows, cols = int(rows), int(cols)
+                count, first = unreachable_grid_points(base_x - model.BASE_X, base_y - model.BASE_Y,
+                                                       rows, cols, inner, outer)
+                if count:
+                    x = base_x + first[1] * matrics.GRID_STEP
+                    y = base_y + first[0] * matrics.GRID_STEP
+                    issues.append(Issue(None, f"Недостижимо точек сетки: {count} из {rows * cols}, первая - "
+                                              f"строка {first[0]}, столбец {first[1]} (X={x:g}, Y={y:g})"))
+
+    if uses_magazine:
+        x = _number(magazine_pos.get('X'), "X магазина", issues)
+        y = _number(magazine_pos.get('Y'), "Y магазина", issues)
+        if x is not None and y is not None and not inner <= math.hypot(x - model.BASE_X, y - model.BASE_Y) <= outer:
+            issues.append(Issue(None, f"Магазин недостижим: X={x:g}, Y={y:g} "
+                                      f"(допустимое расстояние {inner:.1f}..{outer:.1f} мм)"))
+
+
+class _Checker:
+    """Обход дерева блоков: неизвестные команды и правила пневматики."""
+
+    def __init__(self, macros, rows, cols):
+        self.macros = macros
+        self.rows, self.cols = rows, cols
+        self.found = {}  # (шаг, сообщение) -> Issue, без повторов из циклов
+        self.commands = set()  # Все команды программы
+        self.grid_loops = False  # Есть ли обход сетки
+
+    def report(self, node, message):
+        self.found.setdefault((node.source, message), Issue(node.source + 1, message))
+
+    def check_commands(self, nodes):
+        """Статическая проверка команд (включая тела циклов с нулем повторений)."""
+        for node in nodes:
+            if isinstance(node, program_blocks.Command):
+                self.commands.add(node.text)
+                self._check_command(node)
+            elif isinstance(node, (program_blocks.Repeat, program_blocks.ForEachGrid)):
+                self.grid_loops |= isinstance(node, program_blocks.ForEachGrid)
+                self.check_commands(node.body)
+
+    def _check_command(self, node):
+        if node.text in COMMANDS:
+            return
+        try:
+            point = program_blocks.parse_grid_point(node.text)
+        except ValueError as e:
+            self.report(node, str(e))
+            return
+        if point is None:
+            self.report(node, f"Неизвестная команда '{node.text}'")
+        elif not (0 <= point[0] < self.rows and 0 <= point[1] < self.cols):
+            self.report(node, f"Точка сетки {point[0]},{point[1]} вне сетки {self.rows} x {self.cols}")
+
+    def run(self, nodes, state):
+        """Моделирует выполнение узлов и возвращает состояние после них."""
+        for node in nodes:
+            if isinstance(node, program_blocks.Command):
+                state = self.step(node, state)
+            elif isinstance(node, program_blocks.Repeat):
+                state = self.loop(node.body, node.count, state)
+            elif isinstance(node, program_blocks.ForEachGrid):
+                state = self.loop(node.body, self.rows * self.cols, state)
+            else:
+                state = self.run(self.macros[node.name], state)
+        return state
+
+    def loop(self, body, count, state):
+        """
+        Моделирует count итераций тела. Итерации повторяются, пока
+        состояние в начале итерации не встретится снова; дальше
+        результат определяется по найденному циклу.
+        """
+        seen = {}
+        starts = []
+        for index in range(count):
+            if state in seen:
+                first = seen[state]
+                period = index - first
+                return starts[first + (count - first) % period]
+            seen[state] = index
+            starts.append(state)
+            state = self.run(body, state)
+        return state
+
+    def step(self, node, state):
+        """Применяет команду к состоянию и проверяет правила."""
+        command = node.text
+        if command in TRAVEL_COMMANDS:
+            if state.dispenser:
+                self.report(node, "Перемещение с включенным дозатором")
+            if state.location == 'magazine' and state.picked and not state.vacuum:
+                self.report(node, "Уход от магазина с выключенным вакуумом")
+            location = {"В исходное положение": 'home', "Движение к печке": 'glue'}.get(command, 'magazine')
+            lowered = state.lowered and command != "В исходное положение"
+            return state._replace(location=location, lowered=lowered, picked=False)
+        if command == "Опуститься до магазина":
+            return state._replace(lowered=True, picked=state.picked or state.location == 'magazine')
+        if command == "Опуститься до печки":
+            return state._replace(lowered=True)
+        if command == "Подняться":
+            return state._replace(lowered=False)
+        if command in ("Включить вакуум", "Выключить вакуум"):
+            return state._replace(vacuum=command == "Включить вакуум")
+        if command in ("Включить дозатор", "Выключить дозатор"):
+            return state._replace(dispenser=command == "Включить дозатор")
+        return state
+
+
+def validate_program(commands, glue_point=None, magazine_pos=None):
+    """
+    Проверяет программу и параметры позиций.
+
+    Args:
+        commands (iterable): Шаги программы по порядку (блоки допускаются)
+        glue_point (dict, optional): Позиции печки. Defaults to matrics.glue_point.
+        magazine_pos (dict, optional): Позиция магазина. Defaults to matrics.magazine_pos.
+
+    Returns:
+        list: Найденные ошибки (Issue); пустой список - программа корректна
+    """
+    glue_point = matrics.glue_point if glue_point is None else glue_point
+    magazine_pos = matrics.magazine_pos if magazine_pos is None else magazine_pos
+    try:
+        program, macros = program_blocks.parse_program(commands)
+    except ValueError as e:
+        return [Issue(None, str(e))]
+
+    try:
+        rows, cols = int(float(glue_point.get('rows', 1))), int(float(glue_point.get('cols', 1)))
+    except (TypeError, ValueError):
+        rows = cols = 1
+
+    checker = _Checker(macros, rows, cols)
+    checker.check_commands(program)
+    for body in macros.values():
+        checker.check_commands(body)
+    checker.run(program, INITIAL_STATE)
+
+    issues = []
+    uses_grid = checker.grid_loops or "Движение к печке" in checker.commands
+    _check_positions(glue_point, magazine_pos, uses_grid, "Движение к магазину" in checker.commands, issues)
+    return issues + sorted(checker.found.values(), key=lambda issue: issue.step)
+
+
+def format_issues(issues):
+    """
+    Форматирует ошибки для вывода.
+
+    Returns:
+        str: По одной ошибке на строку
+    """
+    return "\n".join(f"Шаг {issue.step}: {issue.message}" if issue.step else issue.message for issue in issues)
+
+
+if __name__ == "__main__":
+    import program_io
+
+    parser = argparse.ArgumentParser(description="Проверка программы манипулятора")
+    parser.add_argument("program", help="файл программы")
+    args = parser.parse_args()
+
+    steps, glue, magazine = program_io.load_program(args.program)
+    found = validate_program(steps, {**matrics.glue_point, **glue}, {**matrics.magazine_pos, **magazine})
+    print(format_issues(found) if found else "Ошибок не найдено")
+    raise SystemExit(1 if found else 0)
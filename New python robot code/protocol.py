@@ -0,0 +1,235 @@
+"""
+Описание протокола обмена с Arduino (скетч sketch_feb25a).
+
+Протокол состоит из двух частей:
+- однобайтовые команды скетча (F, R, H, S, X, Z, U, D, V, B, N, M, K, L);
+- кадры сегментов, которые начинаются с символа FRAME_START и заканчиваются
+  переводом строки: ``$G:12|PLECHO:800|RUKA:-120|VACUUM:HIGH\\n``. Префикс
+  нужен для того, чтобы прошивка не принимала буквы внутри кадра за
+  однобайтовые команды.
+
+Сегмент содержит номер (G), абсолютные цели осей в шагах и состояние
+пневматики. Прошивка складывает сегменты в очередь на QUEUE_SIZE мест
+и отвечает строками того же вида без префикса:
+- ``ACK:12|Q:5`` - сегмент принят, в очереди 5 свободных мест;
+- ``RUN:12|Q:6`` - сегмент начал выполняться;
+- ``DONE:12`` - сегмент выполнен;
+- ``FULL:12|Q:0`` - очередь переполнена, сегмент отброшен.
+
+Сегменты принимаются строго по порядку номеров: после отброшенного
+сегмента прошивка отвечает FULL на все следующие, пока хост не повторит
+пропущенный, а повтор уже принятого подтверждает ACK без постановки в
+очередь. Команда 'S' и сброс платы снимают это ограничение.
+
+Кроме того, каждые STATUS_PERIOD_MS прошивка (и по запросу '?') присылает
+кадр состояния ``P:800,-120,0,0|M:3|L:0|Q:14|D:11``: позиции осей в шагах,
+маска движущихся осей, маска нажатых концевиков, свободные места в очереди
+и номер последнего выполненного сегмента. Периодический кадр пропускается,
+пока он не помещается в буфер передачи целиком, чтобы вывод не задерживал
+шаги двигателей.
+
+Ручное перемещение задается кадром ``$JOG:7|PLECHO:500|LIFT:0\\n``:
+скорости осей в шаг/с (номер кадра - для отладки). Кадр не ставится в
+очередь и не подтверждается. Прошивка крутит оси с этими скоростями и
+останавливает их, если следующий кадр не пришел за JOG_TIMEOUT_MS, поэтому
+хост повторяет кадр, пока хотя бы одна скорость не равна нулю. Пока
+выполняются сегменты, кадры ручного перемещения отклоняются (``ERR:BUSY``).
+"""
+from collections import namedtuple
+
+# Однобайтовые команды скетча
+SINGLE_CHAR_COMMANDS = {
+    'F': "Плечо вперёд (до концевика)",
+    'R': "Плечо назад",
+    'H': "Поиск исходного положения всех осей",
+    'S': "Остановка всех двигателей",
+    'X': "Рука вперёд (до концевика)",
+    'C': "Рука вперёд (дубль команды X)",
+    'Z': "Рука назад",
+    'U': "Лифт вверх (до концевика)",
+    'D': "Лифт вниз",
+    'V': "Кисть вперёд (до концевика)",
+    'B': "Кисть назад",
+    'N': "Впрыск воздуха (вакуум выключен)",
+    'M': "Создание вакуума",
+    'K': "Впрыск клея",
+    'L': "Отключение впрыска клея",
+}
+
+# Оси в порядке индексов прошивки: ключ кадра -> объект AccelStepper скетча
+AXES = ('PLECHO', 'RUKA', 'LIFT', 'ORGON')
+AXIS_STEPPERS = {
+    'PLECHO': 'stepperhand',
+    'RUKA': 'stepperarm',
+    'LIFT': 'stepperelevator',
+    'ORGON': 'stepperwrist',
+}
+
+# Направление движения двигателя к концевику каждой оси (HOME_DIRECTIONS скетча)
+HOME_DIRECTIONS = {'PLECHO': -1, 'RUKA': -1, 'LIFT': 1, 'ORGON': -1}
+
+# Шагов на единицу команды (градус для плеча и руки, мм для лифта,
+# для кисти значение передается в шагах). Должно совпадать с механикой.
+STEPS_PER_UNIT = {
+    'PLECHO': 3200 / 360,  # 200 шагов x 16 микрошагов на оборот
+    'RUKA': 3200 / 360,
+    # LIFT задает опускание в мм, а положительное направление лифта в скетче - вверх
+    'LIFT': -25.0,
+    'ORGON': 1.0,
+}
+
+# Параметры AccelStepper из setup() скетча (шаг/с и шаг/с^2)
+MAX_SPEED = 4000
+ACCELERATION = 2000
+# Скорость runSpeed() при ручном перемещении и поиске концевиков
+JOG_SPEED = 1000
+# Остановка ручного перемещения без нового кадра JOG (мс)
+JOG_TIMEOUT_MS = 300
+# Допустимое изменение доли скорости оси при переходе между сегментами без остановки
+BLEND_SHARE_TOLERANCE = 0.05
+
+# Размер очереди сегментов в прошивке
+QUEUE_SIZE = 16
+
+# Скорость последовательного порта (Serial.begin скетча). На 9600 бод
+# кадры состояния 10 раз в секунду занимали около половины канала
+BAUDRATE = 115200
+
+# Символ начала кадра, поля сегмента и ответы прошивки
+FRAME_START = '$'
+QUERY = '?'
+SEGMENT = 'G'  # Номер сегмента
+ZERO = 'ZERO'  # Обнулить позиции всех осей перед сегментом
+JOG = 'JOG'  # Номер кадра ручного перемещения
+FREE = 'Q'  # Свободные места в очереди
+REPLY_ACK = 'ACK'
+REPLY_RUN = 'RUN'
+REPLY_DONE = 'DONE'
+REPLY_FULL = 'FULL'
+REPLY_ERROR = 'ERR'
+ERROR_BUSY = 'BUSY'  # Ручное перемещение во время выполнения сегментов
+
+# Кадр состояния
+STATUS_PERIOD_MS = 100
+STATUS_POSITIONS = 'P'
+STATUS_MOVING = 'M'
+STATUS_LIMITS = 'L'
+STATUS_DONE = 'D'
+
+StatusFrame = namedtuple('StatusFrame', 'positions moving limits free done')
+
+
+def _format_value(value):
+    """Строки передаются как есть, целые - без дробной части, остальное - с двумя знаками."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return str(value)
+    return f"{float(value):.2f}"
+
+
+def encode_frame(**kwargs):
+    """
+    Формирует кадр из параметров команды.
+
+    Args:
+        **kwargs: Параметры команды (например, ruka=100, vacuum="HIGH")
+
+    Returns:
+        str: Строка кадра с переводом строки или None, если параметров нет
+    """
+    parts = [f"{key.upper()}:{_format_value(value)}" for key, value in kwargs.items() if value is not None]
+    if not parts:
+        return None
+    return FRAME_START + "|".join(parts) + "\n"
+
+
+def encode_segment(seq, fields):
+    """
+    Формирует кадр сегмента.
+
+    Args:
+        seq (int): Номер сегмента
+        fields (dict): Поля сегмента {КЛЮЧ: значение}, цели осей - в шагах
+
+    Returns:
+        str: Строка кадра с переводом строки
+    """
+    return encode_frame(**{SEGMENT: seq}, **fields)
+
+
+def encode_jog(seq, velocities):
+    """
+    Формирует кадр ручного перемещения.
+
+    Args:
+        seq (int): Номер кадра
+        velocities (dict): Скорости осей {ОСЬ: шаг/с}
+
+    Returns:
+        str: Строка кадра с переводом строки
+    """
+    return encode_frame(**{JOG: seq}, **{axis: int(round(v)) for axis, v in velocities.items()})
+
+
+def parse_frame(line):
+    """
+    Разбирает кадр на пары ключ-значение.
+
+    Args:
+        line (str): Строка кадра (с префиксом FRAME_START или без него)
+
+    Returns:
+        dict: Словарь {КЛЮЧ: значение}
+
+    Raises:
+        ValueError: Если поле кадра не содержит разделителя ':'
+    """
+    line = line.strip()
+    if line.startswith(FRAME_START):
+        line = line[len(FRAME_START):]
+
+    fields = {}
+    for part in filter(None, line.split("|")):
+        key, sep, value = part.partition(":")
+        if not sep:
+            raise ValueError(f"Поле без значения: '{part}'")
+        fields[key.strip().upper()] = value.strip()
+    return fields
+
+
+def encode_status(status):
+    """
+    Формирует строку кадра состояния (без перевода строки).
+
+    Args:
+        status (StatusFrame): Состояние прошивки
+
+    Returns:
+        str: Строка вида P:..|M:..|L:..|Q:..|D:..
+    """
+    positions = ",".join(str(int(p)) for p in status.positions)
+    return (f"{STATUS_POSITIONS}:{positions}|{STATUS_MOVING}:{status.moving}|"
+            f"{STATUS_LIMITS}:{status.limits}|{FREE}:{status.free}|{STATUS_DONE}:{status.done}")
+
+
+def decode_status(fields):
+    """
+    Разбирает кадр состояния.
+
+    Args:
+        fields (dict): Результат parse_frame()
+
+    Returns:
+        StatusFrame: Состояние или None, если это не кадр состояния
+
+    Raises:
+        ValueError: Если значения кадра некорректны
+    """
+    if STATUS_POSITIONS not in fields:
+        return None
+    positions = tuple(int(p) for p in fields[STATUS_POSITIONS].split(","))
+    if len(positions) != len(AXES):
+        raise ValueError(f"Ожидалось {len(AXES)} позиций, получено {len(positions)}")
+    return StatusFrame(positions, int(fields.get(STATUS_MOVING, 0)), int(fields.get(STATUS_LIMITS, 0)),
+                       int(fields.get(FREE, QUEUE_SIZE)), int(fields.get(STATUS_DONE, 0)))
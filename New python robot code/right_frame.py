@@ -1,6 +1,19 @@
 import tkinter as tk
 from tkinter import ttk
 
+import protocol
+from jog import JogChannel
+
+# Ось, которой управляет ползунок двигателя
+MOTOR_AXES = {
+    "Двигатель верхний": 'PLECHO',
+    "Двигатель нижний": 'LIFT',
+    "Двигатель руки": 'RUKA',
+    "Двигатель кисти": 'ORGON',
+}
+# Крайнее значение ползунка соответствует скорости protocol.JOG_SPEED
+SLIDER_LIMIT = 20
+
 
 class RightFrame(ttk.LabelFrame):
     def __init__(self, parent, controller):
@@ -13,6 +26,10 @@ class RightFrame(ttk.LabelFrame):
         self.sliders = {}
         self.pneumatic_states = {"Присоска": False, "Дозатор": False}
 
+        # Ручное перемещение: значения ползунков отправляются с фиксированной частотой
+        self.jog = JogChannel(self.controller.actor.jog)
+        self.jog.start()
+
         self.setup_motor_sliders()
         self.setup_pneumatic_controls()
 
@@ -21,12 +38,12 @@ class RightFrame(ttk.LabelFrame):
             frame = ttk.Frame(self)
             frame.pack(fill=tk.X, padx=10, pady=8)
             ttk.Label(frame, text=motor, width=18, anchor="w").pack(side=tk.LEFT)
-            ttk.Label(frame, text="-20", width=4).pack(side=tk.LEFT)
-            slider = ttk.Scale(frame, from_=-20, to=20, variable=self.motor_values[motor],
+            ttk.Label(frame, text=f"-{SLIDER_LIMIT}", width=4).pack(side=tk.LEFT)
+            slider = ttk.Scale(frame, from_=-SLIDER_LIMIT, to=SLIDER_LIMIT, variable=self.motor_values[motor],
                                command=lambda v, m=motor: self.on_slider_change(m, v))
             slider.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=5)
             slider.bind("<ButtonRelease-1>", lambda e, m=motor: self.on_slider_release(m))
-            ttk.Label(frame, text="20", width=4).pack(side=tk.LEFT)
+            ttk.Label(frame, text=str(SLIDER_LIMIT), width=4).pack(side=tk.LEFT)
             value_frame = ttk.Frame(frame, width=50)
             value_frame.pack(side=tk.LEFT)
             ttk.Label(value_frame, text="=").pack(side=tk.LEFT)
@@ -48,16 +65,15 @@ class RightFrame(ttk.LabelFrame):
             setattr(self, f"{device.lower()}_button", btn)
 
     def on_slider_change(self, motor, value):
+        """Передает новое положение ползунка в канал ручного перемещения"""
         self.motor_values[motor].label.config(text=f"{float(value):.1f}")
-        self.controller.send_command(f"{motor[:3].upper()}:{float(value):.1f}")
+        self.jog.set(MOTOR_AXES[motor], float(value) / SLIDER_LIMIT * protocol.JOG_SPEED)
 
     def on_slider_release(self, motor):
-        current_value = self.motor_values[motor].get()
-        if -1 <= current_value <= 1 and current_value != 0:
-            self.motor_values[motor].set(0.0)
-            self.sliders[motor].set(0.0)
-            self.motor_values[motor].label.config(text="0.0")
-            self.controller.send_command(f"{motor[:3].upper()}:0.0")
+        """Отпускание ползунка: немедленная остановка оси и возврат ползунка в ноль"""
+        self.jog.release(MOTOR_AXES[motor])
+        self.motor_values[motor].set(0.0)
+        self.motor_values[motor].label.config(text="0.0")
 
     def toggle_pneumatic(self, device):
         self.pneumatic_states[device] = not self.pneumatic_states[device]
@@ -1,27 +1,82 @@
-import serial
+import threading
 import time
-from serial import SerialException
+from collections import deque
+
+import metrics
+import motion_profile
+import protocol
+from backlash import BacklashCompensator, load_backlash
+from capture import CaptureWriter, CapturingSerial, OUTBOUND
+
+# Метрики обмена с Arduino
+SEND_STEP_SECONDS = metrics.histogram('scara_send_step_seconds', "Время формирования и постановки сегмента (с)")
+ROUNDTRIP_SECONDS = metrics.histogram('scara_serial_roundtrip_seconds', "Время от отправки сегмента до ACK (с)")
+SEGMENTS = metrics.counter('scara_segments_total', "Отправлено сегментов")
+QUEUE_FULL = metrics.counter('scara_queue_full_total', "Ответы FULL (очередь прошивки переполнена)")
+SERIAL_ERRORS = metrics.counter('scara_serial_errors_total', "Ошибки последовательного порта")
 
 
 class ArduinoStepSender:
     """
     Класс для отправки команд на Arduino.
     Поддерживает режим отладки без реального подключения.
+
+    Команды превращаются в сегменты с абсолютными целями осей и потоком
+    передаются в очередь прошивки: пока в ней есть свободные места,
+    следующий сегмент отправляется сразу, без ожидания окончания движения.
+    Все оси сегмента движутся согласованно и приходят в цель одновременно,
+    о чем прошивка сообщает одним ответом DONE.
     """
 
-    def __init__(self, port=None, baudrate=9600, debug_mode=True):
+    def __init__(self, port=None, baudrate=protocol.BAUDRATE, debug_mode=True, capture_path=None, backlash=None):
         """
         Инициализация подключения к Arduino.
 
         Args:
             port (str): COM-порт Arduino (например, 'COM3')
-            baudrate (int): Скорость передачи данных (по умолчанию 9600)
+            baudrate (int): Скорость передачи данных (по умолчанию protocol.BAUDRATE)
             debug_mode (bool): Режим отладки (True - эмуляция, False - реальное подключение)
+            capture_path (str, optional): Файл для записи обмена с Arduino
+            backlash (dict, optional): Люфт осей {ОСЬ: шаги}. Defaults to backlash.load_backlash().
         """
         self.port = port  # Порт подключения
         self.baudrate = baudrate  # Скорость соединения
         self.connection = None  # Объект соединения
         self.debug_mode = debug_mode  # Режим отладки
+        self.capture = CaptureWriter(capture_path) if capture_path else None  # Запись обмена
+
+        # Абсолютные цели осей в единицах команд (сумма относительных перемещений)
+        self.targets = dict.fromkeys(protocol.AXES, 0.0)
+        self.step_targets = dict.fromkeys(protocol.AXES, 0)  # Цели двигателей в шагах (с выбором люфта)
+        self.backlash = BacklashCompensator(load_backlash() if backlash is None else backlash)
+        # (номер сегмента, смещение люфта в его целях) - при каждом изменении смещения
+        self._offset_history = deque([(0, dict(self.backlash.offset))])
+        self.last_duration = 0.0  # Расчетная длительность последнего сегмента (с)
+        self.planned_time = 0.0  # Суммарная расчетная длительность всех сегментов (с)
+        # Оси, выведенные на концевики поиском исходного положения: их концевик - в нуле
+        self.homed_axes = frozenset()
+        # Сегменты поиска концевиков с неизвестного положения: расчетная длительность -
+        # только верхняя граница, ось остановится на концевике раньше
+        self.unknown_segments = 0
+        self.seq = 0  # Номер последнего сформированного сегмента
+        self.jog_seq = 0  # Номер последнего кадра ручного перемещения
+        self.done_seq = 0  # Номер последнего выполненного сегмента
+        self.free_slots = protocol.QUEUE_SIZE  # Свободные места по последнему отчету прошивки
+        self.status = None  # Последний кадр состояния (protocol.StatusFrame)
+        self._status_listeners = []  # Обработчики кадров состояния
+
+        # Потоковая передача сегментов
+        self._pending = deque()  # (номер, кадр) сегментов, ожидающих места в очереди прошивки
+        self._inflight = deque()  # (номер, кадр) отправленных сегментов без подтверждения ACK
+        self._sent_at = {}  # Номер отправленного сегмента -> время отправки (для метрик)
+        self._aborted = False  # Очередь сброшена abort(), новых сегментов еще не было
+        self.origin_lost = False  # Связь обрывалась: позиции осей неизвестны до поиска исходного положения
+        self._homing = False  # Выполняется движение к концевикам home()
+        self.drops = 0  # Число разрывов соединения
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._running = False
+        self._threads = []
 
         # Автоподключение при выключенном режиме отладки
         if not self.debug_mode and self.port:
@@ -39,26 +94,228 @@ class ArduinoStepSender:
             return True
 
         try:
+            # pyserial загружается только при подключении: без порта он не нужен
+            import serial
+
             # Открываем последовательное соединение
             self.connection = serial.Serial(self.port, self.baudrate, timeout=1)
+            if self.capture:
+                self.connection = CapturingSerial(self.connection, self.capture)
             time.sleep(2)  # Даем время Arduino на инициализацию
             print(f"Успешное подключение к Arduino на {self.port}")
-            return True
         except Exception as e:
             print(f"Ошибка подключения: {e}")
             self.connection = None
             return False
 
+        # Прошивка после сброса начинает с пустой очереди и нулевых позиций
+        self.homed_axes = frozenset()
+        with self._condition:
+            self.free_slots = protocol.QUEUE_SIZE
+            self._inflight.clear()
+            self._sent_at.clear()
+            self.status = None
+            self.done_seq = self.seq
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._write_loop, daemon=True),
+            threading.Thread(target=self._read_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return True
+
+    def _build_segment(self, kwargs):
+        """
+        Переводит относительные параметры команды в кадр сегмента.
+
+        Args:
+            kwargs (dict): Параметры команды (например, ruka=100, vacuum="HIGH")
+
+        Returns:
+            str: Кадр сегмента или None, если параметров нет
+        """
+        fields = {}
+        deltas = []
+        for key, value in kwargs.items():
+            if value is None:
+                continue
+            key = key.upper()
+            if key in protocol.STEPS_PER_UNIT:
+                self.targets[key] += float(value)
+                steps = round(self.targets[key] * protocol.STEPS_PER_UNIT[key]) + self.backlash.offset[key]
+                # При смене направления двигатель дополнительно выбирает люфт
+                steps += self.backlash.take_up(key, steps - self.step_targets[key])
+                deltas.append(self._travel(key, self.step_targets[key], steps))
+                self.step_targets[key] = fields[key] = steps
+            else:
+                fields[key] = value
+
+        if not fields:
+            return None
+        self.last_duration = motion_profile.segment_time(deltas)
+        self.planned_time += self.last_duration
+        self.seq += 1
+        self._record_offset()
+        return protocol.encode_segment(self.seq, fields)
+
+    def _travel(self, axis, start, end):
+        """
+        Перемещение двигателя между целями для расчета длительности (шаги).
+        Концевик оси, выведенной на него поиском исходного положения,
+        находится в нуле: дальше него прошивка ось не поведет.
+        """
+        if axis in self.homed_axes:
+            direction = protocol.HOME_DIRECTIONS[axis]
+            start, end = (direction * min(direction * steps, 0) for steps in (start, end))
+        return end - start
+
+    def _record_offset(self):
+        """Запоминает смещение люфта, с которым сформирован сегмент self.seq."""
+        offset = dict(self.backlash.offset)
+        with self._condition:
+            if self._offset_history[-1][1] != offset:
+                self._offset_history.append((self.seq, offset))
+
+    def backlash_offset(self, seq):
+        """
+        Смещение люфта в позициях двигателей после выполнения сегмента.
+        Смещение текущего сегмента к этому моменту может быть другим:
+        сегменты формируются раньше, чем выполняются.
+
+        Args:
+            seq (int): Номер выполненного сегмента (например, StatusFrame.done)
+
+        Returns:
+            dict: Добавленные шаги {ОСЬ: шаги}
+        """
+        with self._condition:
+            # Номера выполненных сегментов только растут - старые записи не нужны
+            while len(self._offset_history) > 1 and self._offset_history[1][0] <= seq:
+                self._offset_history.popleft()
+            return self._offset_history[0][1]
+
     def send_step(self, **kwargs):
         """
-        Отправляет команду на Arduino.
+        Ставит команду в очередь отправки на Arduino.
 
         Args:
             **kwargs: Параметры команды (например, ruka=100, plecho=50)
 
         Returns:
-            bool: True если команда отправлена успешно, False при ошибке
+            bool: True если команда принята к отправке, False при ошибке
         """
+        start = time.perf_counter()
+        # После обрыва связи цели сегментов считались бы от потерянных позиций
+        if self.origin_lost and not self._homing and not self.debug_mode:
+            print("Ошибка: связь с Arduino прерывалась - выполните поиск исходного положения")
+            return False
+        # Формируем кадр из параметров
+        command = self._build_segment(kwargs)
+
+        # Проверяем что есть что отправлять
+        if command is None:
+            print("Ошибка: пустая команда")
+            return False
+
+        accepted = self._enqueue(command, kwargs)
+        SEND_STEP_SECONDS.observe(time.perf_counter() - start)
+        return accepted
+
+    def set_origin(self):
+        """
+        Принимает текущее положение за начало координат.
+        Прошивка обнуляет позиции осей, когда до этого сегмента дойдет очередь.
+        """
+        self.targets = dict.fromkeys(protocol.AXES, 0.0)
+        self.step_targets = dict.fromkeys(protocol.AXES, 0)
+        self.backlash.reset()
+        self.last_duration = 0.0
+        self.seq += 1
+        self._record_offset()
+        accepted = self._enqueue(protocol.encode_segment(self.seq, {protocol.ZERO: 1}), {'zero': 1})
+        if accepted:
+            self.origin_lost = False
+        return accepted
+
+    def home(self, **kwargs):
+        """
+        Выводит оси на концевики и принимает это положение за начало координат.
+        Единственное движение, разрешенное после обрыва связи (origin_lost).
+
+        Args:
+            **kwargs: Относительные перемещения к концевикам (как в send_step)
+
+        Returns:
+            bool: True если оба сегмента приняты к отправке
+        """
+        # Оси, которые движутся к концевикам; от известного концевика длительность
+        # считается по пути до него, от неизвестного - известна только верхняя граница
+        axes = frozenset(key.upper() for key, value in kwargs.items()
+                         if key.upper() in protocol.HOME_DIRECTIONS and value
+                         and value * protocol.STEPS_PER_UNIT[key.upper()] * protocol.HOME_DIRECTIONS[key.upper()] > 0)
+        if axes - self.homed_axes:
+            self.unknown_segments += 1
+        self._homing = True
+        try:
+            accepted = self.send_step(**kwargs)
+        finally:
+            self._homing = False
+        if not (accepted and self.set_origin()):
+            return False
+        self.homed_axes = axes
+        return True
+
+    def send_planned(self, frames, durations):
+        """
+        Ставит в очередь отправки готовые кадры шага из скомпилированного
+        плана программы (program_format) вместо расчета сегментов.
+        Цели кадров абсолютные: план выполняется с того состояния, с
+        которого скомпилирован, - после подключения, до первого сегмента.
+        Номера сегментов назначаются заново, цели осей берутся из кадров
+        (состояние компенсации люфта по кадрам не восстанавливается).
+
+        Args:
+            frames (list): Кадры сегментов шага
+            durations (list): Расчетная длительность каждого кадра (с)
+
+        Returns:
+            bool: True если все кадры приняты к отправке
+        """
+        if self.origin_lost and not self.debug_mode:
+            print("Ошибка: связь с Arduino прерывалась - выполните поиск исходного положения")
+            return False
+        frames = [protocol.parse_frame(frame) for frame in frames]
+        homed = None  # Оси, которые сегмент поиска исходного положения ведет к концевикам
+        for index, (fields, duration) in enumerate(zip(frames, durations)):
+            del fields[protocol.SEGMENT]
+            if protocol.ZERO in fields:
+                # Обнуление после сегмента поиска концевиков, как в home()
+                if not self.set_origin():
+                    return False
+                if homed is not None:
+                    self.homed_axes, homed = homed, None
+                continue
+
+            if index + 1 < len(frames) and protocol.ZERO in frames[index + 1]:
+                homed = frozenset(key for key in protocol.HOME_DIRECTIONS if key in fields and
+                                  (int(fields[key]) - self.step_targets[key]) * protocol.HOME_DIRECTIONS[key] > 0)
+                if homed - self.homed_axes:
+                    self.unknown_segments += 1
+            for key in protocol.AXES:
+                if key in fields:
+                    self.step_targets[key] = int(fields[key])
+                    self.targets[key] = (self.step_targets[key] - self.backlash.offset[key]) / protocol.STEPS_PER_UNIT[key]
+            self.last_duration = duration
+            self.planned_time += duration
+            self.seq += 1
+            self._record_offset()
+            if not self._enqueue(protocol.encode_segment(self.seq, fields), fields):
+                return False
+        return True
+
+    def _enqueue(self, command, kwargs):
+        """Передает сформированный кадр в очередь отправки (или в консоль в режиме отладки)."""
         # Режим отладки - выводим команду в консоль
         if self.debug_mode:
             print("\n" + "=" * 40)
@@ -66,6 +323,10 @@ class ArduinoStepSender:
             for key, value in kwargs.items():
                 print(f"  {key.upper()}: {value}")
             print("=" * 40 + "\n")
+            # В режиме отладки записываются только исходящие кадры
+            if self.capture:
+                self.capture.record(OUTBOUND, command.encode('utf-8'))
+            self.done_seq = self.seq
             return True
 
         # Проверяем подключение
@@ -74,39 +335,297 @@ class ArduinoStepSender:
                 print("Ошибка: подключение к Arduino не установлено!")
                 return False
 
-        # Формируем команду из параметров
-        command_parts = []
-        for key, value in kwargs.items():
-            if value is not None:
-                # Форматируем значение
-                if isinstance(value, str):
-                    command_parts.append(f"{key.upper()}:{value}")
-                else:
-                    command_parts.append(f"{key.upper()}:{float(value):.2f}")
+        with self._condition:
+            self._pending.append((self.seq, command))
+            self._aborted = False
+            self._condition.notify_all()
+        return True
 
-        # Проверяем что есть что отправлять
-        if not command_parts:
-            print("Ошибка: пустая команда")
-            return False
+    def abort(self):
+        """
+        Немедленно останавливает манипулятор.
+        Команда 'S' отправляется в обход очереди, неотправленные сегменты
+        отбрасываются, прошивка сбрасывает свою очередь и тормозит оси.
+        Ожидающие wait_done()/wait_idle() сразу возвращаются.
 
-        # Собираем полную команду
-        command = "|".join(command_parts) + "\n"
+        Returns:
+            bool: True если команда остановки отправлена
+        """
+        with self._write_lock:
+            with self._condition:
+                self._pending.clear()
+                self._inflight.clear()
+                self._sent_at.clear()
+                self.done_seq = self.seq
+                self._aborted = True
+                self._condition.notify_all()
 
-        # Отправляем команду
-        try:
-            self.connection.write(command.encode('utf-8'))
-            print(f"Отправлена команда: {command.strip()}")
+            if self.debug_mode:
+                print("[DEBUG] Эмуляция остановки: очередь команд сброшена")
+                return True
+            if not self.connection or not self.connection.is_open:
+                return False
+            try:
+                self.connection.write(b'S')
+            except OSError as e:
+                print(f"Ошибка отправки: {e}")
+                return False
+        print("Отправлена команда остановки")
+        return True
+
+    def jog(self, velocities):
+        """
+        Отправляет кадр ручного перемещения в обход очереди сегментов.
+        Пока скорости не нулевые, кадр нужно повторять чаще protocol.JOG_TIMEOUT_MS.
+
+        Args:
+            velocities (dict): Скорости осей {ОСЬ: шаг/с}
+
+        Returns:
+            bool: True если кадр отправлен
+        """
+        self.jog_seq += 1
+        command = protocol.encode_jog(self.jog_seq, velocities)
+        if self.debug_mode:
+            print(f"[DEBUG] Ручное перемещение: {command.strip()}")
             return True
-        except SerialException as e:
+
+        if self._pending or self.done_seq < self.seq:
+            print("Ошибка: ручное перемещение во время выполнения программы")
+            return False
+        if not self.connection or not self.connection.is_open:
+            print("Ошибка: подключение к Arduino не установлено!")
+            return False
+        try:
+            with self._write_lock:
+                self.connection.write(command.encode('utf-8'))
+        except OSError as e:
             print(f"Ошибка отправки: {e}")
-            self.connection.close()
-            self.connection = None
+            self._drop_connection()
+            return False
+        return True
+
+    def sync_targets(self, positions):
+        """
+        Принимает фактические позиции осей за цели, от которых считаются
+        следующие сегменты (например, после ручного перемещения).
+
+        Args:
+            positions (tuple): Позиции осей в шагах в порядке protocol.AXES
+        """
+        for axis, steps in zip(protocol.AXES, positions):
+            # Ручное перемещение тоже выбирает люфт при смене направления
+            self.backlash.take_up(axis, int(steps) - self.step_targets[axis])
+            self.step_targets[axis] = int(steps)
+            self.targets[axis] = (steps - self.backlash.offset[axis]) / protocol.STEPS_PER_UNIT[axis]
+        self._record_offset()
+
+    def _write_loop(self):
+        """Поток отправки: держит очередь прошивки заполненной, не переполняя ее."""
+        while self._running:
+            with self._condition:
+                while self._running and not (self._pending and self.free_slots - len(self._inflight) > 0):
+                    self._condition.wait()
+                if not self._running:
+                    break
+                segment = self._pending.popleft()
+                self._inflight.append(segment)
+            command = segment[1]
+
+            try:
+                with self._write_lock:
+                    # Сегмент мог быть сброшен abort() до начала отправки
+                    if segment not in self._inflight:
+                        continue
+                    self.connection.write(command.encode('utf-8'))
+                    self._sent_at[segment[0]] = time.perf_counter()
+                SEGMENTS.inc()
+                print(f"Отправлена команда: {command.strip()}")
+            except OSError as e:
+                SERIAL_ERRORS.inc()
+                print(f"Ошибка отправки: {e}")
+                self._drop_connection()
+                break
+
+    def _read_loop(self):
+        """Поток чтения ответов прошивки."""
+        connection = self.connection
+        while self._running and connection and connection.is_open:
+            try:
+                line = connection.readline().decode('utf-8', errors='replace').strip()
+            except (OSError, TypeError) as e:
+                if self._running:
+                    SERIAL_ERRORS.inc()
+                    print(f"Ошибка чтения данных: {e}")
+                    self._drop_connection()
+                break
+            if line:
+                self._handle_reply(line)
+
+    def _handle_reply(self, line):
+        """
+        Обрабатывает строку ответа прошивки.
+
+        Args:
+            line (str): Строка без перевода строки
+        """
+        try:
+            fields = protocol.parse_frame(line)
+            status = protocol.decode_status(fields)
+            with self._condition:
+                if protocol.FREE in fields:
+                    self.free_slots = int(fields[protocol.FREE])
+                if protocol.REPLY_ACK in fields and self._is_inflight_head(fields[protocol.REPLY_ACK]):
+                    sent = self._sent_at.pop(self._inflight.popleft()[0], None)
+                    if sent is not None:
+                        ROUNDTRIP_SECONDS.observe(time.perf_counter() - sent)
+                if protocol.REPLY_FULL in fields and self._is_inflight_head(fields[protocol.REPLY_FULL]):
+                    # Сегмент отброшен, а прошивка отклонит и все отправленные за ним:
+                    # возвращаем их в начало очереди отправки в прежнем порядке
+                    self._pending.extendleft(reversed(self._inflight))
+                    self._inflight.clear()
+                    QUEUE_FULL.inc()
+                    print(f"Очередь Arduino переполнена, сегмент {fields[protocol.REPLY_FULL]} будет повторен")
+                if protocol.REPLY_DONE in fields:
+                    self.done_seq = max(self.done_seq, int(fields[protocol.REPLY_DONE]))
+                if status is not None:
+                    self.status = status
+                    self.done_seq = max(self.done_seq, status.done)
+                self._condition.notify_all()
+        except ValueError:
+            fields, status = {}, None
+
+        if status is not None:
+            for listener in list(self._status_listeners):
+                listener(status)
+        elif not fields.keys() & {protocol.FREE, protocol.REPLY_DONE}:
+            print(f"Получено с Arduino: {line}")
+
+    def _is_inflight_head(self, seq):
+        """Проверяет, что ответ относится к первому неподтвержденному сегменту."""
+        return bool(self._inflight) and self._inflight[0][0] == int(seq)
+
+    def add_status_listener(self, listener):
+        """
+        Подписывает обработчик на кадры состояния.
+        Обработчик вызывается из потока чтения.
+
+        Args:
+            listener (callable): Функция, принимающая protocol.StatusFrame
+        """
+        self._status_listeners.append(listener)
+
+    def remove_status_listener(self, listener):
+        """
+        Отписывает обработчик от кадров состояния.
+
+        Args:
+            listener (callable): Ранее подписанная функция
+        """
+        if listener in self._status_listeners:
+            self._status_listeners.remove(listener)
+
+    def is_idle(self):
+        """
+        Проверяет, что все сегменты выполнены и оси стоят.
+        Маска движения учитывается, только если кадр состояния получен
+        не раньше последнего ответа DONE, а после abort() - всегда,
+        пока оси не затормозят.
+        """
+        if self._pending or self.done_seq < self.seq:
             return False
+        status = self.status
+        if status is None or not status.moving:
+            return True
+        return status.done < self.done_seq and not self._aborted
+
+    def wait_idle(self, timeout=None):
+        """
+        Ожидает выполнения всех отправленных сегментов и остановки осей.
+
+        Args:
+            timeout (float, optional): Максимальное время ожидания (с)
+
+        Returns:
+            bool: True если все сегменты выполнены, False по таймауту
+        """
+        with self._condition:
+            return self._condition.wait_for(self.is_idle, timeout)
+
+    def wait_done(self, seq, timeout=None):
+        """
+        Ожидает выполнения сегмента с указанным номером (ответ DONE).
+
+        Args:
+            seq (int): Номер сегмента
+            timeout (float, optional): Максимальное время ожидания (с)
+
+        Returns:
+            bool: True если сегмент выполнен, False по таймауту
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.done_seq >= seq, timeout)
+
+    def _drop_connection(self):
+        """
+        Останавливает потоки и закрывает соединение.
+        Очередь сбрасывается, как при abort(): после переподключения прошивка
+        начинает с пустой очереди и нулевых позиций, поэтому сегменты не
+        повторяются, а новые принимаются только после поиска исходного положения.
+        """
+        self._running = False
+        with self._condition:
+            self._pending.clear()
+            self._inflight.clear()
+            self._sent_at.clear()
+            self.done_seq = self.seq
+            self._aborted = True
+            if self.connection is not None:
+                self.origin_lost = True
+                self.homed_axes = frozenset()
+                self.drops += 1
+            self._condition.notify_all()
+        if self.connection:
+            try:
+                self.connection.close()
+            except OSError:
+                pass
+        self.connection = None
+
+    def disconnect(self):
+        """Закрывает соединение с Arduino, сохраняя файл захвата открытым."""
+        self._drop_connection()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2)
+        self._threads = []
 
     def close(self):
         """Закрывает соединение с Arduino."""
         if not self.debug_mode and self.connection and self.connection.is_open:
-            self.connection.close()
+            self.disconnect()
             print("Соединение с Arduino закрыто")
         elif self.debug_mode:
-            print("[DEBUG] Эмуляция: соединение закрыто")
\ No newline at end of file
+            print("[DEBUG] Эмуляция: соединение закрыто")
+
+        if self.capture:
+            self.capture.close()
+            self.capture = None
+
+
+class RecordingStepSender(ArduinoStepSender):
+    """
+    Отправитель без подключения и вывода в консоль.
+    Сохраняет кадры сегментов и их расчетное время для моделирования программ.
+    """
+
+    def __init__(self, backlash=None):
+        super().__init__(debug_mode=True, backlash=backlash)
+        self.frames = []  # Сформированные кадры
+        self.durations = []  # Расчетная длительность каждого кадра (с)
+
+    def _enqueue(self, command, kwargs):
+        self.frames.append(command)
+        self.durations.append(self.last_duration)
+        self.done_seq = self.seq
+        return True
@@ -0,0 +1,65 @@
+"""Тесты модели прошивки (arduino_simulator.FirmwareModel): поиск концевиков."""
+import pytest
+
+import arduino_simulator
+import protocol
+
+
+@pytest.fixture
+def model():
+    return arduino_simulator.FirmwareModel(status_period=0)
+
+
+def run_segment(model, axis, steps):
+    """Выполняет сегмент, после которого цель AccelStepper оси - steps."""
+    model.feed(f"{protocol.FRAME_START}G:1|{axis}:{steps}\n".encode('ascii'))
+    model.advance(3)
+    assert model.positions()[protocol.AXES.index(axis)] == steps
+
+
+def test_homing_stays_on_switches(model):
+    # Цели осей после сегмента направлены от концевиков
+    model.feed(f"{protocol.FRAME_START}G:1|PLECHO:1000|RUKA:1000|LIFT:-1000|ORGON:300\n".encode('ascii'))
+    model.advance(3)
+    model.feed(b'H')
+    model.advance(15)
+    assert model.status().limits == 0b1111
+    for position, limit in zip(model.positions(), arduino_simulator.DEFAULT_LIMIT_POSITIONS):
+        assert position == pytest.approx(limit, abs=2)
+    assert not model.is_moving()
+    # Прошивка не присылает ничего, кроме ответов на сегменты
+    assert [line.split(':')[0] for line in model.read_output().decode('ascii').split()] == \
+        [protocol.REPLY_ACK, protocol.REPLY_RUN, protocol.REPLY_DONE]
+
+
+@pytest.mark.parametrize('command, axis, steps', [
+    ('F', 'PLECHO', 1000),
+    ('X', 'RUKA', 1000),
+    ('U', 'LIFT', -1000),
+    ('V', 'ORGON', 300),
+])
+def test_single_char_move_stops_on_switch(model, command, axis, steps):
+    index = protocol.AXES.index(axis)
+    run_segment(model, axis, steps)
+    model.feed(command.encode('ascii'))
+    model.advance(8)
+    assert model.limit_switch(index)
+    assert model.positions()[index] == pytest.approx(arduino_simulator.DEFAULT_LIMIT_POSITIONS[index], abs=2)
+    assert not model.is_moving()
+
+
+def test_switches_do_not_move_with_zero(model):
+    # Поиск концевика плеча сегментом и обнуление на нем
+    model.feed(f"{protocol.FRAME_START}G:1|PLECHO:-5000\n{protocol.FRAME_START}G:2|ZERO:1\n".encode('ascii'))
+    model.advance(3)
+    assert model.positions()[0] == 0
+    assert model.limit_switch(0)
+    # Дальше концевика ось не едет, от него - едет
+    model.feed(f"{protocol.FRAME_START}G:3|PLECHO:-600\n".encode('ascii'))
+    model.advance(1)
+    assert model.positions()[0] == 0
+    assert model.done_seq == 3
+    model.feed(f"{protocol.FRAME_START}G:4|PLECHO:600\n".encode('ascii'))
+    model.advance(2)
+    assert model.positions()[0] == 600
+    assert not model.limit_switch(0)
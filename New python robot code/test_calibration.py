@@ -0,0 +1,70 @@
+"""Тесты калибровки кинематики (calibration)."""
+import math
+import random
+
+import pytest
+
+import calibration
+import kinematics
+
+TRUE_PARAMETERS = {'L1': 229.4, 'L2': 146.2, 'ARM_OFFSET': 22.3, 'SHOULDER_OFFSET': 88.9,
+                   'BASE_X': 1.7, 'BASE_Y': -2.4}
+
+
+def make_samples(parameters, count=30, noise=0.0, seed=1):
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        arm, shoulder = rng.uniform(30, 300), rng.uniform(20, 200)
+        x, y = calibration.tool_position(parameters, arm, shoulder)
+        samples.append(calibration.Sample(arm, shoulder, x + rng.gauss(0, noise), y + rng.gauss(0, noise)))
+    return samples
+
+
+def test_model_matches_inverse_kinematics():
+    model = kinematics.Kinematics(calibration=None)
+    for x, y in ((250, 120), (-180, 90), (120, -200), (-150, -150)):
+        arm, shoulder = model._calc_angles(x, y)
+        assert calibration.tool_position(kinematics.DEFAULT_PARAMETERS, arm, shoulder) == \
+            pytest.approx((x, y), abs=1e-9)
+
+
+@pytest.mark.parametrize('fit_base', [False, True])
+def test_fit_recovers_parameters(fit_base):
+    truth = TRUE_PARAMETERS if fit_base else {**TRUE_PARAMETERS, 'BASE_X': 0.0, 'BASE_Y': 0.0}
+    result = calibration.fit(make_samples(truth), fit_base=fit_base)
+    for name, value in truth.items():
+        assert result.parameters[name] == pytest.approx(value, abs=1e-6), name
+    assert result.rms < 1e-6
+    assert len(result.residuals) == 30
+
+
+def test_fit_with_noise_reaches_noise_level():
+    result = calibration.fit(make_samples(TRUE_PARAMETERS, count=200, noise=0.2), fit_base=True)
+    assert result.rms == pytest.approx(0.2 * math.sqrt(2), rel=0.2)
+    assert result.parameters['L1'] == pytest.approx(TRUE_PARAMETERS['L1'], abs=0.2)
+    assert result.parameters['L2'] == pytest.approx(TRUE_PARAMETERS['L2'], abs=0.2)
+
+
+def test_too_few_samples():
+    with pytest.raises(ValueError, match="Недостаточно точек"):
+        calibration.fit(make_samples(TRUE_PARAMETERS, count=5), fit_base=True)
+
+
+def test_saved_calibration_is_used_by_kinematics(tmp_path):
+    path = str(tmp_path / "calibration.json")
+    result = calibration.fit(make_samples(TRUE_PARAMETERS), fit_base=True)
+    calibration.save_calibration(result, path)
+    model = kinematics.Kinematics(calibration=path)
+    assert (model.L1, model.BASE_X) == pytest.approx((TRUE_PARAMETERS['L1'], TRUE_PARAMETERS['BASE_X']))
+    arm, shoulder = model._calc_angles(200, 100)
+    assert calibration.tool_position(TRUE_PARAMETERS, arm, shoulder) == pytest.approx((200, 100), abs=1e-5)
+
+
+def test_read_samples(tmp_path):
+    path = tmp_path / "points.csv"
+    path.write_text("arm,shoulder,x,y\n10,20,30.5,-4\n", encoding='utf-8')
+    assert calibration.read_samples(str(path)) == [calibration.Sample(10, 20, 30.5, -4)]
+    path.write_text("arm,shoulder,x\n10,20,30\n", encoding='utf-8')
+    with pytest.raises(ValueError, match="нет столбцов"):
+        calibration.read_samples(str(path))
@@ -0,0 +1,45 @@
+"""Тесты актора контроллера (controller_actor): аварийная остановка."""
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+from controller_actor import ControllerActor, PRIORITY_COMMAND
+from manipulator import ManipulatorController
+from steps_for_arduino import RecordingStepSender
+
+
+@pytest.fixture
+def actor():
+    actor = ControllerActor(ManipulatorController(sender=RecordingStepSender()))
+    actor.start()
+    yield actor
+    actor.close()
+
+
+def test_stop_does_not_wait_for_running_handler(actor, monkeypatch):
+    aborts = []
+    monkeypatch.setattr(actor.controller.arduino_sender, 'abort',
+                        lambda: aborts.append(threading.current_thread()) or True)
+    started, release = threading.Event(), threading.Event()
+
+    def handler():
+        started.set()
+        release.wait(5)
+
+    running = actor.submit(PRIORITY_COMMAND, handler)
+    queued = actor.submit(PRIORITY_COMMAND, lambda: None)
+    assert started.wait(5)
+
+    # Остановка отправлена сразу, пока обработчик еще выполняется
+    assert actor.emergency_stop() is True
+    assert aborts == [threading.current_thread()]
+    assert not running.done()
+
+    release.set()
+    running.result(5)
+    # Команда, поставленная до остановки, отменена; очередь обрабатывается после повторного сброса
+    with pytest.raises(CancelledError):
+        queued.result(5)
+    # Сегменты, поставленные обработчиком после остановки, сброшены
+    assert len(aborts) == 2 and aborts[1] is not threading.current_thread()
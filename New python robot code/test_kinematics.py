@@ -0,0 +1,26 @@
+"""Тесты пакетного расчета углов (Kinematics.calc_angles_batch)."""
+import pytest
+
+import calibration
+import kinematics
+
+
+@pytest.fixture
+def shifted(tmp_path):
+    """Кинематика с основанием не в начале координат (как после калибровки)."""
+    parameters = {**kinematics.DEFAULT_PARAMETERS, 'BASE_X': 12.5, 'BASE_Y': -7.0}
+    result = calibration.CalibrationResult(parameters, [], 0.0, 0.0, 0)
+    path = str(tmp_path / "calibration.json")
+    calibration.save_calibration(result, path)
+    return kinematics.Kinematics(calibration=path)
+
+
+def test_batch_matches_single_points(shifted):
+    points = [(x, y) for x in range(-300, 301, 75) for y in range(-300, 301, 75)]
+    for point, angles in zip(points, shifted.calc_angles_batch(points)):
+        assert angles == pytest.approx(shifted._calc_angles(*point)), point
+
+
+def test_point_on_base(shifted):
+    base = (shifted.BASE_X, shifted.BASE_Y)
+    assert shifted.calc_angles_batch([base]) == [shifted._calc_angles(*base)]
@@ -0,0 +1,61 @@
+"""Тесты отслеживания портов (port_watcher): восстановление соединения."""
+import contextlib
+import io
+
+from port_watcher import PortInfo, PortWatcher
+
+ARDUINO = PortInfo('/dev/ttyACM0', "Arduino Uno", 0x2341, 0x0043, "7563")
+
+
+class FakeSender:
+    """Отправитель, соединение которого оборвалось."""
+
+    def __init__(self):
+        self.port = ARDUINO.device
+        self.debug_mode = False
+        self.connection = object()
+
+    def connect(self):
+        self.connection = object()
+        return True
+
+
+def test_reconnect_runs_in_owner_thread():
+    scans = iter([(ARDUINO,), (), (ARDUINO._replace(device='/dev/ttyACM1'),)])
+    submitted, events = [], []
+    watcher = PortWatcher(lister=lambda: next(scans), submit=submitted.append)
+    watcher.add_connection_listener(lambda connected, device: events.append((connected, device)))
+    sender = FakeSender()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        watcher._scan()
+        watcher.follow(sender)
+        # Кабель отключен: отправитель закрыл соединение, устройство исчезло
+        sender.connection = None
+        watcher._scan()
+        assert events == [(False, '/dev/ttyACM0')]
+
+        # Устройство вернулось под другим именем: подключение передано владельцу отправителя
+        watcher._scan()
+        assert sender.connection is None and len(submitted) == 1
+        submitted[0]()
+    assert sender.port == '/dev/ttyACM1' and sender.connection is not None
+    assert events[-1] == (True, '/dev/ttyACM1')
+
+
+def test_reconnect_skipped_after_unfollow():
+    scans = iter([(ARDUINO,), (), (ARDUINO,)])
+    submitted = []
+    watcher = PortWatcher(lister=lambda: next(scans), submit=submitted.append)
+    sender = FakeSender()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        watcher._scan()
+        watcher.follow(sender)
+        sender.connection = None
+        watcher._scan()
+        watcher._scan()
+        # Пока переподключение ждало очереди, пользователь отключился
+        watcher.follow(None)
+        submitted[0]()
+    assert sender.connection is None
@@ -0,0 +1,86 @@
+"""Тесты разбора и разворачивания блоков программы (program_blocks)."""
+import pytest
+
+import matrics
+import program_blocks
+from program_blocks import CALL, END, FOR_EACH_GRID, GRID_POINT, MACRO, REPEAT
+
+
+@pytest.fixture
+def grid(monkeypatch):
+    """Сетка печки 2x3 на время теста."""
+    monkeypatch.setitem(matrics.glue_point, 'rows', "2")
+    monkeypatch.setitem(matrics.glue_point, 'cols', "3")
+
+
+def test_plain_program_is_unchanged():
+    commands = ["В исходное положение", "Движение к печке", "Подняться"]
+    assert list(program_blocks.expand(commands)) == commands
+
+
+def test_repeat_and_macro(grid):
+    commands = [
+        f"{MACRO} Нанесение", "Включить дозатор", "Выключить дозатор", END,
+        f"{REPEAT} 2", f"{CALL} Нанесение", "Притирка", END,
+        "В исходное положение",
+    ]
+    assert list(program_blocks.expand(commands)) == [
+        "Включить дозатор", "Выключить дозатор", "Притирка",
+        "Включить дозатор", "Выключить дозатор", "Притирка",
+        "В исходное положение",
+    ]
+
+
+@pytest.mark.parametrize('order, points', [
+    (program_blocks.ORDER_ROWS, [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2)]),
+    (program_blocks.ORDER_SERPENTINE, [(0, 0), (0, 1), (0, 2), (1, 2), (1, 1), (1, 0)]),
+])
+def test_grid_order(grid, order, points):
+    expanded = list(program_blocks.expand([FOR_EACH_GRID, "Притирка", END], order))
+    assert expanded[::2] == [f"{GRID_POINT} {row},{col}" for row, col in points]
+    assert expanded[1::2] == ["Притирка"] * len(points)
+    assert [program_blocks.parse_grid_point(command) for command in expanded[::2]] == points
+
+
+def test_count_matches_expansion(grid):
+    commands = [
+        f"{MACRO} Точка", "Опуститься до печки", f"{REPEAT} 3", "Притирка", END, "Подняться", END,
+        "В исходное положение",
+        FOR_EACH_GRID, f"{CALL} Точка", f"{REPEAT} 0", "Не выполняется", END, END,
+        f"{REPEAT} 2", f"{REPEAT} 2", "Вперёд присоской", END, END,
+    ]
+    expander = program_blocks.expand(commands)
+    assert expander.count() == len(list(expander)) == 1 + 6 * (1 + 5) + 4
+
+
+def test_source_index_points_to_original_step(grid):
+    expander = program_blocks.expand(["Подняться", f"{REPEAT} 2", "Притирка", END])
+    sources = [expander.source_index for _ in expander]
+    assert sources == [0, 2, 2]
+
+
+@pytest.mark.parametrize('commands, message', [
+    ([END], "без начала блока"),
+    ([f"{REPEAT} 2", "Притирка"], "не закрыт"),
+    ([f"{REPEAT} два", END], "некорректное число повторений"),
+    ([f"{REPEAT} -1", END], "отрицательным"),
+    ([f"{REPEAT} 2", f"{MACRO} М", END, END], "только вне блоков"),
+    ([MACRO, END], "не указано имя"),
+    ([f"{MACRO} М", END, f"{MACRO} М", END], "уже определен"),
+    ([f"{CALL} Нет"], "не определен"),
+    ([f"{MACRO} А", f"{CALL} Б", END, f"{MACRO} Б", f"{CALL} А", END], "вызывает сам себя"),
+])
+def test_parse_errors(commands, message):
+    with pytest.raises(ValueError, match=message):
+        program_blocks.parse_program(commands)
+
+
+def test_unknown_order():
+    with pytest.raises(ValueError, match="порядок обхода"):
+        program_blocks.expand(["Подняться"], order="spiral")
+
+
+def test_bad_grid_point():
+    assert program_blocks.parse_grid_point("Подняться") is None
+    with pytest.raises(ValueError):
+        program_blocks.parse_grid_point(f"{GRID_POINT} a,b")
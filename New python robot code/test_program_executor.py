@@ -0,0 +1,90 @@
+"""Тесты исполнителя программы (program_executor): отправка шагов с опережением и поиск концевиков."""
+import contextlib
+import io
+
+import pytest
+
+import program_executor
+import program_format
+from manipulator import ManipulatorController
+from steps_for_arduino import RecordingStepSender
+
+GLUE_POINT = {'X': "250.00", 'Y': "120.00", 'Z': "900.00", 'rows': "2", 'cols': "3"}
+MAGAZINE_POS = {'X': "180.00", 'Y': "-200.00", 'Z': "940.00"}
+
+
+@pytest.fixture
+def executor():
+    sender = RecordingStepSender()
+    executor = program_executor.ProgramExecutor(ManipulatorController(sender=sender))
+    # Режим отладки ждет расчетное время шага - в тестах не ждем
+    executor._sleep_until = lambda deadline: None
+    return executor
+
+
+def run(executor, program):
+    """Выполняет программу; возвращает (команда, отправлено кадров) в момент ожидания окончания каждого шага."""
+    sender = executor.manipulator.arduino_sender
+    waits = []
+    complete = executor._complete
+
+    def recording_complete(step):
+        waits.append((step.command, len(sender.frames)))
+        return complete(step)
+
+    executor._complete = recording_complete
+    with program_executor.standard_positions(), contextlib.redirect_stdout(io.StringIO()):
+        executor.run(program)
+    return waits
+
+
+def test_motion_is_sent_ahead_pneumatics_waits(executor):
+    program = ["Движение к магазину", "Опуститься до магазина", "Включить вакуум", "Подняться"]
+    sender = executor.manipulator.arduino_sender
+    starts = []  # Отправлено кадров перед отправкой каждого шага
+    send = executor._send
+
+    def recording_send(index, command):
+        starts.append(len(sender.frames))
+        return send(index, command)
+
+    executor._send = recording_send
+    waits = run(executor, program)
+    # Шаг движения ждет окончания, когда следующий шаг движения уже отправлен;
+    # включение вакуума отправляется только после окончания опускания
+    assert waits == [(program[0], starts[2]), (program[1], starts[2]), (program[2], starts[3]),
+                     (program[3], len(sender.frames))]
+    assert [t.command for t in executor.timings] == program
+
+
+def test_homing_from_switches_has_known_duration(executor):
+    sender = executor.manipulator.arduino_sender
+    with program_executor.standard_positions(), contextlib.redirect_stdout(io.StringIO()):
+        executor.execute_step(program_executor.HOME_COMMAND)
+        executor.execute_step("Движение к магазину")
+        executor.execute_step(program_executor.HOME_COMMAND)
+    first, move, second = executor.timings
+    # С неизвестного положения длительность поиска концевиков - только верхняя граница
+    assert first.planned is None
+    # С концевиков - по пути до них: обратно тем же путем
+    assert second.planned == pytest.approx(move.planned)
+    assert sender.unknown_segments == 1
+    assert executor.jitter()['count'] == 2
+
+
+def test_plan_frames_are_sent_as_compiled(executor, tmp_path):
+    path = str(tmp_path / ("program" + program_format.EXTENSION))
+    program_format.save_program_file(path, program_executor.STANDARD_GLUE_PROGRAM, GLUE_POINT, MAGAZINE_POS)
+    expected = program_format.compile_plan(program_executor.STANDARD_GLUE_PROGRAM, GLUE_POINT, MAGAZINE_POS)
+    sender = executor.manipulator.arduino_sender
+    with program_format.ProgramFile(path) as plan, contextlib.redirect_stdout(io.StringIO()):
+        executor.run(program_executor.STANDARD_GLUE_PROGRAM, plan=plan)
+    assert sender.frames == expected.frames
+    assert sender.planned_time == pytest.approx(sum(expected.durations))
+
+    # Расчетные длительности шагов (и поиск концевиков с неизвестного положения) - как без плана
+    compiled = program_executor.ProgramExecutor(ManipulatorController(sender=RecordingStepSender()))
+    compiled._sleep_until = executor._sleep_until
+    run(compiled, program_executor.STANDARD_GLUE_PROGRAM)
+    assert [t.planned for t in executor.timings] == pytest.approx([t.planned for t in compiled.timings])
+    assert sender.unknown_segments == compiled.manipulator.arduino_sender.unknown_segments
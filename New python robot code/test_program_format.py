@@ -0,0 +1,106 @@
+"""Тесты двоичного формата программы (program_format)."""
+import pytest
+
+import program_format
+from program_blocks import END, REPEAT
+
+COMMANDS = ["В исходное положение", "Движение к печке", "Опуститься до печки", "Притирка", "Подняться",
+            "Движение к печке", "В исходное положение"]
+GLUE_POINT = {'X': "250.00", 'Y': "120.00", 'Z': "900.00", 'rows': "2", 'cols': "3"}
+MAGAZINE_POS = {'X': "180.00", 'Y': "-200.00", 'Z': "940.00"}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / ("program" + program_format.EXTENSION))
+
+
+def test_round_trip(path):
+    assert program_format.save_program_file(path, COMMANDS, GLUE_POINT, MAGAZINE_POS) is False
+    assert program_format.is_program_file(path)
+    expected = program_format.compile_plan(COMMANDS, GLUE_POINT, MAGAZINE_POS)
+    with program_format.ProgramFile(path) as program:
+        assert list(program.steps) == COMMANDS
+        assert program.steps[1:3] == COMMANDS[1:3]
+        assert program.glue_point == {'X': 250.0, 'Y': 120.0, 'Z': 900.0, 'rows': 2, 'cols': 3}
+        assert program.magazine_pos == {'X': 180.0, 'Y': -200.0, 'Z': 940.0}
+        assert program.is_plan_current()
+        assert program.plan() == (expected.frames, expected.durations, expected.step_starts)
+        assert program.step_frames(1) == expected.frames[expected.step_starts[1]:expected.step_starts[2]]
+        assert len(program.step_durations()) == len(COMMANDS)
+
+
+def test_plan_steps_follow_expanded_blocks(path):
+    commands = [f"{REPEAT} 3", "Притирка", END]
+    program_format.save_program_file(path, commands, GLUE_POINT, MAGAZINE_POS)
+    with program_format.ProgramFile(path) as program:
+        assert program.step_count == 3
+        assert program.plan_steps == 3
+        assert len(program.step_durations()) == 3
+
+
+def test_without_plan(path):
+    program_format.save_program_file(path, COMMANDS, GLUE_POINT, MAGAZINE_POS, plan=False)
+    with program_format.ProgramFile(path) as program:
+        assert not program.has_plan
+        assert program.plan() is None
+        assert program.step_durations() is None
+
+
+def test_plan_reused_only_for_same_content(path, monkeypatch):
+    program_format.save_program_file(path, COMMANDS, GLUE_POINT, MAGAZINE_POS)
+    assert program_format.save_program_file(path, COMMANDS, GLUE_POINT, MAGAZINE_POS) is True
+    assert program_format.save_program_file(path, COMMANDS[:-1], GLUE_POINT, MAGAZINE_POS) is False
+    assert program_format.save_program_file(path, COMMANDS[:-1], {**GLUE_POINT, 'X': "251"}, MAGAZINE_POS) is False
+
+    # Другие параметры механики делают сохраненный план устаревшим
+    monkeypatch.setattr(program_format, '_mechanics_key', lambda: b'other mechanics')
+    with program_format.ProgramFile(path) as program:
+        assert not program.is_plan_current()
+        assert program.step_durations() is None
+    assert program_format.save_program_file(path, COMMANDS[:-1], {**GLUE_POINT, 'X': "251"}, MAGAZINE_POS) is False
+
+
+@pytest.mark.parametrize('cut', [1, 32, 0.5, 0.2])
+def test_truncated_file_is_rejected(path, cut):
+    program_format.save_program_file(path, COMMANDS, GLUE_POINT, MAGAZINE_POS)
+    with open(path, 'rb') as f:
+        data = f.read()
+    size = len(data) - cut if isinstance(cut, int) else int(len(data) * cut)
+    with open(path, 'wb') as f:
+        f.write(data[:size])
+    with pytest.raises(ValueError):
+        program_format.ProgramFile(path)
+    # Поврежденный файл перезаписывается с новой компиляцией
+    assert program_format.save_program_file(path, COMMANDS, GLUE_POINT, MAGAZINE_POS) is False
+    with open(path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_appended_bytes_are_rejected(path):
+    program_format.save_program_file(path, COMMANDS, GLUE_POINT, MAGAZINE_POS)
+    with open(path, 'ab') as f:
+        f.write(b'\0')
+    with pytest.raises(ValueError):
+        program_format.ProgramFile(path)
+
+
+def test_corrupted_plan_is_not_used(path):
+    program_format.save_program_file(path, COMMANDS, GLUE_POINT, MAGAZINE_POS)
+    with open(path, 'r+b') as f:
+        f.seek(-program_format.DIGEST_SIZE - 5, 2)
+        byte = f.read(1)
+        f.seek(-1, 1)
+        f.write(bytes([byte[0] ^ 1]))
+    with program_format.ProgramFile(path) as program:
+        assert not program.is_plan_current()
+        assert program.plan() is None
+    assert program_format.save_program_file(path, COMMANDS, GLUE_POINT, MAGAZINE_POS) is False
+
+
+def test_not_a_program(path):
+    with open(path, 'wb') as f:
+        f.write(b'{"steps": []}' * 10)
+    assert not program_format.is_program_file(path)
+    with pytest.raises(ValueError):
+        program_format.ProgramFile(path)
@@ -0,0 +1,75 @@
+"""Тесты проверки программы (program_validator): циклы блоков и правила пневматики."""
+import time
+
+import pytest
+
+import program_validator
+from program_blocks import END, REPEAT
+
+GLUE_POINT = {'X': "250", 'Y': "120", 'Z': "900", 'rows': "2", 'cols': "3"}
+MAGAZINE_POS = {'X': "180", 'Y': "-200", 'Z': "940"}
+
+
+def validate(commands):
+    return program_validator.validate_program(commands, GLUE_POINT, MAGAZINE_POS)
+
+
+class _CountingChecker(program_validator._Checker):
+    """Тело цикла - функция состояния: проверяется только арифметика поиска цикла."""
+
+    def __init__(self, transition):
+        super().__init__({}, 1, 1)
+        self.transition = transition
+        self.iterations = 0
+
+    def run(self, nodes, state):
+        self.iterations += 1
+        return self.transition(state)
+
+
+@pytest.mark.parametrize('count', [0, 1, 2, 3, 7, 10, 1001, 10 ** 12])
+def test_loop_with_prefix_and_period(count):
+    # Состояния 0 -> 1 -> 2 -> 3 -> 4 -> 2 -> ...: предпериод 2, период 3
+    def transition(state):
+        return 2 if state == 4 else state + 1
+
+    expected = 0
+    for _ in range(count if count < 5 else 2 + (count - 2) % 3):
+        expected = transition(expected)
+    checker = _CountingChecker(transition)
+    assert checker.loop([], count, 0) == expected
+    assert checker.iterations <= 5
+
+
+def test_error_only_on_second_iteration():
+    body = [f"{REPEAT} {{}}", "Движение к печке", "Включить дозатор", END, "Выключить дозатор"]
+    once = validate([line.format(1) for line in body])
+    twice = validate([line.format(2) for line in body])
+    assert once == []
+    assert twice == [program_validator.Issue(2, "Перемещение с включенным дозатором")]
+
+
+def test_huge_repeat_is_not_simulated_step_by_step():
+    commands = [f"{REPEAT} 1000000000", "Движение к печке", "Включить дозатор", "Выключить дозатор", END]
+    start = time.perf_counter()
+    assert validate(commands) == []
+    assert time.perf_counter() - start < 1.0
+
+
+def test_state_after_loop_depends_on_count():
+    # После цикла дозатор включен, только если тело выполнялось
+    for count, issues in ((0, 0), (3, 1)):
+        commands = [f"{REPEAT} {count}", "Включить дозатор", END, "Движение к печке", "Выключить дозатор"]
+        assert len(validate(commands)) == issues
+
+
+def test_zero_repeat_body_is_still_checked():
+    issues = validate([f"{REPEAT} 0", "Неизвестная команда", END])
+    assert issues == [program_validator.Issue(2, "Неизвестная команда 'Неизвестная команда'")]
+
+
+def test_vacuum_required_when_leaving_magazine():
+    commands = ["Движение к магазину", "Опуститься до магазина", "Подняться", "Движение к печке"]
+    assert validate(commands) == [program_validator.Issue(4, "Уход от магазина с выключенным вакуумом")]
+    commands.insert(2, "Включить вакуум")
+    assert validate(commands) == []
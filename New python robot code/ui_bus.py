@@ -0,0 +1,82 @@
+"""
+Потокобезопасная шина обновлений интерфейса.
+
+Рабочие потоки (выполнение программы, чтение ответов Arduino) не трогают
+виджеты Tk напрямую, а публикуют последнее значение по ключу. Главный
+цикл Tk с фиксированной частотой забирает накопленные значения и
+применяет их: из нескольких обновлений одного ключа между кадрами
+отображается только последнее, поэтому частая телеметрия не перегружает
+интерфейс.
+"""
+import threading
+
+# Частота обновления интерфейса по умолчанию (кадров в секунду)
+DEFAULT_RATE_HZ = 30
+
+
+class UiBus:
+    """Очередь обновлений интерфейса, хранящая только последнее значение каждого ключа."""
+
+    def __init__(self, root, rate_hz=DEFAULT_RATE_HZ):
+        """
+        Args:
+            root: Главное окно Tkinter
+            rate_hz (float): Частота применения обновлений (кадров в секунду)
+        """
+        self.root = root
+        self.period_ms = max(1, round(1000 / rate_hz))
+        self._lock = threading.Lock()
+        self._latest = {}  # Ключ -> последнее значение с прошлого кадра
+        self._handlers = {}  # Ключ -> обработчик, вызываемый в потоке Tk
+        self._job = None
+
+    def subscribe(self, key, handler):
+        """
+        Назначает обработчик обновлений ключа.
+        Вызывать из потока Tk.
+
+        Args:
+            key: Ключ обновления (например, 'coords' или ('lamp', 'Вакуум'))
+            handler (callable): Функция, принимающая значение
+        """
+        self._handlers[key] = handler
+
+    def post(self, key, value):
+        """
+        Публикует новое значение. Можно вызывать из любого потока.
+        Предыдущее неприменённое значение того же ключа заменяется.
+
+        Args:
+            key: Ключ обновления
+            value: Новое значение
+        """
+        with self._lock:
+            self._latest[key] = value
+
+    def start(self):
+        """Запускает периодическое применение обновлений в главном цикле Tk."""
+        if self._job is None:
+            self._job = self.root.after(self.period_ms, self._drain)
+
+    def stop(self):
+        """Останавливает применение обновлений."""
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+    def _drain(self):
+        """Применяет накопленные обновления и планирует следующий кадр."""
+        with self._lock:
+            updates, self._latest = self._latest, {}
+
+        for key, value in updates.items():
+            handler = self._handlers.get(key)
+            if handler is None:
+                print(f"Ошибка: нет обработчика обновления '{key}'")
+                continue
+            try:
+                handler(value)
+            except Exception as e:
+                print(f"Ошибка обновления интерфейса '{key}': {e}")
+
+        self._job = self.root.after(self.period_ms, self._drain)
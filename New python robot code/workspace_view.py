@@ -0,0 +1,148 @@
+"""
+Схема рабочей зоны манипулятора: рычаги, сетка точек печки и ближайший путь.
+
+Все элементы холста создаются один раз. При обновлении рычаги и путь
+только перемещаются (canvas.coords), а у сетки перекрашиваются лишь
+ячейки, состояние которых изменилось, поэтому схема успевает за частой
+телеметрией даже на сетках в десятки тысяч точек.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+# Цвета ячеек сетки
+PENDING_COLOR = "#c8c8c8"
+VISITED_COLOR = "#4caf50"
+CURRENT_COLOR = "#ff9800"
+
+# Сколько следующих точек сетки показывать в пути
+PATH_LENGTH = 20
+
+
+class WorkspaceView(ttk.LabelFrame):
+    """Панель со схемой манипулятора в плоскости XY (вид сверху)."""
+
+    def __init__(self, parent, kinematics, size=360):
+        """
+        Args:
+            parent: Родительский виджет
+            kinematics (Kinematics): Модель кинематики (длины рычагов, положение основания)
+            size (int): Размер холста (пикселей)
+        """
+        super().__init__(parent, text="Рабочая зона", padding=5)
+        self.kinematics = kinematics
+        self.size = size
+        reach = kinematics.L1 + kinematics.L2
+        offset = max(abs(kinematics.BASE_X), abs(kinematics.BASE_Y))  # Смещение основания (калибровка)
+        self.scale = (size / 2 - 10) / (reach + offset)  # Пикселей на мм
+
+        self.canvas = tk.Canvas(self, width=size, height=size, bg="white", highlightthickness=0)
+        self.canvas.pack()
+
+        # Граница досягаемости и основание
+        base_x, base_y = self.base = self.to_canvas(kinematics.BASE_X, kinematics.BASE_Y)
+        radius = reach * self.scale
+        self.canvas.create_oval(base_x - radius, base_y - radius, base_x + radius, base_y + radius,
+                                outline="#e0e0e0", dash=(3, 3))
+
+        # Сетка (создается в set_grid), путь и рычаги поверх нее
+        self.cells = []  # Элементы холста ячеек по порядку обхода
+        self.points = []  # Координаты точек сетки (мм) по порядку обхода
+        self.progress = 0  # Индекс текущей точки сетки
+        self._grid_key = None
+        self.path = self.canvas.create_line(0, 0, 0, 0, fill="#2196f3", dash=(4, 2), state=tk.HIDDEN)
+        self.link1 = self.canvas.create_line(*self.base, *self.base, width=6, fill="#455a64",
+                                             capstyle=tk.ROUND)
+        self.link2 = self.canvas.create_line(*self.base, *self.base, width=4, fill="#78909c",
+                                             capstyle=tk.ROUND)
+        self.canvas.create_oval(base_x - 6, base_y - 6, base_x + 6, base_y + 6, fill="#263238")
+        self.tool = self.canvas.create_oval(0, 0, 0, 0, fill="#f44336", outline="")
+        self.tool_xy = (0.0, 0.0)
+
+    def to_canvas(self, x, y):
+        """
+        Переводит координаты (мм) в координаты холста.
+
+        Returns:
+            tuple: (x, y) в пикселях, ось Y направлена вверх
+        """
+        center = self.size / 2
+        return center + x * self.scale, center - y * self.scale
+
+    def set_pose(self, arm_angle, shoulder_angle):
+        """
+        Перемещает рычаги в положение, заданное углами.
+
+        Args:
+            arm_angle (float): Угол руки (градусы, как в Kinematics)
+            shoulder_angle (float): Угол плеча (градусы)
+        """
+        elbow = self.to_canvas(*self.kinematics.elbow(shoulder_angle))
+        self.tool_xy = self.kinematics.forward(arm_angle, shoulder_angle)
+        tool = self.to_canvas(*self.tool_xy)
+
+        self.canvas.coords(self.link1, *self.base, *elbow)
+        self.canvas.coords(self.link2, *elbow, *tool)
+        self.canvas.coords(self.tool, tool[0] - 4, tool[1] - 4, tool[0] + 4, tool[1] + 4)
+        self._update_path()
+
+    def set_grid(self, grid):
+        """
+        Задает сетку точек печки. Ячейки пересоздаются только при изменении сетки.
+
+        Args:
+            grid (dict): Результат matrics.get_grid_coordinates(): {(строка, столбец): {'X', 'Y', 'Z'}}
+        """
+        points = [(float(c['X']), float(c['Y'])) for _, c in sorted(grid.items())]
+        key = tuple(points)
+        if key == self._grid_key:
+            return
+        self._grid_key = key
+
+        for cell in self.cells:
+            self.canvas.delete(cell)
+        self.points = points
+        self.cells = []
+        for x, y in points:
+            cx, cy = self.to_canvas(x, y)
+            self.cells.append(self.canvas.create_rectangle(cx - 2, cy - 2, cx + 2, cy + 2,
+                                                           fill=PENDING_COLOR, outline=""))
+        # Рычаги и путь остаются поверх сетки
+        self.canvas.tag_raise(self.path)
+        self.canvas.tag_raise(self.link1)
+        self.canvas.tag_raise(self.link2)
+        self.canvas.tag_raise(self.tool)
+
+        self.progress = 0
+        if self.cells:
+            self.canvas.itemconfigure(self.cells[0], fill=CURRENT_COLOR)
+        self._update_path()
+
+    def set_progress(self, index):
+        """
+        Отмечает пройденные точки: до index - пройдены, index - текущая.
+        Перекрашиваются только ячейки между старым и новым значением.
+
+        Args:
+            index (int): Индекс текущей точки сетки (строка * столбцов + столбец)
+        """
+        index = max(0, min(index, len(self.cells) - 1))
+        if index == self.progress or not self.cells:
+            return
+        low, high = sorted((index, self.progress))
+        for i in range(low, high + 1):
+            color = VISITED_COLOR if i < index else CURRENT_COLOR if i == index else PENDING_COLOR
+            self.canvas.itemconfigure(self.cells[i], fill=color)
+        self.progress = index
+        self._update_path()
+
+    def _update_path(self):
+        """Перемещает линию пути: от инструмента через следующие точки сетки."""
+        upcoming = self.points[self.progress:self.progress + PATH_LENGTH]
+        if not upcoming:
+            self.canvas.itemconfigure(self.path, state=tk.HIDDEN)
+            return
+        coords = [*self.to_canvas(*self.tool_xy)]
+        for point in upcoming:
+            coords.extend(self.to_canvas(*point))
+        self.canvas.coords(self.path, *coords)
+        self.canvas.itemconfigure(self.path, state=tk.NORMAL)
@@ -1,6 +1,6 @@
 import tkinter as tk
 import serial
-arduino = serial.Serial('COM3', 9600, timeout=10)
+arduino = serial.Serial('COM3', 115200, timeout=10)
 logic_value1 = False
 logic_value = False
 root =tk.Tk()
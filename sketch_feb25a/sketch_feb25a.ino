@@ -13,12 +13,41 @@
 #define DIR_WRIST_PIN 7
 #define STEP_WRIST_PIN 4
 #define LIMIT_SWITCH4_PIN 9
+// Пины пневматики
+#define VACUUM_PIN 10
+#define DOZA_PIN 11
+
+// Очередь сегментов движения
+#define AXIS_COUNT 4
+#define QUEUE_SIZE 16
+#define FRAME_BUFFER_SIZE 96
+// Параметры AccelStepper (шаг/с и шаг/с^2)
+#define MAX_SPEED 4000
+#define ACCELERATION 2000
+// Скорость последовательного порта (protocol.BAUDRATE)
+#define SERIAL_BAUD 115200
+// Период кадров состояния (мс)
+#define STATUS_PERIOD_MS 100
+// Длина кадра состояния с запасом на самые длинные числа
+#define STATUS_FRAME_SIZE 80
+#ifndef SERIAL_TX_BUFFER_SIZE
+#define SERIAL_TX_BUFFER_SIZE 64
+#endif
+// Остановка ручного перемещения без нового кадра JOG (мс)
+#define JOG_TIMEOUT_MS 300
+// Допустимое изменение доли скорости оси при переходе без остановки
+#define BLEND_SHARE_TOLERANCE 0.05
 
 // Создаем объект AccelStepper
 AccelStepper stepperhand(AccelStepper::DRIVER, STEP_HAND_PIN, DIR_HAND_PIN);
 AccelStepper stepperarm(AccelStepper::DRIVER, STEP_ARM_PIN, DIR_ARM_PIN);
 AccelStepper stepperelevator(AccelStepper::DRIVER,STEP_ELEVATOR_PIN, DIR_ELEVATOR_PIN);
 AccelStepper stepperwrist(AccelStepper::DRIVER, STEP_WRIST_PIN, DIR_WRIST_PIN);
+// Оси в порядке полей кадра: PLECHO, RUKA, LIFT, ORGON
+AccelStepper* steppers[AXIS_COUNT] = {&stepperhand, &stepperarm, &stepperelevator, &stepperwrist};
+const char* AXIS_NAMES[AXIS_COUNT] = {"PLECHO", "RUKA", "LIFT", "ORGON"};
+// Направление движения к концевику каждой оси
+const int HOME_DIRECTIONS[AXIS_COUNT] = {-1, -1, 1, -1};
 bool moveForward = false;
 bool moveReverse = false;
 bool moveToHome = false;
@@ -36,25 +65,385 @@ bool moveWristForward=false;
 bool moveWristReverse=false;
 bool moveToHomeWrist=false;
 int d=0;
+
+// Сегмент: абсолютные цели осей в шагах и состояние пневматики
+struct Segment {
+  unsigned int seq;
+  long target[AXIS_COUNT];
+  byte axisMask;   // Оси, заданные в кадре
+  char vacuum;     // -1 - не менять, 0 - выкл, 1 - вкл
+  char doza;
+  bool zero;       // Обнулить позиции перед сегментом
+};
+
+Segment queue[QUEUE_SIZE];
+byte queueHead = 0;
+byte queueCount = 0;
+Segment current;
+bool segmentActive = false;
+bool profilesScaled = false;  // Скорости осей согласованы под сегмент
+unsigned int doneSeq = 0;     // Номер последнего выполненного сегмента
+unsigned int expectSeq = 0;   // Номер следующего принимаемого сегмента, 0 - любой
+unsigned long lastStatus = 0;
+long lastTarget[AXIS_COUNT] = {0, 0, 0, 0};
+// Ручное перемещение кадрами JOG: скорости осей (шаг/с)
+long jogSpeed[AXIS_COUNT] = {0, 0, 0, 0};
+unsigned long lastJog = 0;
+// Маска концевиков, прочитанная один раз за проход loop()
+byte limits = 0;
+
+void handleCommand(char command);
+
+char frameBuffer[FRAME_BUFFER_SIZE];
+byte frameLength = 0;
+bool inFrame = false;
+
 void setup() {
   pinMode(LIMIT_SWITCH_PIN, INPUT); // Устанавливаем пин для концевого выключателя
   pinMode(LIMIT_SWITCH2_PIN, INPUT); // Устанавливаем пин для концевого выключателя
   pinMode(LIMIT_SWITCH3_PIN,INPUT);
   pinMode(LIMIT_SWITCH4_PIN,INPUT);
-  stepperhand.setMaxSpeed(4000); // Устанавливаем максимальную скорость
-  stepperhand.setAcceleration(2000); // Устанавливаем ускорение
-  stepperarm.setMaxSpeed(4000);
-  stepperarm.setAcceleration(2000);
-  stepperelevator.setMaxSpeed(4000);
-  stepperelevator.setAcceleration(2000);
-  stepperwrist.setMaxSpeed(4000);
-  stepperwrist.setAcceleration(2000);
-  Serial.begin(9600); // Инициализация последовательного порта
+  stepperhand.setMaxSpeed(MAX_SPEED); // Устанавливаем максимальную скорость
+  stepperhand.setAcceleration(ACCELERATION); // Устанавливаем ускорение
+  stepperarm.setMaxSpeed(MAX_SPEED);
+  stepperarm.setAcceleration(ACCELERATION);
+  stepperelevator.setMaxSpeed(MAX_SPEED);
+  stepperelevator.setAcceleration(ACCELERATION);
+  stepperwrist.setMaxSpeed(MAX_SPEED);
+  stepperwrist.setAcceleration(ACCELERATION);
+  pinMode(VACUUM_PIN, OUTPUT);
+  pinMode(DOZA_PIN, OUTPUT);
+  Serial.begin(SERIAL_BAUD); // Инициализация последовательного порта
 }
 
-void loop() {
-  if (Serial.available() > 0){
-    char command = Serial.read();
+// Ответ хосту вида KEY:seq или KEY:seq|Q:free
+void reply(const char* key, unsigned int seq, bool withFree) {
+  Serial.print(key);
+  Serial.print(':');
+  Serial.print(seq);
+  if (withFree) {
+    Serial.print("|Q:");
+    Serial.print(QUEUE_SIZE - queueCount);
+  }
+  Serial.println();
+}
+
+// Маска нажатых концевиков (бит i - ось i)
+byte limitMask() {
+  byte mask = 0;
+  if (analogRead(LIMIT_SWITCH_PIN) > 500) mask |= 1;
+  if (analogRead(LIMIT_SWITCH2_PIN) > 500) mask |= 2;
+  if (analogRead(LIMIT_SWITCH3_PIN) > 500) mask |= 4;
+  if (digitalRead(LIMIT_SWITCH4_PIN) == 1) mask |= 8;
+  return mask;
+}
+
+// Кадр состояния "P:h,a,e,w|M:moving|L:limits|Q:free|D:done".
+// Без force кадр отправляется, только если целиком помещается в буфер
+// передачи: иначе Serial ждал бы освобождения буфера, задерживая шаги.
+// Возвращает true, если кадр отправлен
+bool sendStatus(bool force) {
+  byte moving = 0;
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    if (steppers[i]->isRunning() || jogSpeed[i] != 0) {
+      moving |= 1 << i;
+    }
+  }
+  char frame[STATUS_FRAME_SIZE];
+  int length = snprintf(frame, sizeof(frame), "P:%ld,%ld,%ld,%ld|M:%d|L:%d|Q:%d|D:%u\r\n",
+                        steppers[0]->currentPosition(), steppers[1]->currentPosition(),
+                        steppers[2]->currentPosition(), steppers[3]->currentPosition(),
+                        moving, limits, QUEUE_SIZE - queueCount, doneSeq);
+  length = min(length, STATUS_FRAME_SIZE - 1);
+  if (!force && Serial.availableForWrite() < min(length, SERIAL_TX_BUFFER_SIZE - 1)) {
+    return false;
+  }
+  Serial.write(frame, length);
+  return true;
+}
+
+// Остановка ручного перемещения оси: цель - текущая позиция
+void endJog(byte axis) {
+  if (jogSpeed[axis] != 0) {
+    jogSpeed[axis] = 0;
+    steppers[axis]->setCurrentPosition(steppers[axis]->currentPosition());
+    lastTarget[axis] = steppers[axis]->currentPosition();
+  }
+}
+
+// Кадр JOG: новые скорости заданных осей, ноль останавливает ось
+void handleJog(const Segment& jog) {
+  if (queueCount > 0 || segmentActive) {
+    Serial.println("ERR:BUSY");
+    return;
+  }
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    if (jog.axisMask & (1 << i)) {
+      if (jog.target[i] == 0) {
+        endJog(i);
+      } else {
+        jogSpeed[i] = constrain(jog.target[i], -MAX_SPEED, MAX_SPEED);
+      }
+    }
+  }
+  lastJog = millis();
+}
+
+// Ручное перемещение: runSpeed() для осей с ненулевой скоростью,
+// остановка по таймауту и при движении на нажатый концевик
+void runJog() {
+  bool active = false;
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    active = active || jogSpeed[i] != 0;
+  }
+  if (!active) {
+    return;
+  }
+  bool expired = millis() - lastJog > JOG_TIMEOUT_MS;
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    if (jogSpeed[i] == 0) {
+      continue;
+    }
+    if (expired || ((limits & (1 << i)) && jogSpeed[i] * HOME_DIRECTIONS[i] > 0)) {
+      endJog(i);
+    } else {
+      steppers[i]->setSpeed(jogSpeed[i]);
+      steppers[i]->runSpeed();
+    }
+  }
+}
+
+// Разбор кадра "G:12|PLECHO:800|VACUUM:HIGH" и постановка сегмента в очередь,
+// кадр "JOG:7|PLECHO:500" задает скорости ручного перемещения
+void handleFrame(char* frame) {
+  Segment segment;
+  bool hasSeq = false;
+  bool isJog = false;
+  segment.axisMask = 0;
+  segment.vacuum = -1;
+  segment.doza = -1;
+  segment.zero = false;
+  // Оси, не заданные в кадре, остаются на цели предыдущего сегмента
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    segment.target[i] = lastTarget[i];
+  }
+
+  // Ключи без обработчика (например, MAGAZIN) игнорируются
+  for (char* field = strtok(frame, "|"); field != NULL; field = strtok(NULL, "|")) {
+    char* value = strchr(field, ':');
+    if (value == NULL) {
+      continue;
+    }
+    *value++ = '\0';
+    if (strcmp(field, "G") == 0) {
+      segment.seq = atol(value);
+      hasSeq = true;
+    } else if (strcmp(field, "JOG") == 0) {
+      isJog = true;
+    } else if (strcmp(field, "ZERO") == 0) {
+      segment.zero = true;
+      for (byte i = 0; i < AXIS_COUNT; i++) {
+        if (!(segment.axisMask & (1 << i))) {
+          segment.target[i] = 0;
+        }
+      }
+    } else if (strcmp(field, "VACUUM") == 0) {
+      segment.vacuum = strcmp(value, "HIGH") == 0;
+    } else if (strcmp(field, "DOZA") == 0) {
+      segment.doza = strcmp(value, "HIGH") == 0;
+    } else {
+      for (byte i = 0; i < AXIS_COUNT; i++) {
+        if (strcmp(field, AXIS_NAMES[i]) == 0) {
+          segment.target[i] = atol(value);
+          segment.axisMask |= 1 << i;
+        }
+      }
+    }
+  }
+
+  if (isJog) {
+    handleJog(segment);
+    return;
+  }
+  if (!hasSeq) {
+    Serial.println("ERR:G");
+    return;
+  }
+  // Сегменты принимаются по порядку: повтор принятого только подтверждается,
+  // следующие за отброшенным отклоняются до его повтора
+  if (expectSeq != 0 && segment.seq < expectSeq) {
+    reply("ACK", segment.seq, true);
+    return;
+  }
+  if (queueCount >= QUEUE_SIZE || (expectSeq != 0 && segment.seq != expectSeq)) {
+    reply("FULL", segment.seq, true);
+    return;
+  }
+
+  queue[(queueHead + queueCount) % QUEUE_SIZE] = segment;
+  queueCount++;
+  expectSeq = segment.seq + 1;
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    lastTarget[i] = segment.target[i];
+  }
+  stopMotor = false;
+  reply("ACK", segment.seq, true);
+}
+
+// Прием байтов: кадры начинаются с '$' и заканчиваются '\n',
+// остальные символы - однобайтовые команды
+void readSerial() {
+  while (Serial.available() > 0) {
+    char ch = Serial.read();
+    if (inFrame) {
+      if (ch == '\n') {
+        frameBuffer[frameLength] = '\0';
+        inFrame = false;
+        handleFrame(frameBuffer);
+      } else if (ch != '\r' && frameLength < FRAME_BUFFER_SIZE - 1) {
+        frameBuffer[frameLength++] = ch;
+      }
+    } else if (ch == '$') {
+      inFrame = true;
+      frameLength = 0;
+    } else {
+      handleCommand(ch);
+    }
+  }
+}
+
+// Переход к следующему сегменту без остановки возможен, если у него нет
+// пневматики и обнуления, движутся те же оси, каждая продолжает движение
+// в ту же сторону и уже тормозит, а доли скорости осей не меняются:
+// масштабирование в startSegment() рассчитано на старт с места, и при
+// других долях оси, уже имеющие скорость, пришли бы в цель не одновременно
+bool canBlend(const Segment& next) {
+  if (next.vacuum >= 0 || next.doza >= 0 || next.zero) {
+    return false;
+  }
+  long longest = 0;
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    if (next.axisMask & (1 << i)) {
+      longest = max(longest, abs(next.target[i] - steppers[i]->currentPosition()));
+    }
+  }
+  if (longest == 0) {
+    return false;
+  }
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    long remaining = steppers[i]->distanceToGo();
+    long step = next.target[i] - current.target[i];
+    if (remaining == 0 && step == 0) {
+      continue;
+    }
+    if (remaining == 0 || step == 0 || (step > 0) != (remaining > 0)) {
+      return false;
+    }
+    float speed = steppers[i]->speed();
+    if (abs(remaining) > (long)(speed * speed / (2.0 * ACCELERATION)) + 1) {
+      return false;
+    }
+    float share = (float)abs(next.target[i] - steppers[i]->currentPosition()) / longest;
+    if (fabs(share - steppers[i]->maxSpeed() / MAX_SPEED) > BLEND_SHARE_TOLERANCE) {
+      return false;
+    }
+  }
+  return true;
+}
+
+void startSegment() {
+  current = queue[queueHead];
+  queueHead = (queueHead + 1) % QUEUE_SIZE;
+  queueCount--;
+
+  if (current.zero) {
+    for (byte i = 0; i < AXIS_COUNT; i++) {
+      steppers[i]->setCurrentPosition(0);
+    }
+  }
+  if (current.vacuum >= 0) {
+    digitalWrite(VACUUM_PIN, current.vacuum ? HIGH : LOW);
+  }
+  if (current.doza >= 0) {
+    digitalWrite(DOZA_PIN, current.doza ? HIGH : LOW);
+  }
+  // Согласованное движение: скорости и ускорения осей пропорциональны
+  // их перемещениям, поэтому все оси приходят в цель одновременно
+  long longest = 0;
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    if (current.axisMask & (1 << i)) {
+      longest = max(longest, abs(current.target[i] - steppers[i]->currentPosition()));
+    }
+  }
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    long delta = abs(current.target[i] - steppers[i]->currentPosition());
+    if ((current.axisMask & (1 << i)) && delta > 0) {
+      float ratio = (float)delta / longest;
+      steppers[i]->setMaxSpeed(MAX_SPEED * ratio);
+      steppers[i]->setAcceleration(ACCELERATION * ratio);
+      steppers[i]->moveTo(current.target[i]);
+      profilesScaled = true;
+    }
+  }
+  segmentActive = true;
+  reply("RUN", current.seq, true);
+}
+
+bool isMoving() {
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    if (steppers[i]->isRunning()) {
+      return true;
+    }
+  }
+  return false;
+}
+
+// Завершение текущего сегмента и запуск следующего из очереди
+void updateSegments() {
+  if (segmentActive) {
+    bool finished = true;
+    for (byte i = 0; i < AXIS_COUNT; i++) {
+      if (steppers[i]->distanceToGo() != 0) {
+        finished = false;
+      }
+    }
+    if (!finished && !(queueCount > 0 && canBlend(queue[queueHead]))) {
+      return;
+    }
+    segmentActive = false;
+    doneSeq = current.seq;
+    reply("DONE", current.seq, false);
+  }
+  if (queueCount > 0) {
+    startSegment();
+  } else if (profilesScaled && !isMoving()) {
+    // Очередь пуста - возвращаем полные скорости для ручного режима
+    for (byte i = 0; i < AXIS_COUNT; i++) {
+      steppers[i]->setMaxSpeed(MAX_SPEED);
+      steppers[i]->setAcceleration(ACCELERATION);
+    }
+    profilesScaled = false;
+  }
+}
+
+// Ось движется к своему концевику
+bool towardsSwitch(byte axis) {
+  return steppers[axis]->distanceToGo() * HOME_DIRECTIONS[axis] > 0;
+}
+
+// Остановка оси на нажатом концевике. Однобуквенные команды крутят ось
+// через runSpeed(), который не меняет цель AccelStepper, и run() повел бы
+// ось обратно к старой цели: цель фиксируется на концевике. Сегмент очереди
+// останавливается, только если едет на концевик
+void stopAtSwitch(byte axis, bool speedMove) {
+  if (speedMove) {
+    steppers[axis]->setCurrentPosition(steppers[axis]->currentPosition());
+  } else if (towardsSwitch(axis)) {
+    steppers[axis]->stop();
+  }
+}
+
+void handleCommand(char command) {
     switch (command){
       case 'F':
         moveForward = true;
@@ -212,8 +601,37 @@ void loop() {
         moveArmForward=false;
         moveToHomeElevator=false;
       break;
+      case 'N':
+        digitalWrite(VACUUM_PIN, LOW);
+        break;
+      case 'M':
+        digitalWrite(VACUUM_PIN, HIGH);
+        break;
+      case 'K':
+        digitalWrite(DOZA_PIN, HIGH);
+        break;
+      case 'L':
+        digitalWrite(DOZA_PIN, LOW);
+        break;
+      case '?':
+        sendStatus(true);
+        break;
     }
-  }
+    // Остановка сбрасывает очередь сегментов
+    if (command == 'S') {
+      queueCount = 0;
+      expectSeq = 0;
+      segmentActive = false;
+      for (byte i = 0; i < AXIS_COUNT; i++) {
+        endJog(i);
+        steppers[i]->stop();
+        lastTarget[i] = steppers[i]->targetPosition();
+      }
+    }
+}
+
+void loop() {
+  readSerial();
   if(moveForward && a == 0){
     stepperhand.setSpeed(-1000);
     stepperhand.runSpeed();
@@ -265,26 +683,27 @@ void loop() {
     stepperwrist.setSpeed(-1000);
     stepperwrist.runSpeed();
   }
-  if (analogRead(LIMIT_SWITCH_PIN)>500){
-    stepperhand.stop();
+  limits = limitMask();
+  if (limits & 1){
+    stopAtSwitch(0, moveForward || moveToHome);
     moveForward = false;
     moveToHome = false;
     a=1;
   }
-  if (analogRead(LIMIT_SWITCH2_PIN)>500){
-    stepperarm.stop();
+  if (limits & 2){
+    stopAtSwitch(1, moveArmForward || moveToHomeArm);
     moveArmForward = false;
     moveToHomeArm = false;
     b=1;
   }
-  if (analogRead(LIMIT_SWITCH3_PIN)>500){
-    stepperelevator.stop();
+  if (limits & 4){
+    stopAtSwitch(2, ElevatorUp || moveToHomeElevator);
     ElevatorUp=false;
     moveToHomeElevator=false;
     c=1;
   }
-  if (digitalRead(LIMIT_SWITCH4_PIN)==1){
-    stepperwrist.stop();
+  if (limits & 8){
+    stopAtSwitch(3, moveToHomeWrist || moveWristForward);
     moveToHomeWrist=false;
     moveWristForward=false;
     d=1;
@@ -295,8 +714,16 @@ void loop() {
     stepperelevator.stop();
     stepperwrist.stop();
   }
-  stepperhand.run();
-  stepperwrist.run();
-  stepperarm.run();
-  stepperelevator.run();
+  updateSegments();
+  // Пропущенный из-за занятого буфера кадр отправляется на следующем проходе
+  if (millis() - lastStatus >= STATUS_PERIOD_MS && sendStatus(false)) {
+    lastStatus = millis();
+  }
+  runJog();
+  // Оси ручного перемещения крутит runJog(), run() вернул бы их к старой цели
+  for (byte i = 0; i < AXIS_COUNT; i++) {
+    if (jogSpeed[i] == 0) {
+      steppers[i]->run();
+    }
+  }
 }
\ No newline at end of file